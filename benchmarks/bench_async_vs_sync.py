@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Load-test the threaded WSGI mode against the asyncio (ASGI) mode
+
+Both modes serve flask_backend/app.py routes backed by the local GitHub stub
+with artificial upstream latency. The sync server mimics a gunicorn gthread
+worker with a fixed thread count; the async server is uvicorn running
+flask_backend.asgi:app in a single process.
+
+    pip install aiohttp uvicorn
+    python benchmarks/bench_async_vs_sync.py --latency 0.1 --concurrency 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.github_stub import start_stub
+from benchmarks.loadgen import run_load, start_async_server, start_sync_server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sync vs asyncio serving mode')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8, help='sync worker threads')
+    parser.add_argument('--latency', type=float, default=0.1, help='stub upstream latency (s)')
+    parser.add_argument('--path', default='/api/repositories/owner/repo{i}/languages',
+                        help='request path template; {i} is the request number')
+    args = parser.parse_args()
+
+    # A large reported quota keeps the rate-limit scheduler from throttling the run
+    stub, stub_url = start_stub(latency=args.latency, quota=10 ** 9, quota_window=3600)
+    os.environ['GITHUB_API_BASE'] = stub_url
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + tempfile.mktemp(suffix='.db'))
+
+    from flask_backend.app import app, db
+    from flask_backend.asgi import app as asgi_app
+
+    with app.app_context():
+        db.create_all()
+
+    paths = [args.path.format(i=i) for i in range(args.requests)]
+    _, sync_url = start_sync_server(app, args.threads)
+    _, async_url = start_async_server(asgi_app)
+
+    for label, url in ((f'sync ({args.threads} threads)', sync_url), ('asyncio', async_url)):
+        stats = run_load(url, paths, args.concurrency)
+        print(f"{label:<20} {stats['rps']:9.1f} req/s  p50 {stats['p50_ms']:8.1f} ms  "
+              f"p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms  {stats['statuses']}")
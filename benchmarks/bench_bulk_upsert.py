@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Per-page DB time for row-by-row save_repository_to_db versus the bulk upsert
+
+Each round writes the same search pages twice (insert, then update) into a
+fresh SQLite file and reports mean milliseconds and SQL statements per page.
+
+    python benchmarks/bench_bulk_upsert.py --pages 20 --per-page 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--pages', type=int, default=20)
+parser.add_argument('--per-page', type=int, default=100)
+parser.add_argument('--database-url', help='defaults to a temporary SQLite file per strategy')
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + tempfile.mktemp(suffix='.db')
+
+from sqlalchemy import event
+
+from benchmarks.github_stub import make_repo
+from flask_backend.app import app, db, save_repository_to_db, save_repositories_to_db
+
+
+def row_by_row(items):
+    return [save_repository_to_db(item).to_dict() for item in items]
+
+
+def bulk(items):
+    return save_repositories_to_db(items)
+
+
+def measure(label, strategy, pages):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        statements = []
+        listener = lambda *a: statements.append(1)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            for phase in ('insert', 'update'):
+                statements.clear()
+                start = time.perf_counter()
+                for items in pages:
+                    strategy(items)
+                    db.session.commit()
+                elapsed = time.perf_counter() - start
+                print(f'{label:<12} {phase:<7} {elapsed / len(pages) * 1000:8.2f} ms/page '
+                      f'{len(statements) / len(pages):7.1f} statements/page')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+
+if __name__ == '__main__':
+    pages = [[make_repo(f'owner{p}', f'repo{i}', p * args.per_page + i) for i in range(args.per_page)]
+             for p in range(args.pages)]
+    measure('row-by-row', row_by_row, pages)
+    measure('bulk', bulk, pages)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Read throughput of the local endpoints while repositories are being written
+
+Seeds a fresh database, serves flask_backend/app.py in this process and
+drives the DB-only read endpoints (saved repositories, local search, stats)
+while writer processes (standing in for other gunicorn workers) keep
+upserting pages of repositories, which also fires the full-text and stats
+triggers. Each SQLite mode runs in its own subprocess so its PRAGMAs apply
+from the first connection:
+
+    tuned    the defaults (WAL, synchronous=NORMAL, mmap, busy_timeout)
+    legacy   rollback journal, synchronous=FULL, no mmap
+
+    python benchmarks/bench_db_concurrency.py --writers 2 --write-rate 2 --concurrency 32
+    python benchmarks/bench_db_concurrency.py --write-rate 0  # writers flat out
+    python benchmarks/bench_db_concurrency.py --database-url postgresql://localhost/bench  # tables are recreated
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    'tuned': {},
+    'legacy': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_MMAP_SIZE': '0'}
+}
+
+READ_PATHS = [
+    '/api/repositories/saved?per_page=30',
+    '/api/repositories/saved?per_page=30&language=Python',
+    '/api/search/local?q=stub',
+    '/api/stats/languages',
+    '/api/stats/topics'
+]
+
+
+def writer(stop, results, first_seed, page_size, rate):
+    """Writer process: upsert pages of repositories until stopped, counting commits and lock errors"""
+    from flask_backend.app import app, db, dispose_connections, save_repositories_to_db
+    from benchmarks.github_stub import make_repo
+
+    dispose_connections()
+    stats = {'commits': 0, 'seconds': 0.0, 'errors': {}}
+    seed = first_seed
+    with app.app_context():
+        while not stop.is_set():
+            items = [make_repo(f'owner{(seed + i) % 500}', f'repo{seed + i}', seed + i)
+                     for i in range(page_size)]
+            # Churn stars so the stats counters and star buckets move on every write
+            for item in items:
+                item['stargazers_count'] = (item['stargazers_count'] + stats['commits']) % 100000
+            start = time.perf_counter()
+            try:
+                save_repositories_to_db(items)
+                db.session.commit()
+                stats['commits'] += 1
+            except Exception as e:
+                db.session.rollback()
+                stats['errors'][type(e).__name__] = stats['errors'].get(type(e).__name__, 0) + 1
+            stats['seconds'] += time.perf_counter() - start
+            seed = first_seed + (seed - first_seed + page_size) % 5000
+            if rate:
+                # Hold the write load steady so modes compare on read throughput
+                stop.wait(max(1 / rate - (time.perf_counter() - start), 0))
+    results.put(stats)
+
+
+def run_mode(args):
+    """Child process: seed, start writers, load the read endpoints and print a JSON report"""
+    import multiprocessing
+
+    from flask_backend.app import app, db, save_repositories_to_db
+    from benchmarks.github_stub import make_repo
+    from benchmarks.loadgen import run_load, start_sync_server
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for start in range(0, args.seed_rows, 500):
+            save_repositories_to_db([make_repo(f'owner{i % 500}', f'repo{i}', i)
+                                     for i in range(start, min(start + 500, args.seed_rows))])
+            db.session.commit()
+        db.session.remove()
+
+    # Fork the writers before any server threads exist
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    results = context.Queue()
+    writers = [context.Process(target=writer, args=(stop, results, n * 100000, args.page_size, args.write_rate), daemon=True)
+               for n in range(args.writers)]
+    for process in writers:
+        process.start()
+
+    _, base_url = start_sync_server(app, args.threads)
+    paths = [READ_PATHS[i % len(READ_PATHS)] for i in range(args.requests)]
+    run_load(base_url, paths[:len(READ_PATHS) * 4], args.concurrency)  # warm up
+    reads = run_load(base_url, paths, args.concurrency)
+    stop.set()
+    writer_stats = [results.get(timeout=60) for _ in writers]
+    for process in writers:
+        process.join(timeout=10)
+
+    commits = sum(stats['commits'] for stats in writer_stats)
+    errors = {}
+    for stats in writer_stats:
+        for name, count in stats['errors'].items():
+            errors[name] = errors.get(name, 0) + count
+    write_seconds = sum(stats['seconds'] for stats in writer_stats)
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    print(json.dumps({
+        'dialect': dialect,
+        'reads': reads,
+        'writes': {
+            'commits': commits,
+            'commits_per_second': round(commits / reads['seconds'], 1) if reads['seconds'] else 0.0,
+            'mean_commit_ms': round(write_seconds / commits * 1000, 2) if commits else None,
+            'errors': errors
+        }
+    }))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', default='tuned,legacy', help='comma separated: tuned, legacy (SQLite only)')
+    parser.add_argument('--database-url', help='run once against this database instead of SQLite files')
+    parser.add_argument('--requests', type=int, default=3000, help='read requests per mode')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+    parser.add_argument('--writers', type=int, default=2, help='concurrent writer processes')
+    parser.add_argument('--write-rate', type=float, default=2,
+                        help='commits per second per writer, 0 to write flat out')
+    parser.add_argument('--page-size', type=int, default=20, help='repositories per write')
+    parser.add_argument('--seed-rows', type=int, default=5000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args)
+        sys.exit(0)
+
+    if args.database_url:
+        runs = [('database', {'DATABASE_URL': args.database_url})]
+    else:
+        runs = [(mode, dict(MODES[mode], DATABASE_URL='sqlite:///' + tempfile.mktemp(suffix='.db')))
+                for mode in args.modes.split(',')]
+
+    print(f"{args.writers} writer(s) x {args.page_size} rows at {args.write_rate or 'max'} commits/s, "
+          f"{args.concurrency} concurrent readers, "
+          f"{args.threads} server threads")
+    for name, env in runs:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', *sys.argv[1:]],
+                                env=dict(os.environ, PYTHONPATH=ROOT, WRITE_BEHIND_ENABLED='0', **env),
+                                capture_output=True, text=True, cwd=ROOT)
+        if output.returncode != 0:
+            print(f'{name}: failed\n{output.stderr}')
+            continue
+        report = json.loads(output.stdout.strip().splitlines()[-1])
+        reads, writes = report['reads'], report['writes']
+        print(f"{name:<9} reads {reads['rps']:8.1f} req/s  p50 {reads['p50_ms']:7.1f} ms  "
+              f"p95 {reads['p95_ms']:7.1f} ms  p99 {reads['p99_ms']:7.1f} ms  {reads['statuses']}  |  "
+              f"writes {writes['commits_per_second']:6.1f} commits/s  "
+              f"{writes['mean_commit_ms']} ms/commit  errors {writes['errors'] or 'none'}")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Per-endpoint throughput, latency and DB query counts for both Flask servers
+
+Starts the local GitHub stub, serves flask_backend/app.py ('app'),
+flask_server.py ('mobile') and optionally flask_backend.asgi ('asgi') in
+this process, drives every endpoint at a fixed concurrency and reports
+req/s, p50/p95/p99 and SQL statements per request (write-behind flushes
+included). Each run is saved as JSON under benchmarks/results/ and can be
+compared with an earlier run.
+
+    python benchmarks/bench_endpoints.py --latency 0.02 --concurrency 32
+    python benchmarks/bench_endpoints.py --targets app --endpoints search,saved --distinct 10
+    python benchmarks/bench_endpoints.py --compare benchmarks/results/20240101-120000.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Endpoint paths per server; {i} is the request number modulo --distinct
+ENDPOINTS = {
+    'app': {
+        'search': '/api/search/repositories?q=bench{i}',
+        'repository': '/api/repositories/owner{i}/repo{i}',
+        'languages': '/api/repositories/owner{i}/repo{i}/languages',
+        'contents': '/api/repositories/owner{i}/repo{i}/contents',
+        'traffic_views': '/api/repositories/owner{i}/repo{i}/traffic/views',
+        'overview': '/api/repositories/owner{i}/repo{i}/overview',
+        'saved': '/api/repositories/saved?per_page=30',
+        'local_search': '/api/search/local?q=bench',
+        'history': '/api/search/history',
+        'stats_languages': '/api/stats/languages'
+    },
+    'mobile': {
+        'search': '/api/search/repositories?q=bench{i}',
+        'repository': '/api/repositories/owner{i}/repo{i}',
+        'languages': '/api/repositories/owner{i}/repo{i}/languages',
+        'contents': '/api/repositories/owner{i}/repo{i}/contents',
+        'overview': '/api/repositories/owner{i}/repo{i}/overview'
+    }
+}
+ENDPOINTS['asgi'] = ENDPOINTS['app']
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+class QueryCounter:
+    """Count SQL statements executed on an engine from any thread"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def wait_for_writes(write_behind, timeout=10):
+    """Let the write-behind queue drain so its statements count toward the endpoint"""
+    if write_behind is None:
+        return
+    deadline = time.monotonic() + timeout
+    while write_behind.snapshot()['depth'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(write_behind.flush_interval * 2)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print req/s and p95 changes against an earlier run"""
+    print(f"\nCompared with {baseline.get('label') or baseline.get('started_at')} "
+          f"({baseline.get('git_commit')})")
+    for target, endpoints in results.items():
+        for name, stats in endpoints.items():
+            before = baseline.get('results', {}).get(target, {}).get(name)
+            if not before:
+                continue
+            rps = (stats['rps'] / before['rps'] - 1) * 100 if before['rps'] else 0.0
+            p95 = (stats['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0.0
+            print(f"{target:<7} {name:<16} req/s {rps:+7.1f}%  p95 {p95:+7.1f}%  "
+                  f"queries/req {before['queries_per_request']} -> {stats['queries_per_request']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--targets', default='app,mobile', help='comma separated: app, mobile, asgi')
+    parser.add_argument('--endpoints', help='comma separated endpoint names (default: all)')
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+    parser.add_argument('--distinct', type=int, default=0,
+                        help='distinct paths per endpoint, 0 for one per request (no cache reuse)')
+    parser.add_argument('--latency', type=float, default=0.02, help='stub upstream latency (s)')
+    parser.add_argument('--quota', type=int, default=10 ** 9,
+                        help='stub quota per token and hour, reported so the scheduler does not throttle')
+    parser.add_argument('--description-size', type=int, help='stub repository description length')
+    parser.add_argument('--directory-entries', type=int, default=40, help='stub contents listing size')
+    parser.add_argument('--label', help='name stored with the results')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare with')
+    args = parser.parse_args()
+
+    from benchmarks.github_stub import start_stub
+    from benchmarks.loadgen import run_load, start_async_server, start_sync_server
+
+    stub, stub_url = start_stub(latency=args.latency, quota=args.quota, quota_window=3600,
+                                description_size=args.description_size,
+                                directory_entries=args.directory_entries)
+    os.environ['GITHUB_API_BASE'] = stub_url
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + tempfile.mktemp(suffix='.db'))
+
+    from flask_backend.app import app, db, write_behind
+
+    with app.app_context():
+        db.create_all()
+        counter = QueryCounter(db.engine)
+
+    started_at = datetime.utcnow()
+    targets = args.targets.split(',')
+    wanted = args.endpoints.split(',') if args.endpoints else None
+    results = {}
+    for target in targets:
+        if target == 'app':
+            _, base_url = start_sync_server(app, args.threads)
+        elif target == 'mobile':
+            from flask_server import app as mobile_app
+            _, base_url = start_sync_server(mobile_app, args.threads)
+        elif target == 'asgi':
+            from flask_backend.asgi import app as asgi_app
+            _, base_url = start_async_server(asgi_app)
+        else:
+            parser.error(f'unknown target: {target}')
+
+        results[target] = {}
+        for name, template in ENDPOINTS[target].items():
+            if wanted and name not in wanted:
+                continue
+            paths = [template.format(i=i % args.distinct if args.distinct else i)
+                     for i in range(args.requests)]
+            queries_before = counter.count
+            stats = run_load(base_url, paths, args.concurrency)
+            wait_for_writes(write_behind)
+            stats['queries_per_request'] = round((counter.count - queries_before) / args.requests, 2)
+            results[target][name] = stats
+            print(f"{target:<7} {name:<16} {stats['rps']:9.1f} req/s  p50 {stats['p50_ms']:8.1f} ms  "
+                  f"p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms  "
+                  f"{stats['queries_per_request']:6.2f} queries/req  {stats['statuses']}")
+
+    report = {
+        'label': args.label,
+        'started_at': started_at.isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'args': vars(args),
+        'results': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, started_at.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f'\nResults saved to {os.path.relpath(output)}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
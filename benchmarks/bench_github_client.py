@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Throughput of per-call requests.get versus the pooled GitHubClient, with and
+without the ETag revalidation cache
+
+    python benchmarks/bench_github_client.py --requests 2000 --concurrency 16
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.github_stub import start_stub
+from flask_backend.conditional_cache import ConditionalCache
+from flask_backend.github_client import GitHubClient
+
+ENDPOINT = 'repos/octocat/hello-world'
+
+
+def run(label, fetch, total, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: fetch(), range(total)))
+    elapsed = time.perf_counter() - start
+    print(f'{label:<20} {total / elapsed:10.1f} req/s  ({elapsed:.2f}s for {total})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--base-url', help='benchmark an already running stub instead')
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = start_stub(latency=args.latency)
+
+    client = GitHubClient(base_url=base_url, pool_size=args.concurrency)
+
+    def unpooled():
+        response = requests.get(f'{base_url}/{ENDPOINT}', timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    run('requests.get', unpooled, args.requests, args.concurrency)
+    run('GitHubClient', lambda: client.get_json(ENDPOINT), args.requests, args.concurrency)
+
+    cached = GitHubClient(base_url=base_url, pool_size=args.concurrency, cache=ConditionalCache())
+    run('GitHubClient+etag', lambda: cached.get_json(ENDPOINT), args.requests, args.concurrency)
+    print(f'{"":<20} {cached.cache.stats()}')
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Per-page serialization cost of a search result page
+
+Compares the previous path (Repository(**row).to_dict() + stdlib json)
+with the compiled serializer and the orjson-backed provider, for the full
+payload and a list-view projection, and reports body sizes with gzip.
+
+    python benchmarks/bench_serialization.py --per-page 100 --rounds 200
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--per-page', type=int, default=100)
+parser.add_argument('--rounds', type=int, default=200)
+args = parser.parse_args()
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + tempfile.mktemp(suffix='.db'))
+
+from benchmarks.github_stub import make_repo
+from flask_backend.app import REPOSITORY_JSON_FIELDS, Repository, app, repository_row_json, repository_rows
+
+LIST_FIELDS = ('id', 'name', 'description', 'language', 'stargazers_count', 'owner')
+
+
+def stdlib_to_dict(rows):
+    payload = [Repository(**row).to_dict() for row in rows]
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def compiled(fields):
+    def run(rows):
+        return app.json.dumps_bytes(repository_row_json.many(rows, fields))
+    return run
+
+
+def measure(label, fn, rows):
+    body = fn(rows)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        fn(rows)
+    elapsed = (time.perf_counter() - start) / args.rounds
+    print(f'{label:<28} {elapsed * 1000:8.3f} ms/page {len(body):8d} bytes '
+          f'{len(gzip.compress(body, 5)):7d} gzipped')
+
+
+if __name__ == '__main__':
+    rows = repository_rows([make_repo(f'owner{i % 50}', f'repo{i}', i) for i in range(args.per_page)])
+    print(f'{len(REPOSITORY_JSON_FIELDS)} fields, {args.per_page} repositories per page')
+    with app.app_context():
+        measure('to_dict + json', stdlib_to_dict, rows)
+        measure('compiled, all fields', compiled(None), rows)
+        measure(f'compiled, {len(LIST_FIELDS)} fields', compiled(LIST_FIELDS), rows)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-in for the GitHub REST endpoints the backends use
+
+Serves canned search, repository, languages, contents and traffic payloads
+(plus GraphQL repository lookups)
+over HTTP/1.1 keep-alive, with ETag revalidation and optional artificial
+latency and payload sizes, so the Flask servers can be benchmarked without
+network access or GitHub quota. With --quota, every token gets that many calls per resource
+per window and X-RateLimit-* headers are sent as GitHub does.
+
+    python benchmarks/github_stub.py --port 8765 --latency 0.02
+    GITHUB_API_BASE=http://127.0.0.1:8765 python run_flask.py
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LANGUAGES = ['Python', 'JavaScript', 'TypeScript', 'Go', 'Rust', 'Java', 'C++', None]
+EPOCH = datetime(2020, 1, 1)
+
+
+def make_repo(owner, name, seed):
+    """Build a GitHub-shaped repository payload derived only from the seed"""
+    full_name = f'{owner}/{name}'
+    return {
+        'id': 100000 + seed,
+        'name': name,
+        'full_name': full_name,
+        'description': f'Stub repository {full_name}',
+        'html_url': f'https://github.com/{full_name}',
+        'clone_url': f'https://github.com/{full_name}.git',
+        'ssh_url': f'git@github.com:{full_name}.git',
+        'language': LANGUAGES[seed % len(LANGUAGES)],
+        'stargazers_count': (seed * 7919) % 100000,
+        'forks_count': (seed * 104729) % 5000,
+        'watchers_count': (seed * 7919) % 100000,
+        'open_issues_count': seed % 250,
+        'default_branch': 'main',
+        'topics': [f'topic-{seed % 13}', f'topic-{seed % 29}'],
+        'owner': {
+            'login': owner,
+            'avatar_url': f'https://avatars.githubusercontent.com/u/{seed}',
+            'html_url': f'https://github.com/{owner}'
+        },
+        'created_at': (EPOCH + timedelta(days=seed % 1000)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'updated_at': (EPOCH + timedelta(days=1000 + seed % 500)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'pushed_at': (EPOCH + timedelta(days=1200 + seed % 300)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'private': False,
+        'fork': seed % 11 == 0,
+        'archived': seed % 17 == 0,
+        'disabled': False,
+        'size': (seed * 31) % 50000,
+        'license': {'key': 'mit', 'name': 'MIT License', 'spdx_id': 'MIT'}
+    }
+
+
+def graphql_node(repo):
+    """The GraphQL Repository node for a REST payload from make_repo()"""
+    license = repo.get('license')
+    return {
+        'databaseId': repo['id'],
+        'name': repo['name'],
+        'nameWithOwner': repo['full_name'],
+        'description': repo['description'],
+        'url': repo['html_url'],
+        'sshUrl': repo['ssh_url'],
+        'primaryLanguage': {'name': repo['language']} if repo['language'] else None,
+        'stargazerCount': repo['stargazers_count'],
+        'forkCount': repo['forks_count'],
+        'issues': {'totalCount': repo['open_issues_count']},
+        'pullRequests': {'totalCount': 0},
+        'defaultBranchRef': {'name': repo['default_branch']},
+        'repositoryTopics': {'nodes': [{'topic': {'name': topic}} for topic in repo['topics']]},
+        'owner': {'login': repo['owner']['login'], 'avatarUrl': repo['owner']['avatar_url']},
+        'createdAt': repo['created_at'],
+        'updatedAt': repo['updated_at'],
+        'pushedAt': repo['pushed_at'],
+        'isPrivate': repo['private'],
+        'isFork': repo['fork'],
+        'isArchived': repo['archived'],
+        'isDisabled': repo['disabled'],
+        'diskUsage': repo['size'],
+        'licenseInfo': {'name': license['name'], 'spdxId': license['spdx_id']} if license else None
+    }
+
+
+def seed_for(text):
+    return sum(ord(c) * (i + 1) for i, c in enumerate(text)) % 1000003
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.0
+    total_count = 1000
+    quota = None
+    quota_window = 60
+    file_size = 64 * 1024
+    directory_entries = 40
+    # Pad repository descriptions to this many characters (None keeps them short)
+    description_size = None
+    # Bump to make two thirds of the repositories report new star counts
+    revision = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        path = parsed.path.rstrip('/')
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        headers = self.rate_limit('search' if path.startswith('/search/') else 'core')
+        if headers.get('X-RateLimit-Remaining') == '-1':
+            headers['X-RateLimit-Remaining'] = '0'
+            self.send_json(403, {'message': 'API rate limit exceeded'}, headers)
+            return
+
+        if 'raw' in self.headers.get('Accept', '') and re.match(r'^/repos/[^/]+/[^/]+/contents/.+', path):
+            self.send_raw(path, headers)
+            return
+
+        status, body = self.route(path, params)
+        self.send_json(status, body, headers)
+
+    def do_POST(self):
+        """GraphQL: answers queries from flask_backend.batch_lookup (aliases r0..rN over $oN/$nN)"""
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if urlparse(self.path).path.rstrip('/') != '/graphql':
+            self.send_json(404, {'message': 'Not Found'})
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        headers = self.rate_limit('graphql')
+        if headers.get('X-RateLimit-Remaining') == '-1':
+            headers['X-RateLimit-Remaining'] = '0'
+            self.send_json(200, {'data': None, 'errors': [{'type': 'RATE_LIMITED',
+                                                           'message': 'API rate limit exceeded'}]}, headers)
+            return
+
+        variables = body.get('variables') or {}
+        data = {}
+        i = 0
+        while f'o{i}' in variables:
+            owner, name = variables[f'o{i}'], variables[f'n{i}']
+            data[f'r{i}'] = graphql_node(self.repo(owner, name, seed_for(f'{owner}/{name}')))
+            i += 1
+        self.send_json(200, {'data': data}, headers)
+
+    def rate_limit(self, resource):
+        """Count the call against its token; returns the X-RateLimit-* headers"""
+        if not self.quota:
+            return {}
+        token = self.headers.get('Authorization', 'anonymous')
+        window = int(time.time() // self.quota_window)
+        with self.server.usage_lock:
+            used = self.server.usage.get((token, resource, window), 0) + 1
+            self.server.usage[(token, resource, window)] = used
+        return {
+            'X-RateLimit-Limit': str(self.quota),
+            'X-RateLimit-Remaining': str(self.quota - used) if used <= self.quota else '-1',
+            'X-RateLimit-Reset': str((window + 1) * self.quota_window),
+            'X-RateLimit-Resource': resource
+        }
+
+    def repo(self, owner, name, seed):
+        repo = make_repo(owner, name, seed)
+        repo['stargazers_count'] += self.revision * (seed % 3)
+        if self.description_size:
+            description = repo['description'] + ' '
+            repo['description'] = (description * (self.description_size // len(description) + 1))[
+                :self.description_size]
+        self.server.known[repo['id']] = (owner, name, seed)
+        return repo
+
+    def route(self, path, params):
+        if path == '/search/repositories':
+            return 200, self.search(params)
+
+        match = re.match(r'^/repositories/(\d+)$', path)
+        if match:
+            known = self.server.known.get(int(match.group(1)))
+            if known is None:
+                return 404, {'message': 'Not Found'}
+            return 200, self.repo(*known)
+
+        match = re.match(r'^/repos/([^/]+)/([^/]+)(?:/(.*))?$', path)
+        if not match:
+            return 404, {'message': 'Not Found'}
+
+        owner, name, rest = match.groups()
+        seed = seed_for(f'{owner}/{name}')
+        if rest is None:
+            return 200, self.repo(owner, name, seed)
+        if rest == 'languages':
+            return 200, {'Python': 1000 + seed % 5000, 'Shell': 100 + seed % 300}
+        if rest.startswith('contents'):
+            return 200, self.contents(owner, name, rest[len('contents'):].strip('/'))
+        if rest in ('traffic/views', 'traffic/clones'):
+            return 200, self.traffic(seed, rest.split('/')[1])
+        return 404, {'message': 'Not Found'}
+
+    def search(self, params):
+        query = params.get('q', '')
+        page = int(params.get('page', 1))
+        per_page = int(params.get('per_page', 30))
+        start = (page - 1) * per_page
+        base = seed_for(query)
+        items = [self.repo(f'owner{(base + i) % 97}', f'{query or "repo"}-{base + i}', base + i)
+                 for i in range(start, min(start + per_page, self.total_count))]
+        return {'total_count': self.total_count, 'incomplete_results': False, 'items': items}
+
+    def contents(self, owner, name, path):
+        if path:
+            return {'type': 'file', 'name': path.split('/')[-1], 'path': path, 'size': 1024,
+                    'encoding': 'base64', 'content': 'c3R1Yg==\n' * 128}
+        return [{'type': 'file' if i % 3 else 'dir', 'name': f'entry{i}', 'path': f'entry{i}',
+                 'sha': f'{i:040d}', 'size': i * 100,
+                 'download_url': f'https://raw.githubusercontent.com/{owner}/{name}/main/entry{i}'}
+                for i in range(self.directory_entries)]
+
+    def traffic(self, seed, kind):
+        today = datetime(2024, 1, 15)
+        days = [{'timestamp': (today - timedelta(days=d)).strftime('%Y-%m-%dT00:00:00Z'),
+                 'count': (seed + d * 13) % 500, 'uniques': (seed + d * 7) % 100}
+                for d in range(13, -1, -1)]
+        return {'count': sum(d['count'] for d in days),
+                'uniques': sum(d['uniques'] for d in days), kind: days}
+
+    def send_raw(self, path, headers):
+        """Raw media type reply: file_size deterministic bytes, Range is ignored"""
+        line = f'{path}\n'.encode('utf-8')
+        payload = (line * (self.file_size // len(line) + 1))[:self.file_size]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('ETag', '"%s"' % hashlib.sha1(payload).hexdigest())
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_json(self, status, body, headers=None):
+        headers = headers or {}
+        payload = json.dumps(body).encode('utf-8')
+        etag = '"%s"' % hashlib.sha1(payload).hexdigest()
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            payload = gzip.compress(payload, compresslevel=1)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        if status == 200:
+            self.send_header('ETag', etag)
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.usage = {}
+        self.usage_lock = threading.Lock()
+        self.known = {}
+
+
+def start_stub(host='127.0.0.1', port=0, latency=0.0, quota=None, quota_window=60,
+               description_size=None, directory_entries=40, file_size=64 * 1024):
+    """Start the stub on a background thread and return (server, base_url)"""
+    handler = type('ConfiguredStubHandler', (StubHandler,),
+                   {'latency': latency, 'quota': quota, 'quota_window': quota_window,
+                    'description_size': description_size, 'directory_entries': directory_entries,
+                    'file_size': file_size})
+    server = StubServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local GitHub API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every reply')
+    parser.add_argument('--quota', type=int, help='calls per token, resource and window')
+    parser.add_argument('--quota-window', type=int, default=60, help='rate-limit window in seconds')
+    parser.add_argument('--description-size', type=int, help='characters per repository description')
+    parser.add_argument('--directory-entries', type=int, default=40, help='entries per contents listing')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='bytes per raw file')
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.host, args.port, args.latency, args.quota, args.quota_window,
+                                  args.description_size, args.directory_entries, args.file_size)
+    print(f'GitHub stub listening on {base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,279 @@
+"""
+Materialized language, topic and star-distribution counters
+
+Three small tables hold running totals over the repository table:
+
+    stats_language        language -> repositories, stars, forks
+    stats_language_stars  (language, star bucket) -> repositories
+    stats_topic           topic -> repositories, stars
+
+Triggers on the repository table (SQLite) or trigger functions
+(PostgreSQL) append the delta of every insert, upsert, update and delete to
+a matching <table>_delta log. Appending never touches a shared row, so
+concurrent write batches do not wait on or deadlock over popular languages
+and topics. fold() sums the pending deltas per key and applies them to the
+counters in key order, one folder at a time. Each process folds at most
+every STATS_FOLD_INTERVAL seconds, after a write batch or before an
+/api/stats read, and only when pending() finds deltas, so a read with
+nothing pending never takes the write lock. Counters trail writes by
+about that interval. rebuild() recomputes everything from scratch for
+backfills; on other databases the tables only change on rebuild.
+
+Repositories without a language are counted under ''.
+"""
+import os
+import time
+
+from sqlalchemy import event, text
+
+LANGUAGE_TABLE = 'stats_language'
+STARS_TABLE = 'stats_language_stars'
+TOPIC_TABLE = 'stats_topic'
+PG_FUNCTION = 'repository_stats_apply'
+DELTA = '{}_delta'
+STATS_FOLD_INTERVAL = float(os.environ.get('STATS_FOLD_INTERVAL', 5))
+
+# Counter table -> (key columns, summed columns)
+COUNTERS = {
+    LANGUAGE_TABLE: (('language',), ('repositories', 'stars', 'forks')),
+    STARS_TABLE: (('language', 'bucket'), ('repositories',)),
+    TOPIC_TABLE: (('topic',), ('repositories', 'stars'))
+}
+WATCHED = ('language', 'stars_count', 'forks_count', 'topics')
+
+# Star buckets as (lowest, highest) counts; None means unbounded
+STAR_BUCKETS = [(0, 0), (1, 9), (10, 99), (100, 999), (1000, 9999), (10000, 99999), (100000, None)]
+
+
+def _bucket(column):
+    cases = ' '.join(f'WHEN {column} <= {high} THEN {i}'
+                     for i, (_, high) in enumerate(STAR_BUCKETS) if high is not None)
+    return f'CASE {cases} ELSE {len(STAR_BUCKETS) - 1} END'
+
+
+def _tables_ddl():
+    return [
+        f'CREATE TABLE IF NOT EXISTS {LANGUAGE_TABLE} (language VARCHAR(100) PRIMARY KEY, '
+        f'repositories INTEGER NOT NULL DEFAULT 0, stars BIGINT NOT NULL DEFAULT 0, '
+        f'forks BIGINT NOT NULL DEFAULT 0)',
+        f'CREATE TABLE IF NOT EXISTS {STARS_TABLE} (language VARCHAR(100) NOT NULL, bucket INTEGER NOT NULL, '
+        f'repositories INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (language, bucket))',
+        f'CREATE TABLE IF NOT EXISTS {TOPIC_TABLE} (topic VARCHAR(100) PRIMARY KEY, '
+        f'repositories INTEGER NOT NULL DEFAULT 0, stars BIGINT NOT NULL DEFAULT 0)',
+        f'CREATE INDEX IF NOT EXISTS ix_{TOPIC_TABLE}_repositories ON {TOPIC_TABLE} (repositories)',
+        # Append-only delta logs, without keys so concurrent writers never conflict
+        f'CREATE TABLE IF NOT EXISTS {DELTA.format(LANGUAGE_TABLE)} (language VARCHAR(100) NOT NULL, '
+        f'repositories INTEGER NOT NULL, stars BIGINT NOT NULL, forks BIGINT NOT NULL)',
+        f'CREATE TABLE IF NOT EXISTS {DELTA.format(STARS_TABLE)} (language VARCHAR(100) NOT NULL, '
+        f'bucket INTEGER NOT NULL, repositories INTEGER NOT NULL)',
+        f'CREATE TABLE IF NOT EXISTS {DELTA.format(TOPIC_TABLE)} (topic VARCHAR(100) NOT NULL, '
+        f'repositories INTEGER NOT NULL, stars BIGINT NOT NULL)'
+    ]
+
+
+def _apply_sql(row, sign, topics_source):
+    """Statements logging the addition (sign=1) or removal (sign=-1) of one repository row"""
+    language = f"coalesce({row}.language, '')"
+    stars = f'coalesce({row}.stars_count, 0)'
+    forks = f'coalesce({row}.forks_count, 0)'
+    return [
+        f'INSERT INTO {DELTA.format(LANGUAGE_TABLE)} (language, repositories, stars, forks) '
+        f'VALUES ({language}, {sign}, {sign} * {stars}, {sign} * {forks})',
+        f'INSERT INTO {DELTA.format(STARS_TABLE)} (language, bucket, repositories) '
+        f'VALUES ({language}, {_bucket(stars)}, {sign})',
+        f'INSERT INTO {DELTA.format(TOPIC_TABLE)} (topic, repositories, stars) '
+        f'SELECT topic, {sign}, {sign} * {stars} FROM {topics_source}'
+    ]
+
+
+def _sqlite_topics(row):
+    return f"(SELECT DISTINCT value AS topic FROM json_each(coalesce({row}.topics, '[]')))"
+
+
+def _pg_topics(row):
+    return (f"(SELECT DISTINCT jsonb_array_elements_text(coalesce({row}.topics::jsonb, '[]'::jsonb)) "
+            f"AS topic) AS topics")
+
+
+def _changed(old, new, distinct, topics_cast=''):
+    """Trigger condition: one of the counted columns changed"""
+    return ' OR '.join(f"{old}.{column}{topics_cast if column == 'topics' else ''} {distinct} "
+                       f"{new}.{column}{topics_cast if column == 'topics' else ''}" for column in WATCHED)
+
+
+def _sqlite_ddl(table):
+    remove = '; '.join(_apply_sql('old', -1, _sqlite_topics('old')))
+    add = '; '.join(_apply_sql('new', 1, _sqlite_topics('new')))
+    return _tables_ddl() + [
+        f'DROP TRIGGER IF EXISTS {table}_stats_ai',
+        f'DROP TRIGGER IF EXISTS {table}_stats_ad',
+        f'DROP TRIGGER IF EXISTS {table}_stats_au',
+        f'CREATE TRIGGER {table}_stats_ai AFTER INSERT ON {table} BEGIN {add}; END',
+        f'CREATE TRIGGER {table}_stats_ad AFTER DELETE ON {table} BEGIN {remove}; END',
+        f"CREATE TRIGGER {table}_stats_au AFTER UPDATE OF {', '.join(WATCHED)} ON {table} "
+        f"WHEN {_changed('old', 'new', 'IS NOT')} BEGIN {remove}; {add}; END"
+    ]
+
+
+def _pg_ddl(table):
+    remove = '; '.join(_apply_sql('OLD', -1, _pg_topics('OLD')))
+    add = '; '.join(_apply_sql('NEW', 1, _pg_topics('NEW')))
+    return _tables_ddl() + [
+        f"CREATE OR REPLACE FUNCTION {PG_FUNCTION}() RETURNS trigger AS $$ BEGIN "
+        f"IF TG_OP IN ('UPDATE', 'DELETE') THEN {remove}; END IF; "
+        f"IF TG_OP IN ('INSERT', 'UPDATE') THEN {add}; END IF; "
+        f"RETURN NULL; END $$ LANGUAGE plpgsql",
+        f'DROP TRIGGER IF EXISTS {table}_stats ON {table}',
+        f'DROP TRIGGER IF EXISTS {table}_stats_au ON {table}',
+        f'CREATE TRIGGER {table}_stats AFTER INSERT OR DELETE ON {table} '
+        f'FOR EACH ROW EXECUTE FUNCTION {PG_FUNCTION}()',
+        f"CREATE TRIGGER {table}_stats_au AFTER UPDATE OF {', '.join(WATCHED)} ON {table} "
+        f"FOR EACH ROW WHEN ({_changed('OLD', 'NEW', 'IS DISTINCT FROM', '::text')}) EXECUTE FUNCTION {PG_FUNCTION}()"
+    ]
+
+
+def ensure(connection, table):
+    """Create the counter tables and the triggers that maintain them"""
+    dialect = connection.dialect.name
+    statements = _sqlite_ddl(table) if dialect == 'sqlite' else \
+        _pg_ddl(table) if dialect == 'postgresql' else _tables_ddl()
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def rebuild(connection, table):
+    """Recompute every counter from the repository table"""
+    ensure(connection, table)
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        topics = f"SELECT DISTINCT r.id, r.stars_count, t.value AS topic FROM {table} r, " \
+                 f"json_each(coalesce(r.topics, '[]')) t"
+    elif dialect == 'postgresql':
+        topics = f"SELECT DISTINCT r.id, r.stars_count, t.value AS topic FROM {table} r, " \
+                 f"jsonb_array_elements_text(coalesce(r.topics::jsonb, '[]'::jsonb)) t(value)"
+    else:
+        topics = None
+
+    for name in COUNTERS:
+        connection.execute(text(f'DELETE FROM {name}'))
+        connection.execute(text(f'DELETE FROM {DELTA.format(name)}'))
+    connection.execute(text(
+        f"INSERT INTO {LANGUAGE_TABLE} (language, repositories, stars, forks) "
+        f"SELECT coalesce(language, ''), count(*), coalesce(sum(stars_count), 0), "
+        f"coalesce(sum(forks_count), 0) FROM {table} GROUP BY coalesce(language, '')"
+    ))
+    connection.execute(text(
+        f"INSERT INTO {STARS_TABLE} (language, bucket, repositories) "
+        f"SELECT coalesce(language, ''), {_bucket('coalesce(stars_count, 0)')}, count(*) FROM {table} "
+        f"GROUP BY coalesce(language, ''), {_bucket('coalesce(stars_count, 0)')}"
+    ))
+    if topics:
+        connection.execute(text(
+            f'INSERT INTO {TOPIC_TABLE} (topic, repositories, stars) '
+            f'SELECT topic, count(*), coalesce(sum(stars_count), 0) FROM ({topics}) AS topics '
+            f'GROUP BY topic'
+        ))
+
+
+def _fold_sql(dialect, counter):
+    keys, values = COUNTERS[counter]
+    columns = ', '.join(keys + values)
+    key_list = ', '.join(keys)
+    sums = ', '.join(keys + tuple(f'sum({value})' for value in values))
+    update = ', '.join(f'{value} = {counter}.{value} + excluded.{value}' for value in values)
+    upsert = f'ON CONFLICT ({key_list}) DO UPDATE SET {update}'
+    if dialect == 'postgresql':
+        # Taking and applying the deltas in one statement cannot lose rows committed in between
+        return [f'WITH folded AS (DELETE FROM {DELTA.format(counter)} RETURNING {columns}) '
+                f'INSERT INTO {counter} ({columns}) SELECT {sums} FROM folded '
+                f'GROUP BY {key_list} ORDER BY {key_list} {upsert}']
+    # SQLite holds the write lock from the first statement, so nothing is appended in between
+    return [f'INSERT INTO {counter} ({columns}) SELECT {sums} FROM {DELTA.format(counter)} WHERE true '
+            f'GROUP BY {key_list} ORDER BY {key_list} {upsert}',
+            f'DELETE FROM {DELTA.format(counter)}']
+
+
+def pending(connection):
+    """True if any delta is waiting to be folded (a read, no locks taken)"""
+    if connection.dialect.name not in ('sqlite', 'postgresql'):
+        return False
+    return connection.execute(text(
+        ' UNION ALL '.join(f'SELECT 1 FROM {DELTA.format(counter)}' for counter in COUNTERS) + ' LIMIT 1'
+    )).first() is not None
+
+
+def fold(connection):
+    """Apply pending deltas to the counters; the caller commits
+
+    Returns False without waiting if another connection is folding already.
+    """
+    dialect = connection.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        return False
+    if dialect == 'postgresql' and not connection.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext('repository_stats_fold'))")).scalar():
+        return False
+    for counter in COUNTERS:
+        for statement in _fold_sql(dialect, counter):
+            connection.execute(text(statement))
+    return True
+
+
+_next_fold = 0.0
+
+
+def fold_due(interval=STATS_FOLD_INTERVAL):
+    """True at most once per interval seconds in this process"""
+    global _next_fold
+    now = time.monotonic()
+    if now < _next_fold:
+        return False
+    _next_fold = now + interval
+    return True
+
+
+def install(table):
+    """Create the counters whenever metadata.create_all creates the table"""
+    event.listen(table, 'after_create', lambda target, connection, **kw: ensure(connection, target.name))
+
+
+def languages(connection, limit=20):
+    rows = connection.execute(text(
+        f'SELECT language, repositories, stars, forks FROM {LANGUAGE_TABLE} '
+        f'WHERE repositories > 0 ORDER BY repositories DESC, language LIMIT :limit'
+    ), {'limit': limit}).fetchall()
+    return [{'language': row.language or None, 'repositories': row.repositories,
+             'stars': row.stars, 'forks': row.forks} for row in rows]
+
+
+def topics(connection, limit=20):
+    rows = connection.execute(text(
+        f'SELECT topic, repositories, stars FROM {TOPIC_TABLE} '
+        f'WHERE repositories > 0 ORDER BY repositories DESC, topic LIMIT :limit'
+    ), {'limit': limit}).fetchall()
+    return [{'topic': row.topic, 'repositories': row.repositories, 'stars': row.stars} for row in rows]
+
+
+def star_distribution(connection, language=None):
+    """Repositories per star bucket, for one language ('' = none) or across all of them"""
+    if language is None:
+        rows = connection.execute(text(
+            f'SELECT bucket, sum(repositories) AS repositories FROM {STARS_TABLE} GROUP BY bucket'
+        )).fetchall()
+    else:
+        rows = connection.execute(text(
+            f'SELECT bucket, repositories FROM {STARS_TABLE} WHERE language = :language'
+        ), {'language': language}).fetchall()
+    counts = {row.bucket: row.repositories for row in rows}
+    return [{'min_stars': low, 'max_stars': high, 'repositories': max(counts.get(i, 0), 0)}
+            for i, (low, high) in enumerate(STAR_BUCKETS)]
+
+
+def summary(connection):
+    row = connection.execute(text(
+        f'SELECT coalesce(sum(repositories), 0) AS repositories, coalesce(sum(stars), 0) AS stars, '
+        f'coalesce(sum(forks), 0) AS forks, count(*) AS languages FROM {LANGUAGE_TABLE} '
+        f'WHERE repositories > 0'
+    )).one()
+    return {'repositories': row.repositories, 'stars': row.stars, 'forks': row.forks,
+            'languages': row.languages}
@@ -1,29 +1,108 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from sqlalchemy.exc import DBAPIError
 import requests
 import os
+import sys
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+import logging
+import click
+
+# Allow running this file directly as well as importing it as flask_backend.app
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_backend.conditional_cache import ConditionalCache
+from flask_backend.config import config
+from flask_backend import contents_proxy, database
+from flask_backend.github_client import GitHubClient, DEFAULT_CACHE_MAX_BYTES
+from flask_backend.hot_set import create_hot_set
+from flask_backend.metrics import instrument_app, span
+from flask_backend.overview import fetch_overview, overview_payload, parse_parts, part_endpoint
+from flask_backend.pagination import (
+    MAX_PER_PAGE, InvalidCursor, decode_cursor, encode_cursor, keyset_page, offset_page, parse_datetime
+)
+from flask_backend import aggregates, search_index
+from flask_backend.batch_lookup import (
+    BATCH_MAX_AGE, InvalidBatch, fetch_each, fetch_repositories, parse_names
+)
+from flask_backend.rate_limit import BACKGROUND, INTERACTIVE, QuotaExhausted, create_scheduler
+from flask_backend.search_analytics import (
+    SEARCH_PREWARM_IN_PROCESS, InvalidWindow, Prewarmer, SearchAnalytics
+)
+from flask_backend.search_cache import MISS, MemoryBackend, create_search_cache, normalize_search_key
+from flask_backend.search_derive import create_search_deriver
+from flask_backend.serialization import (
+    FastJSONProvider, InvalidFields, Serializer, compress_response, encode_with_fragments, select_fields
+)
+from flask_backend.singleflight import create_singleflight
+from flask_backend.sync import SYNC_INTERVAL, SyncEngine
+from flask_backend.traffic import InvalidRange, TrafficStore, parse_range, traffic_key
+from flask_backend.webhooks import (
+    GITHUB_WEBHOOK_SECRET, WEBHOOK_RECORD_DIR, change_for, post_delivery, record_delivery,
+    recorded_deliveries, verify_signature
+)
+from flask_backend.write_behind import create_write_behind
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# FLASK_CONFIG picks a profile from flask_backend/config.py (development, production, testing)
+app.config.from_object(config[os.environ.get('FLASK_CONFIG', os.environ.get('FLASK_ENV', 'default'))])
+app.config['SQLALCHEMY_DATABASE_URI'] = database.database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                      database.engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+app.json = FastJSONProvider(app)
+app.json.sort_keys = app.config['JSON_SORT_KEYS']
 
 # Initialize extensions
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+with app.app_context():
+    database.install(db.engine)
 CORS(app)
 
+class MigrateCommands(click.Group):
+    """`flask db` commands; Flask-Migrate (and Alembic) load only when they are used"""
+
+    def _commands(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_commands
+        if 'migrate' not in app.extensions:
+            Migrate(app, db)
+        return db_commands
+
+    def list_commands(self, ctx):
+        return self._commands().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._commands().get_command(ctx, name)
+
+app.cli.add_command(MigrateCommands('db', help='Perform database migrations.'))
+
+def dispose_connections():
+    """Drop pooled DB connections inherited from a parent process (call after fork)"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
 # GitHub API configuration
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
-GITHUB_API_BASE = 'https://api.github.com'
+# Calls are spread over GITHUB_TOKENS (plus GITHUB_TOKEN) by remaining quota
+upstream = create_scheduler()
+github = GitHubClient(
+    scheduler=upstream,
+    cache=ConditionalCache(DEFAULT_CACHE_MAX_BYTES) if DEFAULT_CACHE_MAX_BYTES else None
+)
+search_cache = create_search_cache()
+search_deriver = create_search_deriver()
+singleflight = create_singleflight()
+
+# Request timing, SQL counts and upstream quota at /metrics
+instrument_app(app, 'app', db=db, scheduler=upstream)
 
 # Database Models
 class Repository(db.Model):
@@ -35,13 +114,13 @@ class Repository(db.Model):
     html_url = db.Column(db.String(500), nullable=False)
     clone_url = db.Column(db.String(500), nullable=False)
     ssh_url = db.Column(db.String(500), nullable=False)
-    language = db.Column(db.String(100))
+    language = db.Column(db.String(100), index=True)
     stars_count = db.Column(db.Integer, default=0)
     forks_count = db.Column(db.Integer, default=0)
     watchers_count = db.Column(db.Integer, default=0)
     open_issues_count = db.Column(db.Integer, default=0)
     default_branch = db.Column(db.String(100), default='main')
-    topics = db.Column(db.JSON)
+    topics = db.Column(db.JSON(none_as_null=True))
     owner_login = db.Column(db.String(255), nullable=False)
     owner_avatar_url = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, nullable=False)
@@ -55,39 +134,47 @@ class Repository(db.Model):
     license_name = db.Column(db.String(100))
     license_spdx_id = db.Column(db.String(50))
 
-    def to_dict(self):
-        return {
-            'id': self.github_id,
-            'name': self.name,
-            'full_name': self.full_name,
-            'description': self.description,
-            'html_url': self.html_url,
-            'clone_url': self.clone_url,
-            'ssh_url': self.ssh_url,
-            'language': self.language,
-            'stargazers_count': self.stars_count,
-            'forks_count': self.forks_count,
-            'watchers_count': self.watchers_count,
-            'open_issues_count': self.open_issues_count,
-            'default_branch': self.default_branch,
-            'topics': self.topics or [],
-            'owner': {
-                'login': self.owner_login,
-                'avatar_url': self.owner_avatar_url
-            },
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'pushed_at': self.pushed_at.isoformat() if self.pushed_at else None,
-            'private': self.is_private,
-            'fork': self.is_fork,
-            'archived': self.archived,
-            'disabled': self.disabled,
-            'size': self.size,
-            'license': {
-                'name': self.license_name,
-                'spdx_id': self.license_spdx_id
-            } if self.license_name else None
-        }
+    # Keyset pagination order for saved repositories (also serves stars_count filters);
+    # case-insensitive owner/repo lookups for batch requests
+    __table_args__ = (db.Index('ix_repository_stars_github_id', 'stars_count', 'github_id'),
+                      db.Index('ix_repository_full_name_lower', db.func.lower(full_name)))
+
+    def to_dict(self, fields=None):
+        return repository_json.one(self, fields)
+
+# API field -> expression over a Repository (or its column mapping)
+REPOSITORY_JSON_FIELDS = {
+    'id': '%(github_id)s',
+    'name': '%(name)s',
+    'full_name': '%(full_name)s',
+    'description': '%(description)s',
+    'html_url': '%(html_url)s',
+    'clone_url': '%(clone_url)s',
+    'ssh_url': '%(ssh_url)s',
+    'language': '%(language)s',
+    'stargazers_count': '%(stars_count)s',
+    'forks_count': '%(forks_count)s',
+    'watchers_count': '%(watchers_count)s',
+    'open_issues_count': '%(open_issues_count)s',
+    'default_branch': '%(default_branch)s',
+    'topics': '%(topics)s or []',
+    'owner': "{'login': %(owner_login)s, 'avatar_url': %(owner_avatar_url)s}",
+    'created_at': '_iso(%(created_at)s)',
+    'updated_at': '_iso(%(updated_at)s)',
+    'pushed_at': '_iso(%(pushed_at)s)',
+    'private': '%(is_private)s',
+    'fork': '%(is_fork)s',
+    'archived': '%(archived)s',
+    'disabled': '%(disabled)s',
+    'size': '%(size)s',
+    'license': "{'name': %(license_name)s, 'spdx_id': %(license_spdx_id)s} if %(license_name)s else None"
+}
+repository_json = Serializer(REPOSITORY_JSON_FIELDS)
+repository_row_json = Serializer(REPOSITORY_JSON_FIELDS, source='item')
+
+# Keep the full-text index and the stats counters in step with the repository table
+search_index.install(Repository.__table__)
+aggregates.install(Repository.__table__)
 
 class SearchHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -95,150 +182,663 @@ class SearchHistory(db.Model):
     results_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (db.Index('ix_search_history_created_at_id', 'created_at', 'id'),)
+
+class SearchPopularity(db.Model):
+    """Searches per normalized query and first-page variant, bucketed by hour"""
+    __tablename__ = 'search_popularity'
+    query_text = db.Column(db.String(500), primary_key=True)
+    sort = db.Column(db.String(20), primary_key=True, default='')
+    sort_order = db.Column(db.String(10), primary_key=True, default='')
+    per_page = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hour = db.Column(db.DateTime, primary_key=True, index=True)
+    searches = db.Column(db.Integer, default=0)
+    results_count = db.Column(db.Integer, default=0)
+
+class RepositorySyncState(db.Model):
+    """Background sync bookkeeping for a saved repository"""
+    __tablename__ = 'repository_sync'
+    github_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    etag = db.Column(db.String(200))
+    synced_at = db.Column(db.DateTime, index=True)
+    failures = db.Column(db.Integer, default=0)
+
+class RepositoryTraffic(db.Model):
+    """Views and clones of a repository per day, kept beyond GitHub's 14 days"""
+    __tablename__ = 'repository_traffic'
+    repository = db.Column(db.String(255), primary_key=True)  # lower-case owner/repo
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, default=0)
+    view_uniques = db.Column(db.Integer, default=0)
+    clones = db.Column(db.Integer, default=0)
+    clone_uniques = db.Column(db.Integer, default=0)
+
+class TrafficIngestState(db.Model):
+    """When a repository's traffic was last fetched and the last day stored"""
+    __tablename__ = 'traffic_ingest'
+    repository = db.Column(db.String(255), primary_key=True)
+    kind = db.Column(db.String(10), primary_key=True)
+    fetched_at = db.Column(db.DateTime, index=True)
+    last_day = db.Column(db.Date)
+
+search_analytics = SearchAnalytics(db, SearchHistory, SearchPopularity)
+traffic_store = TrafficStore(db, RepositoryTraffic, TrafficIngestState)
+
+# Encoded JSON of recently read saved repositories, dropped when a write to them commits
+hot_set = create_hot_set(app.json.dumps_bytes, db.session)
+
 # Helper functions
-def make_github_request(endpoint, params=None):
-    """Make authenticated request to GitHub API"""
-    headers = {}
-    if GITHUB_TOKEN:
-        headers['Authorization'] = f'token {GITHUB_TOKEN}'
-    
-    url = f"{GITHUB_API_BASE}/{endpoint.lstrip('/')}"
-    
+def make_github_request(endpoint, params=None, priority=INTERACTIVE):
+    """Make authenticated request to GitHub API
+
+    Identical concurrent requests are coalesced into a single upstream call.
+    """
+    key = 'github:' + json.dumps([endpoint.lstrip('/'), params or {}], sort_keys=True)
+    return singleflight.do(key, lambda: _fetch_github(endpoint, params, priority))
+
+def _fetch_github(endpoint, params, priority):
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        with span('github'):
+            return github.get_json(endpoint, params, priority=priority)
     except requests.exceptions.RequestException as e:
         app.logger.error(f"GitHub API request failed: {str(e)}")
         return None
 
+# Columns that keep their stored value when a payload omits them
+PRESERVED_WHEN_MISSING = ('created_at', 'updated_at', 'pushed_at', 'license_name', 'license_spdx_id', 'topics')
+
+def parse_github_timestamps(values):
+    """Parse a column of GitHub ISO 8601 timestamps into naive UTC datetimes"""
+    parse = datetime.fromisoformat
+    return [parse(value).replace(tzinfo=None) if value else None for value in values]
+
+def repository_rows(items):
+    """Map a batch of GitHub repository payloads to Repository column values"""
+    created = parse_github_timestamps([item.get('created_at') for item in items])
+    updated = parse_github_timestamps([item.get('updated_at') for item in items])
+    pushed = parse_github_timestamps([item.get('pushed_at') for item in items])
+    
+    rows = []
+    for i, item in enumerate(items):
+        owner = item.get('owner') or {}
+        license = item.get('license') or {}
+        rows.append({
+            'github_id': item['id'],
+            'name': item.get('name', ''),
+            'full_name': item.get('full_name', ''),
+            'description': item.get('description', ''),
+            'html_url': item.get('html_url', ''),
+            'clone_url': item.get('clone_url', ''),
+            'ssh_url': item.get('ssh_url', ''),
+            'language': item.get('language'),
+            'stars_count': item.get('stargazers_count', 0),
+            'forks_count': item.get('forks_count', 0),
+            'watchers_count': item.get('watchers_count', 0),
+            'open_issues_count': item.get('open_issues_count', 0),
+            'default_branch': item.get('default_branch', 'main'),
+            'topics': item.get('topics'),
+            'owner_login': owner.get('login', ''),
+            'owner_avatar_url': owner.get('avatar_url', ''),
+            'is_private': item.get('private', False),
+            'is_fork': item.get('fork', False),
+            'archived': item.get('archived', False),
+            'disabled': item.get('disabled', False),
+            'size': item.get('size', 0),
+            'created_at': created[i],
+            'updated_at': updated[i],
+            'pushed_at': pushed[i],
+            'license_name': license.get('name'),
+            'license_spdx_id': license.get('spdx_id')
+        })
+    return rows
+
 def save_repository_to_db(repo_data):
     """Save or update repository data in database"""
-    repo = Repository.query.filter_by(github_id=repo_data['id']).first()
+    row = repository_rows([repo_data])[0]
+    repo = Repository.query.filter_by(github_id=row['github_id']).first()
     
     if not repo:
         repo = Repository()
+    if hot_set is not None:
+        hot_set.mark_written(db.session, [row['github_id']])
     
-    # Update repository fields  
-    repo.github_id = repo_data['id']
-    repo.name = repo_data.get('name', '')
-    repo.full_name = repo_data.get('full_name', '')
-    repo.description = repo_data.get('description', '')
-    repo.html_url = repo_data.get('html_url', '')
-    repo.clone_url = repo_data.get('clone_url', '')
-    repo.ssh_url = repo_data.get('ssh_url', '')
-    repo.language = repo_data.get('language')
-    repo.stars_count = repo_data.get('stargazers_count', 0)
-    repo.forks_count = repo_data.get('forks_count', 0)
-    repo.watchers_count = repo_data.get('watchers_count', 0)
-    repo.open_issues_count = repo_data.get('open_issues_count', 0)
-    repo.default_branch = repo_data.get('default_branch', 'main')
-    repo.topics = repo_data.get('topics', [])
-    repo.owner_login = repo_data.get('owner', {}).get('login', '')
-    repo.owner_avatar_url = repo_data.get('owner', {}).get('avatar_url', '')
-    repo.is_private = repo_data.get('private', False)
-    repo.is_fork = repo_data.get('fork', False)
-    repo.archived = repo_data.get('archived', False)
-    repo.disabled = repo_data.get('disabled', False)
-    repo.size = repo_data.get('size', 0)
-    
-    # Handle dates
-    if repo_data.get('created_at'):
-        repo.created_at = datetime.fromisoformat(repo_data['created_at'].replace('Z', '+00:00'))
-    if repo_data.get('updated_at'):
-        repo.updated_at = datetime.fromisoformat(repo_data['updated_at'].replace('Z', '+00:00'))
-    if repo_data.get('pushed_at'):
-        repo.pushed_at = datetime.fromisoformat(repo_data['pushed_at'].replace('Z', '+00:00'))
-    
-    # Handle license
-    if repo_data.get('license'):
-        repo.license_name = repo_data['license'].get('name')
-        repo.license_spdx_id = repo_data['license'].get('spdx_id')
+    for column, value in row.items():
+        if value is None and column in PRESERVED_WHEN_MISSING:
+            continue
+        setattr(repo, column, value)
     
     db.session.add(repo)
     return repo
 
-# API Routes
-@app.route('/api/search/repositories')
-def search_repositories():
-    query = request.args.get('q', '')
-    sort = request.args.get('sort', 'best-match')
-    order = request.args.get('order', 'desc')
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 30))
+_upsert_statements = {}
+
+def repository_upsert_statement(dialect):
+    """INSERT ... ON CONFLICT (github_id) DO UPDATE for SQLite/PostgreSQL, else None
+
+    Built once per dialect so SQLAlchemy's compiled cache is reused and the
+    driver can execute a whole page as one batched statement.
+    """
+    if dialect not in ('sqlite', 'postgresql'):
+        return None
+    if dialect not in _upsert_statements:
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        
+        table = Repository.__table__
+        stmt = insert(table)
+        updates = {
+            column.name: db.func.coalesce(stmt.excluded[column.name], column)
+            if column.name in PRESERVED_WHEN_MISSING else stmt.excluded[column.name]
+            for column in table.columns if column.name not in ('id', 'github_id')
+        }
+        _upsert_statements[dialect] = stmt.on_conflict_do_update(index_elements=['github_id'],
+                                                                 set_=updates)
+    return _upsert_statements[dialect]
+
+def upsert_repository_rows(rows):
+    """Write Repository column rows with the cheapest upsert the database supports
+
+    SQLite and PostgreSQL get one batched INSERT ... ON CONFLICT statement;
+    other databases fall back to one IN query for existing rows plus ORM writes.
+    """
+    unique_rows = list({row['github_id']: row for row in rows}.values())
+    if not unique_rows:
+        return
+    if hot_set is not None:
+        hot_set.mark_written(db.session, [row['github_id'] for row in unique_rows])
     
-    if not query:
-        return jsonify({'error': 'Query parameter is required'}), 400
+    upsert = repository_upsert_statement(db.session.get_bind().dialect.name)
+    if upsert is not None:
+        db.session.execute(upsert, unique_rows)
+        return
     
-    # Search GitHub API
-    params = {
+    ids = [row['github_id'] for row in unique_rows]
+    existing = {repo.github_id: repo for repo in
+                Repository.query.filter(Repository.github_id.in_(ids))}
+    for row in unique_rows:
+        repo = existing.get(row['github_id']) or Repository()
+        for column, value in row.items():
+            if value is None and column in PRESERVED_WHEN_MISSING and repo.id:
+                continue
+            setattr(repo, column, value)
+        db.session.add(repo)
+
+def save_repositories_to_db(items):
+    """Upsert a page of repositories and return their API dicts"""
+    rows = repository_rows(items)
+    upsert_repository_rows(rows)
+    return [Repository(**row).to_dict() for row in rows]
+
+_sync_state_statements = {}
+
+def mark_synced(github_ids, synced_at):
+    """Record repositories as just fetched, for batch lookups and the sync worker"""
+    github_ids = list(dict.fromkeys(github_ids))
+    if not github_ids:
+        return
+    
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect not in _sync_state_statements:
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            
+            stmt = insert(RepositorySyncState.__table__)
+            _sync_state_statements[dialect] = stmt.on_conflict_do_update(
+                index_elements=['github_id'], set_={'synced_at': stmt.excluded.synced_at, 'failures': 0}
+            )
+        db.session.execute(_sync_state_statements[dialect],
+                           [{'github_id': github_id, 'synced_at': synced_at, 'failures': 0}
+                            for github_id in github_ids])
+        return
+    
+    states = {state.github_id: state for state in
+              RepositorySyncState.query.filter(RepositorySyncState.github_id.in_(github_ids))}
+    for github_id in github_ids:
+        state = states.get(github_id) or RepositorySyncState(github_id=github_id)
+        state.synced_at = synced_at
+        state.failures = 0
+        db.session.add(state)
+
+def delete_repositories(github_ids):
+    """Remove repositories GitHub reports as deleted, with their sync state"""
+    if not github_ids:
+        return
+    if hot_set is not None:
+        hot_set.mark_written(db.session, github_ids)
+    Repository.query.filter(Repository.github_id.in_(github_ids)).delete(synchronize_session=False)
+    RepositorySyncState.query.filter(RepositorySyncState.github_id.in_(github_ids)).delete(
+        synchronize_session=False)
+
+def invalidate_cached_repositories(records):
+    """Drop cached responses showing repositories a webhook reported as changed
+
+    Search pages and derived search pools are served without asking GitHub,
+    so they are dropped whenever they list one of the repositories. ETag
+    entries are revalidated anyway and are dropped only to free their space.
+    """
+    if not records:
+        return
+    github_ids = [record['github_id'] for record in records]
+    search_cache.invalidate_repositories(github_ids)
+    if search_deriver is not None:
+        search_deriver.invalidate_repositories(github_ids)
+    if github.cache is not None:
+        for record in records:
+            github.cache.invalidate(github.url_for(f"repos/{record['full_name'].lower()}"))
+
+def webhook_row_is_older(row, than):
+    """True if row's updated_at or pushed_at is before the one in than"""
+    return any(row[column] is not None and than[column] is not None and row[column] < than[column]
+               for column in ('updated_at', 'pushed_at'))
+
+def current_webhook_rows(rows):
+    """The newest webhook row per saved repository, unless what is stored is newer
+
+    Redelivered and out-of-order deliveries carry older updated_at/pushed_at
+    values; applying them would roll back newer counts.
+    """
+    newest = {}
+    for row in rows:
+        current = newest.get(row['github_id'])
+        if current is None or not webhook_row_is_older(row, current):
+            newest[row['github_id']] = row
+    if not newest:
+        return []
+    stored = {record.github_id: record._mapping for record in db.session.query(
+        Repository.github_id, Repository.updated_at, Repository.pushed_at
+    ).filter(Repository.github_id.in_(list(newest)))}
+    return [row for github_id, row in newest.items()
+            if github_id in stored and not webhook_row_is_older(row, stored[github_id])]
+
+def flush_pending_writes(batch):
+    """Persist a batch of queued repository rows and search history records
+
+    'synced_repositories' rows are full fetches and also refresh their sync state.
+    'webhook_repositories' payloads update saved repositories only (webhooks
+    also cover repositories nobody has looked up) and count as a sync, unless
+    the stored row is newer.
+    """
+    rows = []
+    synced = []
+    history = []
+    pushed = []
+    deleted = []
+    for kind, payload in batch:
+        if kind == 'repositories':
+            rows.extend(payload)
+        elif kind == 'synced_repositories':
+            rows.extend(payload)
+            synced.extend(row['github_id'] for row in payload)
+        elif kind == 'webhook_repositories':
+            pushed.extend(repository_rows(payload))
+        elif kind == 'deleted_repositories':
+            deleted.extend(payload)
+        elif kind == 'search_history':
+            history.append(payload)
+    
+    with app.app_context():
+        try:
+            if pushed:
+                pushed = current_webhook_rows(pushed)
+                rows.extend(pushed)
+                synced.extend(row['github_id'] for row in pushed)
+            upsert_repository_rows(rows)
+            mark_synced(synced, datetime.utcnow())
+            delete_repositories([record['github_id'] for record in deleted])
+            db.session.add_all([SearchHistory(query=record['query'], results_count=record['results_count'],
+                                              created_at=record['created_at']) for record in history])
+            search_analytics.record(history)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    invalidate_cached_repositories(pushed + deleted)
+    with app.app_context():
+        fold_stats()
+
+def fold_stats():
+    """Fold pending stats deltas into the counters, at most every STATS_FOLD_INTERVAL seconds
+
+    Called by the flusher and by the stats readers, so counters catch up once
+    writes stop. With nothing pending it costs one EXISTS read and never
+    opens a write transaction.
+    """
+    if not aggregates.fold_due():
+        return
+    try:
+        if not aggregates.pending(db.session.connection()):
+            return
+        db.session.commit()  # end the read so the fold starts a write transaction of its own
+        aggregates.fold(db.session.connection())
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Stats fold error: {str(e)}")
+
+write_behind = create_write_behind(flush_pending_writes, logger=app.logger)
+
+def persist(kind, payload):
+    """Queue a write for the background flusher, or write it now if the queue is off or full"""
+    if write_behind is not None and write_behind.enqueue(kind, payload):
+        return
+    try:
+        flush_pending_writes([(kind, payload)])
+    except Exception as e:
+        app.logger.error(f"Database error: {str(e)}")
+
+# Route logic shared with the asyncio server in flask_backend/asgi.py
+def parse_search_args(args):
+    """Read (query, sort, order, page, per_page) from request arguments"""
+    return (
+        args.get('q', ''),
+        args.get('sort', 'best-match'),
+        args.get('order', 'desc'),
+        int(args.get('page', 1)),
+        int(args.get('per_page', 30))
+    )
+
+def search_github_params(query, sort, order, page, per_page):
+    return {
         'q': query,
         'sort': sort if sort != 'best-match' else None,
         'order': order,
         'page': page,
         'per_page': per_page
     }
+
+def record_search(query, results_count, sort, order, per_page):
+    persist('search_history', {
+        'query': query,
+        'results_count': results_count,
+        'created_at': datetime.utcnow(),
+        'sort': sort,
+        'order': order,
+        'per_page': per_page
+    })
+
+def fetch_search_page(params, priority=INTERACTIVE):
+    """Fetch a search page from GitHub and queue its repositories for saving"""
+    data = make_github_request('search/repositories', params, priority=priority)
+    if data:
+        persist('repositories', repository_rows(data.get('items', [])))
+    return data
+
+def search_response(query, data, fields=None, sort='best-match', order='desc', per_page=30, page=1,
+                    fetched=False):
+    """Queue persistence of a search page and build its API payload
+
+    Repositories are saved only for pages just fetched from GitHub (fetched);
+    cached pages were saved when they were fetched.
+    """
+    record_search(query, data.get('total_count', 0), sort, order, per_page)
+    rows = repository_rows(data.get('items', []))
+    if fetched:
+        persist('repositories', rows)
+    if search_deriver is not None:
+        search_deriver.add_page(query, sort, order, page, per_page, data, rows)
     
-    data = make_github_request('search/repositories', params)
+    return {
+        'total_count': data.get('total_count', 0),
+        'incomplete_results': data.get('incomplete_results', False),
+        'source': 'upstream',
+        'repositories': repository_row_json.many(rows, fields)
+    }
+
+def derived_search_response(query, fields=None, sort='best-match', order='desc', per_page=30, page=1):
+    """API payload for a search computed from pooled results of an earlier one, or None"""
+    if search_deriver is None:
+        return None
+    derived = search_deriver.derive(query, sort, order, page, per_page)
+    if derived is None:
+        return None
+    record_search(query, derived['total_count'], sort, order, per_page)
+    return {
+        'total_count': derived['total_count'],
+        'incomplete_results': False,
+        'source': 'derived',
+        'repositories': repository_row_json.many(derived['rows'], fields)
+    }
+
+def prewarm_search(query, sort, order, per_page):
+    """Fetch the first page of a popular search for the prewarmer"""
+    params = search_github_params(query, sort, order, 1, per_page)
+    return fetch_search_page(params, priority=BACKGROUND)
+
+search_prewarmer = Prewarmer(search_analytics, search_cache, prewarm_search, scheduler=upstream,
+                             logger=app.logger)
+
+def repository_response(data):
+    """Queue persistence of a full repository fetch and return its API dict
+
+    The row is persisted as synced, so batch lookups serve it locally until
+    it is older than their max_age.
+    """
+    rows = repository_rows([data])
+    persist('synced_repositories', rows)
+    return repository_row_json.one(rows[0])
+
+def saved_repositories_by_name(names):
+    """{lower-case "owner/repo": (github_id, last sync time)} for saved repositories among names"""
+    rows = db.session.query(Repository.github_id, Repository.full_name, RepositorySyncState.synced_at).outerjoin(
+        RepositorySyncState, RepositorySyncState.github_id == Repository.github_id
+    ).filter(db.func.lower(Repository.full_name).in_([name.lower() for name in names])).all()
+    return {row.full_name.lower(): (row.github_id, row.synced_at) for row in rows}
+
+def saved_repository_items(github_ids, fields=None):
+    """{github_id: API item} for saved repositories
+
+    With the hot set on, items are encoded JSON (bytes, for list_response):
+    held repositories skip the ORM and the rest are loaded in one query and
+    admitted. A ?fields= projection decodes them again.
+    """
+    if hot_set is None:
+        return {repository.github_id: repository_json.one(repository, fields) for repository in
+                Repository.query.filter(Repository.github_id.in_(github_ids))} if github_ids else {}
     
-    if not data:
-        return jsonify({'error': 'Failed to fetch from GitHub API'}), 500
+    token = hot_set.begin_read()
+    items = hot_set.get_many(github_ids)
+    missing = [github_id for github_id in github_ids if github_id not in items]
+    if missing:
+        for repository in Repository.query.filter(Repository.github_id.in_(missing)):
+            items[repository.github_id] = hot_set.admit(repository.github_id, repository_json.one(repository),
+                                                        token)
+    if fields:
+        return {github_id: select_fields(app.json.loads(item), fields) for github_id, item in items.items()}
+    return items
+
+def list_response(obj, key, items):
+    """JSON response for obj with obj[key] = items, splicing encoded items in as they are"""
+    if not any(isinstance(item, bytes) for item in items):
+        return jsonify(dict(obj, **{key: items}))
+    return app.response_class(encode_with_fragments(app.json.dumps_bytes, obj, key, items) + b'\n',
+                              mimetype=app.json.mimetype)
+
+def fetch_repository_payloads(names):
+    """Fetch names from GitHub: GraphQL chunks with a token, one REST call each without"""
+    with span('github'):
+        if any(upstream.tokens):
+            return fetch_repositories(github, names, logger=app.logger)
+        return fetch_each(github, names, logger=app.logger)
+
+def repository_key(owner, repo):
+    return f'repository:{owner.lower()}/{repo.lower()}'
+
+def contents_endpoint(owner, repo, path=''):
+    return f'repos/{owner}/{repo}/contents/{path}' if path else f'repos/{owner}/{repo}/contents'
+
+# API Routes
+@app.route('/api/search/repositories')
+def search_repositories():
+    query, sort, order, page, per_page = parse_search_args(request.args)
     
-    # Save search history
-    search_record = SearchHistory()
-    search_record.query = query
-    search_record.results_count = data.get('total_count', 0)
-    db.session.add(search_record)
+    if not query:
+        return jsonify({'error': 'Query parameter is required'}), 400
     
-    # Save repositories to database
-    repositories = []
-    for item in data.get('items', []):
-        repo = save_repository_to_db(item)
-        repositories.append(repo.to_dict())
+    fields = repository_json.parse_fields(request.args.get('fields'))
     
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        app.logger.error(f"Database error: {str(e)}")
+    # Re-sorted, filtered or re-paged variants of a search we hold in full cost no quota
+    derived = derived_search_response(query, fields, sort, order, per_page, page)
+    if derived is not None:
+        response = jsonify(derived)
+        response.headers['X-Cache'] = 'DERIVED'
+        return response
     
-    return jsonify({
-        'total_count': data.get('total_count', 0),
-        'incomplete_results': data.get('incomplete_results', False),
-        'repositories': repositories
-    })
+    # Search GitHub API
+    params = search_github_params(query, sort, order, page, per_page)
+    cache_key = normalize_search_key(query, sort, order, page, per_page)
+    # Background refreshes save their repositories themselves
+    data, cache_state = search_cache.get_or_fetch(
+        cache_key, lambda: make_github_request('search/repositories', params),
+        refresh=lambda: fetch_search_page(params, priority=BACKGROUND)
+    )
+    
+    if not data:
+        return jsonify({'error': 'Failed to fetch from GitHub API'}), 500
+    
+    # Save search history and repositories without blocking the response
+    response = jsonify(search_response(query, data, fields, sort, order, per_page, page,
+                                       fetched=cache_state == MISS))
+    response.headers['X-Cache'] = cache_state
+    return response
 
 @app.route('/api/repositories/<owner>/<repo>')
 def get_repository(owner, repo):
-    """Get detailed repository information"""
-    data = make_github_request(f'repos/{owner}/{repo}')
+    """Get detailed repository information (?fields=a,b limits the keys returned)"""
+    fields = repository_json.parse_fields(request.args.get('fields'))
     
-    if not data:
+    # Concurrent hits for the same repository share one fetch and one upsert
+    repository = singleflight.do(repository_key(owner, repo),
+                                 lambda: fetch_and_save_repository(owner, repo))
+    
+    if not repository:
         return jsonify({'error': 'Repository not found'}), 404
     
-    # Save to database
-    repository = save_repository_to_db(data)
+    return jsonify(select_fields(repository, fields))
+
+@app.route('/api/repositories/batch', methods=['POST'])
+def get_repositories_batch():
+    """Look up many repositories in one request
+
+    Body: {"repositories": ["owner/repo", ...], "max_age": seconds}. Saved
+    repositories synced within max_age (default BATCH_MAX_AGE) are answered
+    from the database; the rest are fetched from GitHub in GraphQL chunks and
+    saved with one bulk write. If GitHub cannot be reached, older saved copies
+    are served instead. Results keep the request order; names GitHub does not
+    know are listed in missing, names that could not be fetched in unavailable.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object body'}), 400
     
+    fields = repository_json.parse_fields(request.args.get('fields'))
     try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        app.logger.error(f"Database error: {str(e)}")
+        names = parse_names(body.get('repositories'))
+        max_age = max(int(body.get('max_age', BATCH_MAX_AGE)), 0)
+    except InvalidBatch as e:
+        return jsonify({'error': str(e)}), 400
+    except (TypeError, ValueError):
+        return jsonify({'error': 'max_age must be a number of seconds'}), 400
+    
+    saved = saved_repositories_by_name(names)
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    fresh = {}
+    remainder = []
+    for name in names:
+        github_id, synced_at = saved.get(name.lower(), (None, None))
+        if github_id is not None and synced_at is not None and synced_at >= cutoff:
+            fresh[name] = github_id
+        else:
+            remainder.append(name)
+    items = saved_repository_items(list(fresh.values()), fields)
+    results = {name: items[github_id] for name, github_id in fresh.items() if github_id in items}
+    
+    sources = {'local': len(results), 'github': 0, 'stale': 0}
+    missing = []
+    unavailable = []
+    if remainder:
+        found, missing, failed = fetch_repository_payloads(remainder)
+        rows = repository_rows(list(found.values()))
+        if rows:
+            persist('synced_repositories', rows)
+        for name, row in zip(found, rows):
+            results[name] = repository_row_json.one(row, fields)
+        sources['github'] = len(rows)
+        
+        stale = {name: saved[name.lower()][0] for name in failed if name.lower() in saved}
+        items = saved_repository_items(list(stale.values()), fields)
+        for name in failed:
+            if name in stale and stale[name] in items:
+                results[name] = items[stale[name]]
+                sources['stale'] += 1
+            else:
+                unavailable.append(name)
+    
+    return list_response({
+        'repositories': None,
+        'missing': missing,
+        'unavailable': unavailable,
+        'sources': sources
+    }, 'repositories', [results[name] for name in names if name in results])
+
+def fetch_and_save_repository(owner, repo):
+    """Fetch a repository from GitHub, queue its upsert and return its API dict"""
+    data = make_github_request(f'repos/{owner}/{repo}')
+    
+    if not data:
+        return None
     
-    return jsonify(repository.to_dict())
+    return repository_response(data)
 
 @app.route('/api/repositories/<owner>/<repo>/contents')
 @app.route('/api/repositories/<owner>/<repo>/contents/<path:path>')
 def get_repository_contents(owner, repo, path=''):
-    """Get repository file contents"""
-    endpoint = f'repos/{owner}/{repo}/contents/{path}' if path else f'repos/{owner}/{repo}/contents'
-    data = make_github_request(endpoint)
+    """Get repository file contents
+
+    ?stream=1 relays GitHub's JSON without parsing it and ?raw=1 serves the
+    file bytes themselves (with Range support), both in chunks.
+    """
+    raw = contents_proxy.wants_raw(request.args)
+    if raw or contents_proxy.wants_stream(request.args):
+        return stream_repository_contents(owner, repo, path, raw)
+    
+    data = make_github_request(contents_endpoint(owner, repo, path))
     
     if not data:
         return jsonify({'error': 'Contents not found'}), 404
     
     return jsonify(data)
 
+def stream_repository_contents(owner, repo, path, raw):
+    """Relay a contents response from GitHub chunk by chunk"""
+    accept_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    headers = contents_proxy.upstream_headers(request.headers, raw, accept_gzip)
+    
+    try:
+        upstream_response = github.get(contents_endpoint(owner, repo, path), headers=headers, stream=True)
+    except requests.exceptions.RequestException as e:
+        app.logger.error(f"GitHub API request failed: {str(e)}")
+        return jsonify({'error': 'Failed to fetch from GitHub API'}), 500
+    
+    status = upstream_response.status_code
+    if status not in contents_proxy.PASSTHROUGH_STATUSES:
+        upstream_response.close()
+        if status == 404:
+            return jsonify({'error': 'Contents not found'}), 404
+        app.logger.error(f"GitHub API request failed: {status} for {upstream_response.url}")
+        return jsonify({'error': 'Failed to fetch from GitHub API'}), 500
+    
+    status, headers, decode, skip, length = contents_proxy.plan_response(
+        status, upstream_response.headers, request.headers, path, raw, accept_gzip
+    )
+    chunks = upstream_response.raw.stream(contents_proxy.CHUNK_SIZE, decode_content=decode)
+    body = contents_proxy.iter_body(chunks, skip, length, close=upstream_response.close)
+    return Response(body, status=status, headers=headers, direct_passthrough=True)
+
 @app.route('/api/repositories/<owner>/<repo>/languages')
 def get_repository_languages(owner, repo):
     """Get repository programming languages"""
@@ -249,70 +849,297 @@ def get_repository_languages(owner, repo):
     
     return jsonify(data)
 
+def ingest_traffic(owner, repo, kind, data):
+    """Add a GitHub traffic reply to the local history"""
+    try:
+        traffic_store.ingest(traffic_key(owner, repo), kind, data)
+        db.session.commit()
+    except DBAPIError as e:
+        db.session.rollback()
+        app.logger.error(f"Error saving {kind} traffic for {owner}/{repo}: {str(e)}")
+
+def ingest_overview_traffic(owner, repo, results):
+    """Add the traffic parts of an overview to the local history when they are due
+
+    Shared with the asyncio server, which calls it outside an app context.
+    """
+    kinds = [kind for kind in ('views', 'clones') if results.get(kind)]
+    if not kinds:
+        return
+    with app.app_context():
+        for kind in kinds:
+            if traffic_store.due(traffic_key(owner, repo), kind):
+                ingest_traffic(owner, repo, kind, results[kind])
+
+def repository_traffic(owner, repo, kind):
+    """Traffic of one kind from the local history, refreshed from GitHub when due
+
+    ?since= and ?until= (YYYY-MM-DD) select the range, by default the last 14
+    days; ?per=week or ?per=month rolls the days up. If GitHub cannot be
+    reached, or we lack push access, the stored history is served as it is.
+    """
+    try:
+        since, until, per = parse_range(request.args)
+    except InvalidRange as e:
+        return jsonify({'error': str(e)}), 400
+    
+    name = traffic_key(owner, repo)
+    if traffic_store.due(name, kind):
+        data = make_github_request(f'repos/{owner}/{repo}/traffic/{kind}')
+        if data:
+            ingest_traffic(owner, repo, kind, data)
+        elif not traffic_store.has_history(name, kind):
+            return jsonify({'error': 'Traffic data not available'}), 404
+    
+    return jsonify(traffic_store.series(name, kind, since, until, per))
+
 @app.route('/api/repositories/<owner>/<repo>/traffic/views')
 def get_repository_views(owner, repo):
     """Get repository view traffic"""
-    data = make_github_request(f'repos/{owner}/{repo}/traffic/views')
-    
-    if not data:
-        return jsonify({'error': 'Traffic data not available'}), 404
-    
-    return jsonify(data)
+    return repository_traffic(owner, repo, 'views')
 
 @app.route('/api/repositories/<owner>/<repo>/traffic/clones')
 def get_repository_clones(owner, repo):
     """Get repository clone traffic"""
-    data = make_github_request(f'repos/{owner}/{repo}/traffic/clones')
+    return repository_traffic(owner, repo, 'clones')
+
+@app.route('/api/repositories/<owner>/<repo>/overview')
+def get_repository_overview(owner, repo):
+    """Get repository details, languages, contents and traffic in one response"""
+    parts = parse_parts(request.args.get('include'))
     
-    if not data:
-        return jsonify({'error': 'Traffic data not available'}), 404
+    if parts is None:
+        return jsonify({'error': 'Unknown part in include parameter'}), 400
     
-    return jsonify(data)
+    def fetch_part(part):
+        if part == 'repository':
+            return singleflight.do(repository_key(owner, repo),
+                                   lambda: fetch_and_save_repository(owner, repo))
+        return make_github_request(part_endpoint(part, owner, repo))
+    
+    results = fetch_overview(owner, repo, parts, fetch_part, app.logger)
+    ingest_overview_traffic(owner, repo, results)
+    payload, status = overview_payload(results)
+    return jsonify(payload), status
 
 @app.route('/api/search/history')
 def get_search_history():
-    """Get recent search history"""
-    searches = SearchHistory.query.order_by(SearchHistory.created_at.desc()).limit(20).all()
+    """Get recent search history, newest first
+
+    The body stays a plain list; the continuation token for the next page is
+    returned in the X-Next-Cursor header and, with include_total=1, the number
+    of stored searches in X-Total-Count.
+    """
+    per_page = max(min(int(request.args.get('per_page', 20)), MAX_PER_PAGE), 1)
+    cursor = request.args.get('cursor')
+    
+    try:
+        after = decode_cursor(cursor, (parse_datetime, int)) if cursor else None
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify([{
+    # SearchHistory.query is the query column, not the Flask-SQLAlchemy query property
+    query = db.session.query(SearchHistory)
+    columns = (SearchHistory.created_at, SearchHistory.id)
+    searches, more = keyset_page(query, columns, after, per_page)
+    
+    response = jsonify([{
         'id': search.id,
         'query': search.query,
         'results_count': search.results_count,
         'created_at': search.created_at.isoformat()
     } for search in searches])
+    if more:
+        response.headers['X-Next-Cursor'] = encode_cursor([searches[-1].created_at, searches[-1].id])
+    if request.args.get('include_total') in ('1', 'true'):
+        response.headers['X-Total-Count'] = str(query.count())
+    return response
+
+@app.route('/api/search/popular')
+def get_popular_searches():
+    """Most searched queries in a rolling window (?window=1h|24h|7d|30d)"""
+    window = request.args.get('window', '24h')
+    limit = min(int(request.args.get('limit', 20)), MAX_PER_PAGE)
+    
+    try:
+        searches = search_analytics.popular(window, limit)
+    except InvalidWindow as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'window': window, 'searches': searches})
+
+@app.route('/api/search/local')
+def search_saved_repositories():
+    """Full-text search over saved repositories without using GitHub quota"""
+    query = request.args.get('q', '')
+    language = request.args.get('language')
+    min_stars = request.args.get('min_stars', type=int)
+    fields = repository_json.parse_fields(request.args.get('fields'))
+    page = max(int(request.args.get('page', 1)), 1)
+    per_page = min(int(request.args.get('per_page', 30)), 100)
+    
+    if not query:
+        return jsonify({'error': 'Query parameter is required'}), 400
+    
+    try:
+        total, ids = search_index.search(db.session.connection(), Repository.__tablename__, query,
+                                         language=language, min_stars=min_stars,
+                                         limit=per_page, offset=(page - 1) * per_page)
+    except DBAPIError as e:
+        db.session.rollback()
+        app.logger.error(f"Local search failed: {str(e)}")
+        return jsonify({'error': 'Search index unavailable, run flask rebuild-search-index'}), 503
+    
+    by_id = {repo.id: repo for repo in Repository.query.filter(Repository.id.in_(ids))} if ids else {}
+    
+    return jsonify({
+        'total_count': total,
+        'repositories': repository_json.many([by_id[i] for i in ids if i in by_id], fields),
+        'current_page': page,
+        'source': 'local'
+    })
 
 @app.route('/api/repositories/saved')
 def get_saved_repositories():
-    """Get repositories saved in database"""
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 30))
+    """Get repositories saved in database, most starred first
+
+    Pass the returned next_cursor as ?cursor= to fetch the following page, and
+    include_total=1 to also count every matching repository. Requests without
+    a cursor also get total, pages and current_page, and ?page= still selects
+    a numbered page.
+    """
+    per_page = max(min(int(request.args.get('per_page', 30)), MAX_PER_PAGE), 1)
+    page = max(int(request.args.get('page', 1)), 1)
     language = request.args.get('language')
+    cursor = request.args.get('cursor')
+    fields = repository_json.parse_fields(request.args.get('fields'))
+    
+    try:
+        after = decode_cursor(cursor, (int, int)) if cursor else None
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
     query = Repository.query
     
     if language:
         query = query.filter(Repository.language.ilike(f'%{language}%'))
     
-    repositories = query.order_by(Repository.stars_count.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    columns = (Repository.stars_count, Repository.github_id)
+    # Only the sort keys are read with the hot set on; the repositories come from it
+    rows_query = query.with_entities(*columns) if hot_set is not None else query
+    if after is not None:
+        rows, more = keyset_page(rows_query, columns, after, per_page)
+    else:
+        rows, more = offset_page(rows_query, columns, page, per_page)
+    last = rows[-1] if rows else None
+    
+    response = {
+        'repositories': None,
+        'next_cursor': encode_cursor([last.stars_count, last.github_id]) if more else None,
+        'per_page': per_page
+    }
+    if after is None:
+        total = query.order_by(None).count()
+        response.update(total=total, pages=(total + per_page - 1) // per_page, current_page=page)
+    elif request.args.get('include_total') in ('1', 'true'):
+        response['total'] = query.order_by(None).count()
+    if hot_set is None:
+        response['repositories'] = repository_json.many(rows, fields)
+        return jsonify(response)
     
+    items = saved_repository_items([row.github_id for row in rows], fields)
+    return list_response(response, 'repositories', [items[row.github_id] for row in rows if row.github_id in items])
+
+@app.route('/api/stats/languages')
+def get_language_stats():
+    """Saved repositories, stars and forks per language, most repositories first"""
+    limit = min(int(request.args.get('limit', 20)), MAX_PER_PAGE)
+    fold_stats()
+    connection = db.session.connection()
+    return jsonify({
+        'languages': aggregates.languages(connection, limit),
+        'totals': aggregates.summary(connection)
+    })
+
+@app.route('/api/stats/topics')
+def get_topic_stats():
+    """Most common topics among saved repositories"""
+    limit = min(int(request.args.get('limit', 20)), MAX_PER_PAGE)
+    fold_stats()
+    return jsonify({'topics': aggregates.topics(db.session.connection(), limit)})
+
+@app.route('/api/stats/stars')
+def get_star_distribution():
+    """Saved repositories per star bucket, optionally for one language (?language=)"""
+    language = request.args.get('language')
+    fold_stats()
     return jsonify({
-        'repositories': [repo.to_dict() for repo in repositories.items],
-        'total': repositories.total,
-        'pages': repositories.pages,
-        'current_page': page
+        'language': language,
+        'buckets': aggregates.star_distribution(db.session.connection(), language)
     })
 
+@app.route('/api/webhooks/github', methods=['POST'])
+def github_webhook():
+    """Apply a GitHub webhook delivery to the saved repositories
+
+    The signature is checked against GITHUB_WEBHOOK_SECRET and the change is
+    queued for the write-behind flusher, so bursts of deliveries cost each
+    request a parse and an enqueue. Repository rows are updated in place,
+    which also drops them from the hot set, and their sync time is pushed
+    back so the sync worker does not poll them again.
+    """
+    if not GITHUB_WEBHOOK_SECRET:
+        return jsonify({'error': 'Webhooks are not configured'}), 404
+    
+    body = request.get_data()
+    if not verify_signature(GITHUB_WEBHOOK_SECRET, body, request.headers.get('X-Hub-Signature-256')):
+        return jsonify({'error': 'Invalid signature'}), 401
+    
+    event = request.headers.get('X-GitHub-Event', '')
+    delivery = request.headers.get('X-GitHub-Delivery', '')
+    try:
+        payload = app.json.loads(body)
+    except ValueError:
+        return jsonify({'error': 'Expected a JSON body'}), 400
+    
+    if WEBHOOK_RECORD_DIR:
+        try:
+            record_delivery(WEBHOOK_RECORD_DIR, event, delivery, payload)
+        except OSError as e:
+            app.logger.error(f"Error recording webhook delivery {delivery}: {str(e)}")
+    
+    change = change_for(event, payload)
+    if change is None:
+        return jsonify({'event': event, 'delivery': delivery, 'status': 'ignored'})
+    persist(*change)
+    return jsonify({'event': event, 'delivery': delivery, 'status': 'accepted'}), 202
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
-        'github_token_configured': bool(GITHUB_TOKEN)
+        'github_token_configured': bool(GITHUB_TOKEN),
+        'github_quota': upstream.snapshot(),
+        'github_cache': github.cache.stats() if github.cache else None,
+        'search_cache': search_cache.snapshot(),
+        'search_deriver': search_deriver.snapshot() if search_deriver else None,
+        'singleflight': singleflight.snapshot(),
+        'write_behind': write_behind.snapshot() if write_behind else None,
+        'hot_set': hot_set.snapshot() if hot_set else None
     })
 
+if SEARCH_PREWARM_IN_PROCESS:
+    @app.before_request
+    def start_search_prewarm():
+        search_prewarmer.ensure_running(app)
+
+@app.after_request
+def compress_json_response(response):
+    """gzip/brotli larger JSON responses for clients that accept it"""
+    return compress_response(response, request.headers.get('Accept-Encoding', ''))
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -323,6 +1150,17 @@ def internal_error(error):
     db.session.rollback()
     return jsonify({'error': 'Internal server error'}), 500
 
+@app.errorhandler(InvalidFields)
+def invalid_fields(error):
+    return jsonify({'error': str(error)}), 400
+
+@app.errorhandler(QuotaExhausted)
+def quota_exhausted(error):
+    app.logger.error(f"GitHub API request rejected: {str(error)}")
+    response = jsonify({'error': 'GitHub API rate limit exhausted, try again later'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
 # CLI commands
 @app.cli.command()
 def init_db():
@@ -330,6 +1168,119 @@ def init_db():
     db.create_all()
     print("Database initialized!")
 
+@app.cli.command('create-indexes')
+def create_indexes():
+    """Create indexes added to the models since the tables were created"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    print("Indexes created!")
+
+@app.cli.command('sync-repositories')
+@click.option('--once', is_flag=True, help='Run a single cycle instead of looping')
+@click.option('--budget', type=int, help='Maximum GitHub calls per cycle')
+@click.option('--concurrency', type=int, help='Parallel GitHub calls')
+@click.option('--interval', type=int, default=SYNC_INTERVAL, help='Seconds between cycles')
+def sync_repositories(once, budget, concurrency, interval):
+    """Refresh saved repositories from GitHub, most stale and popular first"""
+    app.logger.setLevel(logging.INFO)
+    engine = SyncEngine(db, Repository, RepositorySyncState, github, repository_rows,
+                        preserved=PRESERVED_WHEN_MISSING, logger=app.logger)
+    if budget is not None:
+        engine.budget = budget
+    if concurrency is not None:
+        engine.concurrency = concurrency
+    if once:
+        print(f"Repository sync: {engine.run_cycle()}")
+    else:
+        engine.run_forever(interval)
+
+@app.cli.command('ingest-traffic')
+@click.argument('repositories', nargs=-1)
+def ingest_traffic_command(repositories):
+    """Fetch views and clones into the local history (default: every tracked repository that is due)"""
+    app.logger.setLevel(logging.INFO)
+    days = 0
+    fetched = 0
+    for kind in ('views', 'clones'):
+        names = [name.lower() for name in repositories] or traffic_store.tracked(kind)
+        for name in names:
+            owner, _, repo = name.partition('/')
+            data = make_github_request(f'repos/{owner}/{repo}/traffic/{kind}', priority=BACKGROUND)
+            if not data:
+                continue
+            days += traffic_store.ingest(name, kind, data)
+            db.session.commit()
+            fetched += 1
+    print(f"Traffic ingested: {fetched} fetches, {days} days written")
+
+@app.cli.command('replay-webhooks')
+@click.argument('paths', nargs=-1, required=True)
+@click.option('--url', help='POST signed deliveries to this webhook URL instead of applying them here')
+def replay_webhooks(paths, url):
+    """Replay recorded webhook deliveries (files or directories from WEBHOOK_RECORD_DIR)"""
+    if url:
+        if not GITHUB_WEBHOOK_SECRET:
+            raise click.UsageError('GITHUB_WEBHOOK_SECRET is needed to sign deliveries')
+        session = requests.Session()
+        for event, delivery, payload in recorded_deliveries(paths):
+            response = post_delivery(session, url, GITHUB_WEBHOOK_SECRET, event, delivery, payload)
+            print(f"{delivery} {event}: {response.status_code}")
+        return
+    
+    applied = 0
+    ignored = 0
+    for event, delivery, payload in recorded_deliveries(paths):
+        change = change_for(event, payload)
+        if change is None:
+            ignored += 1
+            continue
+        flush_pending_writes([change])
+        applied += 1
+    print(f"Webhooks replayed: {applied} applied, {ignored} ignored")
+
+@app.cli.command('prewarm-searches')
+@click.option('--once', is_flag=True, help='Run a single cycle instead of looping')
+@click.option('--top', type=int, help='Number of popular searches to keep warm')
+def prewarm_searches(once, top):
+    """Keep the most popular searches fresh in a shared search cache"""
+    app.logger.setLevel(logging.INFO)
+    if top is not None:
+        search_prewarmer.top = top
+    if isinstance(search_cache.backend, MemoryBackend):
+        print("SEARCH_CACHE_URL is memory://, so this process warms only its own cache; "
+              "use a shared cache or SEARCH_PREWARM_IN_PROCESS=1")
+    if once:
+        print(f"Search prewarm: {search_prewarmer.run_cycle()}")
+    else:
+        search_prewarmer.run_forever()
+
+@app.cli.command('compact-search-history')
+def compact_search_history():
+    """Delete search history past retention and expired popularity buckets"""
+    print(f"Search history compacted: {search_analytics.compact()}")
+
+@app.cli.command('rebuild-search-popularity')
+def rebuild_search_popularity():
+    """Recreate the search popularity index from the raw search history"""
+    print(f"Search popularity rebuilt from {search_analytics.rebuild()} searches")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Create missing search indexes and backfill them from saved repositories"""
+    for index in Repository.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    with db.engine.begin() as connection:
+        search_index.rebuild(connection, Repository.__tablename__)
+    print("Search index rebuilt!")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats():
+    """Recompute the language, topic and star counters from saved repositories"""
+    with db.engine.begin() as connection:
+        aggregates.rebuild(connection, Repository.__tablename__)
+    print("Stats rebuilt!")
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
@@ -0,0 +1,364 @@
+"""
+Asyncio (ASGI) serving mode for the Flask backend
+
+    pip install aiohttp uvicorn
+    uvicorn flask_backend.asgi:app --host 0.0.0.0 --port 5001
+
+Routes that mostly wait on GitHub (search, repository detail and overview,
+languages, contents including its streaming and raw modes) run
+natively on the event loop over a pooled aiohttp session, so one process can keep thousands of upstream calls in
+flight. They reuse the Flask app's caches, write-behind queue and
+serialization helpers. Every other request (saved repositories, traffic
+history, search history, health, CORS preflights) is handed to the Flask
+app itself on a thread pool, so both modes expose the same /api surface.
+"""
+import asyncio
+import contextvars
+import functools
+import io
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_backend import app as backend
+from flask_backend import contents_proxy
+from flask_backend.github_client import AsyncGitHubClient, GitHubHTTPError
+from flask_backend.metrics import METRICS_ENABLED, finish_request, span, start_request
+from flask_backend.rate_limit import BACKGROUND, INTERACTIVE, QuotaExhausted
+from flask_backend.overview import overview_payload, parse_parts, part_endpoint
+from flask_backend.search_cache import MISS, STALE, normalize_search_key
+from flask_backend.serialization import InvalidFields, compress, select_fields
+from flask_backend.singleflight import AsyncSingleFlight
+
+flask_app = backend.app
+
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 16))
+
+async_github = AsyncGitHubClient(scheduler=backend.upstream, cache=backend.github.cache)
+async_singleflight = AsyncSingleFlight()
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+
+# Passthrough routes: path suffix -> (GitHub endpoint template, 404 message)
+PASSTHROUGH = {
+    'languages': ('repos/{owner}/{repo}/languages', 'Languages data not found')
+}
+
+REPOSITORY_PATH = re.compile(r'^/api/repositories/(?P<owner>[^/]+)/(?P<repo>[^/]+)(?:/(?P<rest>.+?))?/?$')
+
+
+async def fetch_github(endpoint, params=None, priority=INTERACTIVE):
+    """Async make_github_request: coalesced, cached, and None on failure"""
+    import aiohttp
+
+    key = 'github:' + json.dumps([endpoint.lstrip('/'), params or {}], sort_keys=True)
+
+    async def fetch():
+        try:
+            with span('github'):
+                return await async_github.get_json(endpoint, params, priority=priority)
+        except (GitHubHTTPError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            flask_app.logger.error(f"GitHub API request failed: {str(e)}")
+            return None
+
+    return await async_singleflight.do(key, fetch)
+
+
+async def run_sync(fn, *args):
+    # Carry the request's metrics context into the worker thread
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(_wsgi_executor, call)
+
+
+# Native route handlers return (status, payload, extra headers)
+async def search_repositories(args):
+    query, sort, order, page, per_page = backend.parse_search_args(args)
+    if not query:
+        return 400, {'error': 'Query parameter is required'}, {}
+    fields = backend.repository_json.parse_fields(args.get('fields'))
+
+    derived = await run_sync(backend.derived_search_response, query, fields, sort, order, per_page, page)
+    if derived is not None:
+        return 200, derived, {'x-cache': 'DERIVED'}
+
+    params = backend.search_github_params(query, sort, order, page, per_page)
+    cache = backend.search_cache
+    cache_key = normalize_search_key(query, sort, order, page, per_page)
+
+    data, cache_state = cache.peek(cache_key)
+    if cache_state == STALE and cache.claim_refresh(cache_key):
+        asyncio.get_running_loop().create_task(_refresh_search(cache_key, params))
+    if cache_state == MISS:
+        data = await fetch_github('search/repositories', params)
+        if data is not None:
+            cache.put(cache_key, data)
+
+    if not data:
+        return 500, {'error': 'Failed to fetch from GitHub API'}, {}
+
+    payload = await run_sync(backend.search_response, query, data, fields, sort, order, per_page, page,
+                             cache_state == MISS)
+    return 200, payload, {'x-cache': cache_state}
+
+
+async def _refresh_search(cache_key, params):
+    data = None
+    try:
+        data = await fetch_github('search/repositories', params, priority=BACKGROUND)
+        if data:
+            await run_sync(backend.persist, 'repositories', backend.repository_rows(data.get('items', [])))
+    finally:
+        backend.search_cache.finish_refresh(cache_key, data)
+
+
+async def get_repository(owner, repo, fields=None):
+    fields = backend.repository_json.parse_fields(fields)
+
+    async def fetch_and_save():
+        data = await fetch_github(f'repos/{owner}/{repo}')
+        if not data:
+            return None
+        return await run_sync(backend.repository_response, data)
+
+    repository = await async_singleflight.do(backend.repository_key(owner, repo), fetch_and_save)
+    if not repository:
+        return 404, {'error': 'Repository not found'}, {}
+    return 200, select_fields(repository, fields), {}
+
+
+async def get_overview(owner, repo, args):
+    parts = parse_parts(args.get('include'))
+    if parts is None:
+        return 400, {'error': 'Unknown part in include parameter'}, {}
+
+    async def fetch_part(part):
+        if part == 'repository':
+            status, repository, _ = await get_repository(owner, repo)
+            return repository if status == 200 else None
+        return await fetch_github(part_endpoint(part, owner, repo))
+
+    data = await asyncio.gather(*(fetch_part(part) for part in parts), return_exceptions=True)
+    results = {}
+    for part, result in zip(parts, data):
+        if isinstance(result, Exception):
+            flask_app.logger.error(f"Overview part {part} failed for {owner}/{repo}: {str(result)}")
+            result = None
+        results[part] = result
+    await run_sync(backend.ingest_overview_traffic, owner, repo, results)
+    payload, status = overview_payload(results)
+    return status, payload, {}
+
+
+async def stream_contents(owner, repo, path, raw, scope):
+    """Relay /contents?stream=1 or ?raw=1 from GitHub; the payload is an async byte iterator"""
+    import aiohttp
+
+    client_headers = {name.decode('latin-1').title(): value.decode('latin-1')
+                      for name, value in scope.get('headers', [])}
+    accept_gzip = 'gzip' in client_headers.get('Accept-Encoding', '')
+    headers = contents_proxy.upstream_headers(client_headers, raw, accept_gzip)
+
+    try:
+        response = await async_github.open(backend.contents_endpoint(owner, repo, path), headers=headers,
+                                           decompress=not accept_gzip)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        flask_app.logger.error(f"GitHub API request failed: {str(e)}")
+        return 500, {'error': 'Failed to fetch from GitHub API'}, {}
+
+    if response.status not in contents_proxy.PASSTHROUGH_STATUSES:
+        response.release()
+        if response.status == 404:
+            return 404, {'error': 'Contents not found'}, {}
+        flask_app.logger.error(f"GitHub API request failed: {response.status} for {response.url}")
+        return 500, {'error': 'Failed to fetch from GitHub API'}, {}
+
+    status, headers, _, skip, length = contents_proxy.plan_response(
+        response.status, response.headers, client_headers, path, raw, accept_gzip
+    )
+    chunks = response.content.iter_chunked(contents_proxy.CHUNK_SIZE)
+    return status, contents_proxy.aiter_body(chunks, skip, length, close=response.release), headers
+
+
+async def get_passthrough(endpoint, error):
+    data = await fetch_github(endpoint)
+    if not data:
+        return 404, {'error': error}, {}
+    return 200, data, {}
+
+
+def route(path, args, scope=None):
+    """Return a coroutine for natively served GET routes, or None to delegate to Flask"""
+    if path.rstrip('/') == '/api/search/repositories':
+        return search_repositories(args)
+
+    match = REPOSITORY_PATH.match(path)
+    if not match:
+        return None
+
+    owner, repo, rest = match.group('owner', 'repo', 'rest')
+    if rest is None:
+        return get_repository(owner, repo, args.get('fields'))
+    if rest == 'overview':
+        return get_overview(owner, repo, args)
+    if rest == 'contents' or rest.startswith('contents/'):
+        raw = contents_proxy.wants_raw(args)
+        if raw or contents_proxy.wants_stream(args):
+            return stream_contents(owner, repo, rest[len('contents/'):], raw, scope or {})
+        return get_passthrough(backend.contents_endpoint(owner, repo, rest[len('contents/'):]),
+                               'Contents not found')
+    if rest in PASSTHROUGH:
+        endpoint, error = PASSTHROUGH[rest]
+        return get_passthrough(endpoint.format(owner=owner, repo=repo), error)
+    return None
+
+
+async def send_json(send, status, payload, headers, accept_encoding=''):
+    with span('json'):
+        body = flask_app.json.dumps_bytes(payload)
+    raw_headers = [(b'content-type', b'application/json'), (b'access-control-allow-origin', b'*')]
+    if status == 200:
+        body, encoding = compress(body, accept_encoding)
+        raw_headers.append((b'vary', b'Accept-Encoding'))
+        if encoding:
+            raw_headers.append((b'content-encoding', encoding.encode()))
+    raw_headers.append((b'content-length', str(len(body)).encode()))
+    raw_headers.extend((k.encode(), v.encode()) for k, v in headers.items())
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_stream(send, status, chunks, headers):
+    raw_headers = [(b'access-control-allow-origin', b'*')]
+    raw_headers.extend((k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items())
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    try:
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        await chunks.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def wsgi_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ for the Flask app"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def call_wsgi(environ):
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured['status'] = int(status.split(' ', 1)[0])
+        captured['headers'] = headers
+
+    result = flask_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return captured['status'], captured['headers'], body
+
+
+async def delegate_to_flask(scope, receive, send):
+    body = b''
+    more = True
+    while more:
+        message = await receive()
+        body += message.get('body', b'')
+        more = message.get('more_body', False)
+
+    status, headers, payload = await run_sync(call_wsgi, wsgi_environ(scope, body))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_github.aclose()
+            _wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    handler = None
+    if scope['method'] == 'GET':
+        args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        handler = route(scope['path'], args, scope)
+    if handler is None:
+        return await delegate_to_flask(scope, receive, send)
+
+    # Delegated requests are measured by the Flask app's own hooks
+    metrics = start_request() if METRICS_ENABLED else None
+    try:
+        status, payload, headers = await handler
+    except InvalidFields as e:
+        status, payload, headers = 400, {'error': str(e)}, {}
+    except QuotaExhausted as e:
+        flask_app.logger.error(f"GitHub API request rejected: {str(e)}")
+        status, payload = 503, {'error': 'GitHub API rate limit exhausted, try again later'}
+        headers = {'retry-after': str(e.retry_after)}
+    except Exception as e:
+        flask_app.logger.error(f"Unhandled error on {scope['path']}: {str(e)}")
+        status, payload, headers = 500, {'error': 'Internal server error'}, {}
+    if isinstance(payload, (dict, list)):
+        accept_encoding = next((v.decode('latin-1') for k, v in scope.get('headers', [])
+                                if k == b'accept-encoding'), '')
+        await send_json(send, status, payload, headers, accept_encoding)
+    else:
+        await send_stream(send, status, payload, headers)
+    if metrics is not None:
+        finish_request(*metrics, 'asgi', handler.__qualname__, scope['method'], status, scope['path'],
+                       flask_app.logger)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5001)))
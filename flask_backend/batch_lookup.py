@@ -0,0 +1,202 @@
+"""
+Batch repository lookups through the GitHub GraphQL API
+
+One GraphQL query fetches a whole chunk of repositories by owner and name
+(one aliased repository() field each), so a list of 200 repositories costs
+a handful of upstream calls instead of 200 REST requests. Replies are
+mapped to the REST payload shape so the usual repository_rows() and
+serializers apply.
+
+Chunks run concurrently on a small shared pool; a chunk that fails is
+reported in ``failed`` without affecting the others. GraphQL needs a
+token, so anonymous deployments use fetch_each() with one REST call per
+repository instead.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from flask_backend.rate_limit import INTERACTIVE
+
+BATCH_MAX_REPOSITORIES = int(os.environ.get('BATCH_MAX_REPOSITORIES', 200))
+BATCH_MAX_AGE = int(os.environ.get('BATCH_MAX_AGE', 3600))
+GRAPHQL_CHUNK_SIZE = int(os.environ.get('GRAPHQL_CHUNK_SIZE', 50))
+GRAPHQL_CONCURRENCY = int(os.environ.get('GRAPHQL_CONCURRENCY', 4))
+
+# REST replies meaning the repository does not exist (or is hidden from us)
+MISSING_STATUSES = (404, 410, 451)
+
+# GitHub's rules for owner and repository names
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9](?:[A-Za-z0-9-]{0,38})/[A-Za-z0-9._-]{1,100}$')
+
+REPOSITORY_FRAGMENT = '''
+fragment Repo on Repository {
+  databaseId name nameWithOwner description url sshUrl
+  primaryLanguage { name }
+  stargazerCount forkCount
+  issues(states: OPEN) { totalCount }
+  pullRequests(states: OPEN) { totalCount }
+  defaultBranchRef { name }
+  repositoryTopics(first: 20) { nodes { topic { name } } }
+  owner { login avatarUrl }
+  createdAt updatedAt pushedAt
+  isPrivate isFork isArchived isDisabled diskUsage
+  licenseInfo { name spdxId }
+}
+'''
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+class GraphQLError(Exception):
+    """A GraphQL reply with errors and no data"""
+
+
+def parse_names(names, limit=BATCH_MAX_REPOSITORIES):
+    """Validate a list of "owner/repo" names; duplicates (any case) are dropped, order kept"""
+    if not isinstance(names, list) or not names:
+        raise InvalidBatch('Expected a non-empty "repositories" list of "owner/repo" names')
+    parsed = []
+    seen = set()
+    for name in names:
+        if not isinstance(name, str) or not NAME_PATTERN.match(name.strip()):
+            raise InvalidBatch(f'Invalid repository name: {name!r}')
+        name = name.strip()
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            parsed.append(name)
+    if len(parsed) > limit:
+        raise InvalidBatch(f'At most {limit} repositories per batch')
+    return parsed
+
+
+def build_query(names):
+    """(query, variables) fetching every name under an alias r0, r1, ..."""
+    declarations = []
+    fields = []
+    variables = {}
+    for i, name in enumerate(names):
+        owner, repo = name.split('/', 1)
+        declarations.append(f'$o{i}: String!, $n{i}: String!')
+        fields.append(f'r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...Repo }}')
+        variables[f'o{i}'] = owner
+        variables[f'n{i}'] = repo
+    query = f"query({', '.join(declarations)}) {{\n  " + '\n  '.join(fields) + '\n}\n' + REPOSITORY_FRAGMENT
+    return query, variables
+
+
+def rest_payload(node):
+    """Map a GraphQL Repository node to the REST repository payload shape"""
+    license = node.get('licenseInfo')
+    return {
+        'id': node['databaseId'],
+        'name': node['name'],
+        'full_name': node['nameWithOwner'],
+        'description': node.get('description'),
+        'html_url': node['url'],
+        'clone_url': node['url'] + '.git',
+        'ssh_url': node.get('sshUrl', ''),
+        'language': (node.get('primaryLanguage') or {}).get('name'),
+        'stargazers_count': node.get('stargazerCount', 0),
+        'forks_count': node.get('forkCount', 0),
+        # REST reports stars as watchers_count, and open issues including pull requests
+        'watchers_count': node.get('stargazerCount', 0),
+        'open_issues_count': (node.get('issues') or {}).get('totalCount', 0) +
+                             (node.get('pullRequests') or {}).get('totalCount', 0),
+        'default_branch': (node.get('defaultBranchRef') or {}).get('name', 'main'),
+        'topics': [entry['topic']['name'] for entry in (node.get('repositoryTopics') or {}).get('nodes', [])],
+        'owner': {'login': node['owner']['login'], 'avatar_url': node['owner'].get('avatarUrl')},
+        'created_at': node.get('createdAt'),
+        'updated_at': node.get('updatedAt'),
+        'pushed_at': node.get('pushedAt'),
+        'private': node.get('isPrivate', False),
+        'fork': node.get('isFork', False),
+        'archived': node.get('isArchived', False),
+        'disabled': node.get('isDisabled', False),
+        'size': node.get('diskUsage') or 0,
+        'license': {'name': license['name'], 'spdx_id': license.get('spdxId')} if license else None
+    }
+
+
+def fetch_chunk(github, names, priority=INTERACTIVE):
+    """Fetch up to one chunk of names in a single query; returns ({name: payload}, [missing names])"""
+    query, variables = build_query(names)
+    body = github.graphql(query, variables, priority=priority)
+    data = body.get('data')
+    if not data:
+        messages = '; '.join(error.get('message', '') for error in body.get('errors') or [])
+        raise GraphQLError(messages or 'Empty GraphQL response')
+
+    found = {}
+    missing = []
+    for i, name in enumerate(names):
+        # Unknown or inaccessible repositories come back as null with a NOT_FOUND error
+        node = data.get(f'r{i}')
+        if node:
+            found[name] = rest_payload(node)
+        else:
+            missing.append(name)
+    return found, missing
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=GRAPHQL_CONCURRENCY, thread_name_prefix='batch')
+    return _executor
+
+
+def _gather(tasks, logger):
+    """Run {key: (fn, names)} on the shared pool; returns (found, missing, failed)"""
+    futures = {key: (_pool().submit(fn), names) for key, (fn, names) in tasks.items()}
+    found = {}
+    missing = []
+    failed = []
+    for key, (future, names) in futures.items():
+        try:
+            chunk_found, chunk_missing = future.result()
+        except Exception as e:
+            if logger:
+                logger.error(f"Batch lookup failed for {key}: {str(e)}")
+            failed.extend(names)
+            continue
+        found.update(chunk_found)
+        missing.extend(chunk_missing)
+    return found, missing, failed
+
+
+def fetch_repositories(github, names, chunk_size=GRAPHQL_CHUNK_SIZE, priority=INTERACTIVE, logger=None):
+    """Fetch names with one GraphQL query per chunk; returns (found, missing, failed)"""
+    tasks = {}
+    for start in range(0, len(names), chunk_size):
+        chunk = names[start:start + chunk_size]
+        tasks[f'chunk {start // chunk_size}'] = (lambda chunk=chunk: fetch_chunk(github, chunk, priority), chunk)
+    return _gather(tasks, logger)
+
+
+def fetch_rest(github, name, priority=INTERACTIVE):
+    """One repository over REST; None if GitHub does not know it, raises on other failures"""
+    try:
+        return github.get_json(f'repos/{name}', priority=priority)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code in MISSING_STATUSES:
+            return None
+        raise
+
+
+def fetch_each(github, names, priority=INTERACTIVE, logger=None):
+    """REST fallback for anonymous deployments: one call per name; returns (found, missing, failed)"""
+    def fetch(name):
+        payload = fetch_rest(github, name, priority)
+        return ({name: payload}, []) if payload else ({}, [name])
+
+    return _gather({name: (lambda name=name: fetch(name), [name]) for name in names}, logger)
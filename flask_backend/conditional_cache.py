@@ -0,0 +1,116 @@
+"""
+ETag / Last-Modified revalidation cache for GitHub API responses
+
+Stores each response body with its validators so the next request for the
+same URL can be sent as a conditional request. GitHub answers unchanged
+resources with 304 Not Modified, which does not count against the rate limit.
+"""
+import json
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'last_modified')
+
+    def __init__(self, body, etag=None, last_modified=None):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class ConditionalCache:
+    """LRU of response bodies plus validators, bounded by total body bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(url, params=None):
+        if not params:
+            return url
+        pairs = sorted((k, v) for k, v in params.items() if v is not None)
+        return f'{url}?{urlencode(pairs)}'
+
+    def lookup(self, key):
+        """Return the stored entry for key (marking it recently used) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.revalidations += 1
+            return entry
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def store(self, key, body, headers):
+        """Keep a 200 response body if its headers carry a validator GitHub can check"""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not (etag or last_modified) or len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+            self._entries[key] = CachedResponse(body, etag, last_modified)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+                self.evictions += 1
+
+    def invalidate(self, url):
+        """Drop the entries for url and the resources under it, ignoring case
+
+        repos/foo/bar matches repos/Foo/Bar, repos/foo/bar?page=2 and
+        repos/foo/bar/languages, but not repos/foo/bar-baz.
+        """
+        url = url.lower()
+        with self._lock:
+            for key in [k for k in self._entries if k.lower().partition('?')[0] == url or
+                        k.lower().startswith(url + '/')]:
+                self._size -= len(self._entries.pop(key).body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions
+            }
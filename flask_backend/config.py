@@ -9,6 +9,11 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
     
+    # Only the settings in these classes go through app.config; the rest
+    # (GITHUB_*, DB_POOL_*, SQLITE_*, WRITE_BEHIND_*, SEARCH_CACHE_*, ...) are
+    # read from the environment by the module using them, once at import, so
+    # they are set per deployment rather than per profile. See the README.
+    
     # Flask-specific configurations
     JSON_SORT_KEYS = False
     
@@ -20,7 +25,7 @@ class Config:
 
 class DevelopmentConfig(Config):
     DEBUG = True
-    SQLALCHEMY_ECHO = True
+    SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', '0') == '1'
 
 class ProductionConfig(Config):
     DEBUG = False
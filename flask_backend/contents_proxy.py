@@ -0,0 +1,156 @@
+"""
+Streaming passthrough for repository contents
+
+``?stream=1`` relays GitHub's contents JSON to the client chunk by chunk
+without decoding it (still gzipped when the client accepts gzip), and
+``?raw=1`` asks GitHub for the raw media type and relays the file bytes
+themselves. Neither mode holds a whole blob in worker memory.
+
+Range requests on raw files are forwarded upstream; if GitHub answers a
+ranged request with the full file, the requested bytes are cut out of the
+stream here instead.
+"""
+import mimetypes
+import os
+import re
+
+CHUNK_SIZE = int(os.environ.get('CONTENTS_CHUNK_SIZE', 64 * 1024))
+
+RAW_MEDIA_TYPE = 'application/vnd.github.raw'
+JSON_MEDIA_TYPE = 'application/vnd.github+json'
+
+# Client headers forwarded to GitHub and GitHub headers forwarded back
+REQUEST_HEADERS = ('If-None-Match', 'If-Modified-Since', 'Range', 'If-Range')
+RESPONSE_HEADERS = ('Content-Type', 'Content-Length', 'Content-Range', 'Content-Encoding',
+                    'Accept-Ranges', 'ETag', 'Last-Modified')
+PASSTHROUGH_STATUSES = (200, 206, 304, 416)
+
+# Guessed types safe to render from our origin; anything else keeps GitHub's type
+INLINE_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/webp', 'application/pdf')
+
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def wants_raw(args):
+    return args.get('raw') in ('1', 'true')
+
+
+def wants_stream(args):
+    return args.get('stream') in ('1', 'true')
+
+
+def upstream_headers(client_headers, raw, accept_gzip):
+    """Headers for the GitHub request given the client's request headers"""
+    headers = {name: client_headers[name] for name in REQUEST_HEADERS if client_headers.get(name)}
+    headers['Accept'] = RAW_MEDIA_TYPE if raw else JSON_MEDIA_TYPE
+    # Raw bytes come uncompressed so lengths and ranges refer to the file itself
+    headers['Accept-Encoding'] = 'gzip' if accept_gzip and not raw else 'identity'
+    return headers
+
+
+def parse_range(header, size):
+    """Return (first, last) byte offsets for a single bytes range, or None to send the whole body
+
+    Raises RangeNotSatisfiable when the range lies outside the body.
+    """
+    match = BYTE_RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    else:
+        first = max(size - int(last), 0)
+        last = size - 1
+    if first > last or first >= size:
+        raise RangeNotSatisfiable(header)
+    return first, last
+
+
+def content_type_for(path, upstream_type):
+    guessed = mimetypes.guess_type(path)[0]
+    return guessed if guessed in INLINE_TYPES else upstream_type or 'application/octet-stream'
+
+
+def plan_response(status, upstream, client_headers, path, raw, accept_gzip):
+    """Return (status, headers, decode, skip, length) for relaying an upstream response
+
+    decode means the body must be decompressed before it is relayed; skip and
+    length select the bytes to send when the range is applied locally.
+    """
+    headers = {name: upstream[name] for name in RESPONSE_HEADERS if upstream.get(name)}
+    decode = 'Content-Encoding' in headers and not accept_gzip
+    if decode:
+        del headers['Content-Encoding']
+        headers.pop('Content-Length', None)
+
+    if raw:
+        headers['Content-Type'] = content_type_for(path, headers.get('Content-Type'))
+        headers['X-Content-Type-Options'] = 'nosniff'
+        headers.setdefault('Accept-Ranges', 'bytes')
+
+    range_header = client_headers.get('Range')
+    if_range = client_headers.get('If-Range')
+    if (status != 200 or not raw or not range_header or 'Content-Encoding' in headers or decode
+            or 'Content-Length' not in headers
+            or (if_range and if_range not in (headers.get('ETag'), headers.get('Last-Modified')))):
+        return status, headers, decode, 0, None
+
+    size = int(headers['Content-Length'])
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return 416, {'Content-Range': f'bytes */{size}', 'Content-Length': '0'}, False, 0, 0
+    if byte_range is None:
+        return status, headers, decode, 0, None
+
+    first, last = byte_range
+    headers['Content-Range'] = f'bytes {first}-{last}/{size}'
+    headers['Content-Length'] = str(last - first + 1)
+    return 206, headers, decode, first, last - first + 1
+
+
+def _cut(chunk, skip, length):
+    """Apply skip/length to one chunk; returns (piece, skip, length)"""
+    if skip:
+        if len(chunk) <= skip:
+            return b'', skip - len(chunk), length
+        chunk = chunk[skip:]
+        skip = 0
+    if length is not None:
+        chunk = chunk[:length]
+        length -= len(chunk)
+    return chunk, skip, length
+
+
+def iter_body(chunks, skip=0, length=None, close=None):
+    """Relay chunks, dropping the first skip bytes and stopping after length bytes"""
+    try:
+        for chunk in chunks:
+            if length == 0:
+                break
+            piece, skip, length = _cut(chunk, skip, length)
+            if piece:
+                yield piece
+    finally:
+        if close is not None:
+            close()
+
+
+async def aiter_body(chunks, skip=0, length=None, close=None):
+    """Async iter_body for aiohttp response streams"""
+    try:
+        async for chunk in chunks:
+            if length == 0:
+                break
+            piece, skip, length = _cut(chunk, skip, length)
+            if piece:
+                yield piece
+    finally:
+        if close is not None:
+            close()
@@ -0,0 +1,91 @@
+"""
+Database engine settings for SQLite and PostgreSQL
+
+engine_options() sizes the connection pool for the URL in use and
+install() applies per-connection SQLite PRAGMAs:
+
+    journal_mode=WAL      readers keep reading while a writer commits
+    synchronous=NORMAL    fsync at checkpoints instead of every commit (safe with WAL)
+    mmap_size             page reads served from a memory map
+    busy_timeout          writers queue for the lock instead of failing with
+                          "database is locked"
+
+WAL needs the database on a local filesystem; set SQLITE_JOURNAL_MODE=DELETE
+for network mounts. PostgreSQL connections are checked before use
+(pool_pre_ping) and recycled after DB_POOL_RECYCLE seconds so connections
+dropped by the server or a proxy are never handed to a request. Each
+process (gunicorn worker) has its own pool, so the server sees up to
+WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+"""
+import os
+
+from sqlalchemy import event
+
+# One connection per request thread plus the write-behind, sync and prewarm threads
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', int(os.environ.get('GUNICORN_THREADS', 8)) + 2))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 10))
+
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+
+
+def database_url(url):
+    """Use psycopg 3 for plain postgres:// and postgresql:// URLs (Render and Heroku hand out the former)"""
+    for scheme in ('postgres://', 'postgresql://'):
+        if url.startswith(scheme):
+            return 'postgresql+psycopg://' + url[len(scheme):]
+    return url
+
+
+def _sqlite_in_memory(url):
+    return url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URL"""
+    if url.startswith('sqlite'):
+        if _sqlite_in_memory(url):
+            # Flask-SQLAlchemy shares one connection (StaticPool); nothing to size
+            return {}
+        return {'pool_size': DB_POOL_SIZE, 'max_overflow': DB_MAX_OVERFLOW,
+                'pool_timeout': DB_POOL_TIMEOUT}
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True
+    }
+    if url.startswith('postgresql'):
+        options['connect_args'] = {'connect_timeout': DB_CONNECT_TIMEOUT}
+    return options
+
+
+def sqlite_pragmas(in_memory=False):
+    pragmas = [f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}',
+               f'PRAGMA synchronous = {SQLITE_SYNCHRONOUS}']
+    if not in_memory:
+        pragmas[:0] = [f'PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}',
+                       f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE}']
+    return pragmas
+
+
+def install(engine):
+    """Apply the SQLite PRAGMAs to every new connection of engine (no-op elsewhere)"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(_sqlite_in_memory(str(engine.url)))
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
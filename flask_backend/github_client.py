@@ -0,0 +1,319 @@
+"""
+Shared GitHub API client for the Flask backends
+
+Keeps one pooled, keep-alive HTTP session per process so repeated calls to
+api.github.com reuse TLS connections instead of opening a new one each time.
+AsyncGitHubClient is the asyncio counterpart used by flask_backend/asgi.py.
+
+With a RateLimitScheduler attached (flask_backend/rate_limit.py), each call
+is authenticated with the pooled token that has the most quota left and
+waits its turn when quota runs low.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from flask_backend.metrics import observe_upstream
+from flask_backend.rate_limit import INTERACTIVE, is_rate_limited, resource_for
+
+GITHUB_API_BASE = os.environ.get('GITHUB_API_BASE', 'https://api.github.com')
+
+DEFAULT_POOL_SIZE = int(os.environ.get('GITHUB_POOL_SIZE', 20))
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get('GITHUB_CONNECT_TIMEOUT', 3.05))
+DEFAULT_READ_TIMEOUT = float(os.environ.get('GITHUB_READ_TIMEOUT', 10))
+DEFAULT_MAX_RETRIES = int(os.environ.get('GITHUB_MAX_RETRIES', 2))
+DEFAULT_BACKOFF_FACTOR = float(os.environ.get('GITHUB_BACKOFF_FACTOR', 0.3))
+DEFAULT_CACHE_MAX_BYTES = int(os.environ.get('GITHUB_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+DEFAULT_ASYNC_POOL_SIZE = int(os.environ.get('GITHUB_ASYNC_POOL_SIZE', 200))
+
+# Only idempotent reads are retried, and only on transient upstream errors
+RETRY_STATUSES = (502, 503, 504)
+
+
+class GitHubClient:
+    """Pooled GitHub REST client, safe to share between threads"""
+
+    def __init__(self, token=None, base_url=GITHUB_API_BASE, pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 user_agent='GitHub-Explorer/1.0', cache=None, scheduler=None):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.user_agent = user_agent
+        self.cache = cache
+        self.scheduler = scheduler
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                              max_retries=retry)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'User-Agent': self.user_agent,
+            'Accept': 'application/vnd.github+json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+        if self.token:
+            session.headers['Authorization'] = f'token {self.token}'
+        return session
+
+    @property
+    def session(self):
+        """Per-process session; rebuilt after a fork so workers never share sockets"""
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._build_session()
+                    self._pid = pid
+        return self._session
+
+    def url_for(self, endpoint):
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def get(self, endpoint, params=None, headers=None, stream=False, priority=INTERACTIVE):
+        """Issue a GET against the API and return the raw response
+
+        Under a scheduler, a reply rate-limited on one token is retried on the
+        next token with quota; QuotaExhausted is raised if none frees up in time.
+        """
+        return self.request('GET', endpoint, params=params, headers=headers, stream=stream,
+                            priority=priority)
+
+    def post(self, endpoint, json_body, headers=None, priority=INTERACTIVE):
+        """Issue a POST with a JSON body; same token handling as get()"""
+        return self.request('POST', endpoint, json_body=json_body, headers=headers, priority=priority)
+
+    def request(self, method, endpoint, params=None, json_body=None, headers=None, stream=False,
+                priority=INTERACTIVE):
+        resource = resource_for(endpoint)
+        if self.scheduler is None:
+            return self._send(resource, method, endpoint, params, json_body, headers, stream)
+
+        attempts = len(self.scheduler.tokens)
+        for attempt in range(attempts):
+            token = self.scheduler.acquire(resource, priority)
+            request_headers = dict(headers or {})
+            if token:
+                request_headers['Authorization'] = f'token {token}'
+            response = self._send(resource, method, endpoint, params, json_body, request_headers, stream)
+            self.scheduler.update(token, resource, response.status_code, response.headers)
+            if attempt == attempts - 1 or not is_rate_limited(response.status_code, response.headers):
+                return response
+            response.close()
+
+    def _send(self, resource, method, endpoint, params, json_body, headers, stream):
+        started = time.perf_counter()
+        response = self.session.request(method, self.url_for(endpoint), params=params, json=json_body,
+                                        headers=headers, timeout=self.timeout, stream=stream)
+        observe_upstream(resource, response.status_code, time.perf_counter() - started)
+        return response
+
+    def graphql(self, query, variables=None, priority=INTERACTIVE):
+        """Run a GraphQL query and return the decoded body (data plus any errors)
+
+        GraphQL needs a token; anonymous calls are rejected by the scheduler
+        (QuotaExhausted) or by GitHub (401).
+        """
+        response = self.post('graphql', {'query': query, 'variables': variables or {}}, priority=priority)
+        response.raise_for_status()
+        return response.json()
+
+    def get_json(self, endpoint, params=None, priority=INTERACTIVE):
+        """GET an endpoint and decode the JSON body, raising on HTTP errors
+
+        With a cache attached, previously seen responses are revalidated with
+        If-None-Match / If-Modified-Since and served from the cache on a 304.
+        """
+        if self.cache is None:
+            response = self.get(endpoint, params=params, priority=priority)
+            response.raise_for_status()
+            return response.json()
+
+        key = self.cache.key_for(self.url_for(endpoint), params)
+        entry = self.cache.lookup(key)
+        headers = entry.conditional_headers() if entry else None
+
+        response = self.get(endpoint, params=params, headers=headers, priority=priority)
+        if response.status_code == 304 and entry is not None:
+            self.cache.record_hit()
+            return entry.json()
+
+        response.raise_for_status()
+        self.cache.store(key, response.content, response.headers)
+        return response.json()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class AsyncGitHubClient:
+    """asyncio GitHub REST client on a pooled aiohttp session (pip install aiohttp)
+
+    The session is created lazily inside the running event loop. Connection
+    errors and 502/503/504 replies get the same bounded exponential backoff
+    as GitHubClient.
+    """
+
+    def __init__(self, token=None, base_url=GITHUB_API_BASE, pool_size=DEFAULT_ASYNC_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 user_agent='GitHub-Explorer/1.0', cache=None, scheduler=None):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.user_agent = user_agent
+        self.cache = cache
+        self.scheduler = scheduler
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            headers = {
+                'User-Agent': self.user_agent,
+                'Accept': 'application/vnd.github+json',
+                'Accept-Encoding': 'gzip, deflate'
+            }
+            if self.token:
+                headers['Authorization'] = f'token {self.token}'
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                connector=aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout,
+                                              sock_read=self.read_timeout)
+            )
+        return self._session
+
+    def url_for(self, endpoint):
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    async def get(self, endpoint, params=None, headers=None, priority=INTERACTIVE):
+        """GET an endpoint and return (status, headers, body bytes)"""
+        if params:
+            params = {k: str(v) for k, v in params.items() if v is not None}
+        if self.scheduler is None:
+            return await self._get(endpoint, params, headers)
+
+        resource = resource_for(endpoint)
+        attempts = len(self.scheduler.tokens)
+        for attempt in range(attempts):
+            token = await self.scheduler.acquire_async(resource, priority)
+            request_headers = dict(headers or {})
+            if token:
+                request_headers['Authorization'] = f'token {token}'
+            status, response_headers, body = await self._get(endpoint, params, request_headers)
+            self.scheduler.update(token, resource, status, response_headers)
+            if attempt == attempts - 1 or not is_rate_limited(status, response_headers):
+                return status, response_headers, body
+
+    async def open(self, endpoint, params=None, headers=None, priority=INTERACTIVE, decompress=True):
+        """Start a GET and return the aiohttp response with its body unread
+
+        The caller streams the body and must release() the response. Not retried.
+        """
+        resource = resource_for(endpoint)
+        token = None
+        request_headers = dict(headers or {})
+        if self.scheduler is not None:
+            token = await self.scheduler.acquire_async(resource, priority)
+            if token:
+                request_headers['Authorization'] = f'token {token}'
+        started = time.perf_counter()
+        response = await self.session.get(self.url_for(endpoint), params=params, headers=request_headers,
+                                          auto_decompress=decompress)
+        observe_upstream(resource, response.status, time.perf_counter() - started)
+        if self.scheduler is not None:
+            self.scheduler.update(token, resource, response.status, response.headers)
+        return response
+
+    async def _get(self, endpoint, params, headers):
+        import aiohttp
+
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                async with self.session.get(self.url_for(endpoint), params=params,
+                                            headers=headers) as response:
+                    body = await response.read()
+                    observe_upstream(resource_for(endpoint), response.status, time.perf_counter() - started)
+                    if response.status not in RETRY_STATUSES or attempt == self.max_retries:
+                        return response.status, response.headers, body
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def get_json(self, endpoint, params=None, priority=INTERACTIVE):
+        """GET an endpoint and decode the JSON body
+
+        Raises GitHubHTTPError for error statuses and aiohttp/asyncio errors
+        for transport failures.
+        """
+        entry = None
+        headers = None
+        if self.cache is not None:
+            key = self.cache.key_for(self.url_for(endpoint), params)
+            entry = self.cache.lookup(key)
+            headers = entry.conditional_headers() if entry else None
+
+        status, response_headers, body = await self.get(endpoint, params=params, headers=headers,
+                                                        priority=priority)
+        if status == 304 and entry is not None:
+            self.cache.record_hit()
+            return entry.json()
+        if status >= 400:
+            raise GitHubHTTPError(status, self.url_for(endpoint))
+
+        if self.cache is not None:
+            self.cache.store(key, body, response_headers)
+        return json.loads(body)
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class GitHubHTTPError(Exception):
+    """Error status returned by the GitHub API to AsyncGitHubClient"""
+
+    def __init__(self, status, url):
+        super().__init__(f'{status} Error for url: {url}')
+        self.status = status
+        self.url = url
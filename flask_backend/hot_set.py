@@ -0,0 +1,123 @@
+"""
+In-process hot set of saved repositories as pre-encoded JSON
+
+Keeps the most recently read repositories as compact records (github_id,
+expiry and the encoded API dict), so the saved list and batch lookups only
+read keys from the database and splice cached JSON into the response
+instead of loading ORM objects and serializing them again. A record costs about its JSON size plus ~150 bytes,
+a fraction of an ORM instance with its state and datetimes.
+
+Coherence: writes mark their github_ids on the session and the entries are
+dropped right after the commit. A reader that started before such a commit
+cannot re-admit what it read (invalidations leave a short-lived tombstone).
+Writes made by other processes (other gunicorn workers, the sync worker)
+are picked up when entries expire after HOT_SET_TTL seconds.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+HOT_SET_SIZE = int(os.environ.get('HOT_SET_SIZE', 2000))  # 0 disables the hot set
+HOT_SET_TTL = float(os.environ.get('HOT_SET_TTL', 30))
+
+SESSION_KEY = 'hot_set_dirty'
+
+
+class HotEntry:
+    __slots__ = ('github_id', 'fragment', 'expires')
+
+    def __init__(self, github_id, fragment, expires):
+        self.github_id = github_id
+        self.fragment = fragment
+        self.expires = expires
+
+
+class HotSet:
+    """Bounded LRU of encoded repository dicts keyed by github_id"""
+
+    def __init__(self, encode, max_entries=HOT_SET_SIZE, ttl=HOT_SET_TTL):
+        self.encode = encode
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tombstones = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'admitted': 0, 'rejected': 0, 'evictions': 0,
+                      'invalidations': 0}
+
+    def begin_read(self):
+        """Token to take before reading rows from the database and pass to admit()"""
+        return time.monotonic()
+
+    def get_many(self, github_ids):
+        """{github_id: fragment} for the ids held and not expired"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for github_id in github_ids:
+                entry = self._entries.get(github_id)
+                if entry is None or entry.expires <= now:
+                    continue
+                self._entries.move_to_end(github_id)
+                found[github_id] = entry.fragment
+            self.stats['hits'] += len(found)
+            self.stats['misses'] += len(github_ids) - len(found)
+        return found
+
+    def admit(self, github_id, data, token):
+        """Encode an API dict read at token; it is kept unless invalidated since. Returns the fragment."""
+        fragment = self.encode(data)
+        with self._lock:
+            if self._tombstones.get(github_id, -1) >= token:
+                self.stats['rejected'] += 1
+                return fragment
+            self._entries.pop(github_id, None)
+            self._entries[github_id] = HotEntry(github_id, fragment, time.monotonic() + self.ttl)
+            self.stats['admitted'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return fragment
+
+    def invalidate(self, github_ids):
+        now = time.monotonic()
+        with self._lock:
+            for github_id in github_ids:
+                if self._entries.pop(github_id, None) is not None:
+                    self.stats['invalidations'] += 1
+                self._tombstones[github_id] = now
+            # Tombstones only matter to reads still in flight
+            if len(self._tombstones) > self.max_entries:
+                cutoff = now - self.ttl
+                self._tombstones = {k: v for k, v in self._tombstones.items() if v > cutoff}
+
+    def mark_written(self, session, github_ids):
+        """Invalidate github_ids once the session's transaction commits"""
+        session.info.setdefault(SESSION_KEY, set()).update(github_ids)
+
+    def install(self, session):
+        """Hook commit and rollback on a (scoped) session for mark_written()"""
+        def after_commit(session):
+            dirty = session.info.pop(SESSION_KEY, None)
+            if dirty:
+                self.invalidate(dirty)
+
+        event.listen(session, 'after_commit', after_commit)
+        event.listen(session, 'after_rollback', lambda session: session.info.pop(SESSION_KEY, None))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), max_entries=self.max_entries,
+                        bytes=sum(len(entry.fragment) for entry in self._entries.values()))
+
+
+def create_hot_set(encode, session, max_entries=HOT_SET_SIZE):
+    """Build a HotSet hooked to session, or None when HOT_SET_SIZE is 0"""
+    if max_entries <= 0:
+        return None
+    hot_set = HotSet(encode, max_entries=max_entries)
+    hot_set.install(session)
+    return hot_set
@@ -0,0 +1,293 @@
+"""
+Request instrumentation and Prometheus metrics
+
+instrument_app() wires a Flask app so every request records its duration,
+the SQL statements it ran and the time spent in named spans (GitHub calls,
+session flushes and commits, serialization, JSON encoding), and serves
+everything in the Prometheus text format at /metrics. span() times any
+block and also works inside coroutines.
+
+With SLOW_REQUEST_SECONDS set, a sample of requests slower than that is
+logged with its span breakdown and SQL count.
+
+Metrics are kept per process; with several gunicorn workers each scrape
+sees the worker that answered it.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 0))  # 0 disables the slow log
+SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get('SLOW_REQUEST_SAMPLE_RATE', 1.0))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SPAN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, labels)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = _format_labels(self.labels, labels, f'le="{_number(bound)}"')
+                    lines.append(f'{self.name}_bucket{le} {cumulative}')
+                le = _format_labels(self.labels, labels, 'le="+Inf"')
+                lines.append(f'{self.name}_bucket{le} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labels, labels)} {_number(total)}')
+                lines.append(f'{self.name}_count{_format_labels(self.labels, labels)} {count}')
+        return lines
+
+
+class Registry:
+    """Metrics plus collector callables evaluated at scrape time"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        # Collectors yield (name, help, type, [(label names, label values, value)]);
+        # families reported by several collectors are merged under one header
+        families = {}
+        for collect in self.collectors:
+            for name, help, kind, samples in collect():
+                families.setdefault(name, (help, kind, []))[2].extend(samples)
+        for name, (help, kind, samples) in families.items():
+            lines.extend([f'# HELP {name} {help}', f'# TYPE {name} {kind}'])
+            for names, values, value in samples:
+                lines.append(f'{name}{_format_labels(names, values)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram('http_request_duration_seconds', 'Request latency',
+                                     ('app', 'endpoint', 'method', 'status'))
+REQUEST_SQL = REGISTRY.histogram('http_request_sql_statements', 'SQL statements per request',
+                                 ('app', 'endpoint'), COUNT_BUCKETS)
+SPAN_SECONDS = REGISTRY.histogram('span_duration_seconds', 'Time spent in instrumented code paths',
+                                  ('span',), SPAN_BUCKETS)
+SQL_STATEMENTS = REGISTRY.counter('db_statements_total', 'SQL statements executed', ('app',))
+UPSTREAM_SECONDS = REGISTRY.histogram('github_request_duration_seconds', 'GitHub API call latency',
+                                      ('resource',))
+UPSTREAM_REQUESTS = REGISTRY.counter('github_requests_total', 'GitHub API calls by response status',
+                                     ('resource', 'status'))
+
+
+class RequestStats:
+    __slots__ = ('started', 'sql', 'spans')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql = 0
+        self.spans = {}
+
+    def add_span(self, name, elapsed):
+        count, total = self.spans.get(name, (0, 0.0))
+        self.spans[name] = (count + 1, total + elapsed)
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(stats, token, app_name, endpoint, method, status, path, logger=None):
+    """Record a finished request and maybe log it as slow"""
+    _current.reset(token)
+    elapsed = time.perf_counter() - stats.started
+    REQUEST_SECONDS.observe(elapsed, (app_name, endpoint, method, str(status)))
+    REQUEST_SQL.observe(stats.sql, (app_name, endpoint))
+    if (SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS and logger is not None
+            and random.random() < SLOW_REQUEST_SAMPLE_RATE):
+        spans = ', '.join(f'{name}={total * 1000:.1f}ms/{count}'
+                          for name, (count, total) in sorted(stats.spans.items()))
+        logger.warning(f"Slow request {method} {path} -> {status} in {elapsed * 1000:.1f}ms "
+                       f"(sql={stats.sql}; {spans or 'no spans'})")
+
+
+def _record_span(name, elapsed):
+    SPAN_SECONDS.observe(elapsed, (name,))
+    stats = _current.get()
+    if stats is not None:
+        stats.add_span(name, elapsed)
+
+
+@contextmanager
+def span(name):
+    """Time a block into span_duration_seconds and the current request's breakdown"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_span(name, time.perf_counter() - started)
+
+
+def observe_upstream(resource, status, elapsed):
+    if METRICS_ENABLED:
+        UPSTREAM_SECONDS.observe(elapsed, (resource,))
+        UPSTREAM_REQUESTS.inc((resource, str(status)))
+
+
+def quota_collector(app_name, scheduler):
+    """Expose a rate-limit scheduler's remaining quota as gauges"""
+    def collect():
+        snapshot = scheduler.snapshot()
+        resources = sorted(snapshot['resources'].items())
+        labels = ('app', 'resource')
+        yield ('github_quota_remaining', 'GitHub calls left across the token pool', 'gauge',
+               [(labels, (app_name, resource), entry['remaining']) for resource, entry in resources])
+        yield ('github_quota_limit', 'GitHub call limit across the token pool', 'gauge',
+               [(labels, (app_name, resource), entry['limit']) for resource, entry in resources])
+        yield ('github_quota_waiting', 'Callers waiting for GitHub quota', 'gauge',
+               [(labels, (app_name, resource), entry['waiting']) for resource, entry in resources])
+    return collect
+
+
+def _instrument_db(app_name, db):
+    def count_statement(*args):
+        SQL_STATEMENTS.inc((app_name,))
+        stats = _current.get()
+        if stats is not None:
+            stats.sql += 1
+
+    def timer(name):
+        def start(session, *args):
+            session.info[name] = time.perf_counter()
+
+        def stop(session, *args):
+            started = session.info.pop(name, None)
+            if started is not None:
+                _record_span(name, time.perf_counter() - started)
+        return start, stop
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+    flush_start, flush_stop = timer('db_flush')
+    commit_start, commit_stop = timer('db_commit')
+    event.listen(db.session, 'before_flush', flush_start)
+    event.listen(db.session, 'after_flush_postexec', flush_stop)
+    event.listen(db.session, 'before_commit', commit_start)
+    event.listen(db.session, 'after_commit', commit_stop)
+    event.listen(db.session, 'after_rollback', lambda session: session.info.pop('db_commit', None))
+
+
+def instrument_app(app, name, db=None, scheduler=None):
+    """Record per-request metrics for a Flask app and serve them at /metrics"""
+    if not METRICS_ENABLED:
+        return
+
+    if db is not None:
+        with app.app_context():
+            _instrument_db(name, db)
+    if scheduler is not None:
+        REGISTRY.collectors.append(quota_collector(name, scheduler))
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_metrics = start_request()
+
+    @app.teardown_request
+    def finish_request_metrics(error=None):
+        started = g.pop('request_metrics', None)
+        if started is None:
+            return
+        status = getattr(g, 'response_status', 500 if error else 200)
+        finish_request(*started, name, request.endpoint or 'unmatched', request.method, status,
+                       request.path, app.logger)
+
+    @app.after_request
+    def remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
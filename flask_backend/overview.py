@@ -0,0 +1,68 @@
+"""
+Repository overview: one response assembled from several GitHub calls
+
+The parts are fetched concurrently, so the endpoint costs about as much as
+the slowest upstream call rather than their sum, and a part that fails is
+reported in ``errors`` instead of failing the whole response.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+OVERVIEW_WORKERS = int(os.environ.get('OVERVIEW_WORKERS', 16))
+
+# Part name -> (GitHub endpoint template, error reported when unavailable)
+OVERVIEW_PARTS = {
+    'repository': ('repos/{owner}/{repo}', 'Repository not found'),
+    'languages': ('repos/{owner}/{repo}/languages', 'Languages data not found'),
+    'contents': ('repos/{owner}/{repo}/contents', 'Contents not found'),
+    'views': ('repos/{owner}/{repo}/traffic/views', 'Traffic data not available'),
+    'clones': ('repos/{owner}/{repo}/traffic/clones', 'Traffic data not available')
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def parse_parts(include):
+    """Parse ?include=a,b,c into part names; None means an unknown part was asked for"""
+    if not include:
+        return list(OVERVIEW_PARTS)
+    parts = []
+    for part in include.split(','):
+        part = part.strip().lower()
+        if part not in OVERVIEW_PARTS:
+            return None
+        if part not in parts:
+            parts.append(part)
+    return parts
+
+
+def part_endpoint(part, owner, repo):
+    return OVERVIEW_PARTS[part][0].format(owner=owner, repo=repo)
+
+
+def overview_payload(results):
+    """Build (payload, status) from {part: data or None}; 404 only if every part failed"""
+    payload = {part: data for part, data in results.items() if data}
+    payload['errors'] = {part: OVERVIEW_PARTS[part][1] for part, data in results.items() if not data}
+    return payload, 200 if len(payload) > 1 else 404
+
+
+def fetch_overview(owner, repo, parts, fetch_part, logger=None):
+    """Run fetch_part(part) for every part on a shared thread pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=OVERVIEW_WORKERS, thread_name_prefix='overview')
+
+    futures = {part: _executor.submit(fetch_part, part) for part in parts}
+    results = {}
+    for part, future in futures.items():
+        try:
+            results[part] = future.result()
+        except Exception as e:
+            if logger:
+                logger.error(f"Overview part {part} failed for {owner}/{repo}: {str(e)}")
+            results[part] = None
+    return results
@@ -0,0 +1,268 @@
+"""
+Rate-limit-aware scheduling of GitHub API calls over a pool of tokens
+
+GitHub meters each token separately per resource class (core, search,
+graphql) and reports the remaining quota in X-RateLimit-* headers on every
+response. The scheduler tracks those numbers, hands each call the token with
+the most headroom, and when every token is low queues callers by priority
+until a quota window resets, instead of letting the request fail upstream.
+
+Background work (cache refreshes, sync jobs) leaves a reserve of each
+token's quota for interactive requests.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+DEFAULT_RESERVE = float(os.environ.get('GITHUB_QUOTA_RESERVE', 0.1))
+DEFAULT_MAX_WAIT = float(os.environ.get('GITHUB_QUOTA_MAX_WAIT', 10))
+DEFAULT_BACKGROUND_MAX_WAIT = float(os.environ.get('GITHUB_QUOTA_BACKGROUND_MAX_WAIT', 120))
+
+# Assumed limits until the first response reports the real ones
+AUTHENTICATED_LIMITS = {'core': 5000, 'search': 30, 'graphql': 5000}
+ANONYMOUS_LIMITS = {'core': 60, 'search': 10, 'graphql': 0}
+
+POLL_INTERVAL = 0.05
+
+
+def resource_for(endpoint):
+    """GitHub rate-limit resource class an endpoint is billed to"""
+    endpoint = endpoint.lstrip('/')
+    if endpoint.startswith('search/'):
+        return 'search'
+    if endpoint == 'graphql':
+        return 'graphql'
+    return 'core'
+
+
+def tokens_from_env():
+    """Tokens from GITHUB_TOKENS (comma separated) plus GITHUB_TOKEN"""
+    tokens = [t.strip() for t in os.environ.get('GITHUB_TOKENS', '').split(',') if t.strip()]
+    single = os.environ.get('GITHUB_TOKEN')
+    if single and single not in tokens:
+        tokens.append(single)
+    return tokens
+
+
+def is_rate_limited(status, headers):
+    """True for a primary (remaining 0) or secondary (Retry-After) rate-limit reply"""
+    if status not in (403, 429):
+        return False
+    return headers.get('X-RateLimit-Remaining') == '0' or headers.get('Retry-After') is not None
+
+
+class QuotaExhausted(Exception):
+    """No token has quota left and none frees up within the caller's max wait"""
+
+    def __init__(self, resource, retry_at):
+        super().__init__(f'GitHub {resource} rate limit exhausted')
+        self.resource = resource
+        self.retry_at = retry_at
+
+    @property
+    def retry_after(self):
+        if math.isinf(self.retry_at):
+            return 60
+        return max(int(math.ceil(self.retry_at - time.time())), 1)
+
+
+class _Quota:
+    __slots__ = ('limit', 'remaining', 'reset', 'blocked_until')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.remaining = limit
+        self.reset = 0
+        self.blocked_until = 0
+
+
+class RateLimitScheduler:
+    """Pick tokens by remaining quota and queue callers by priority when quota runs low"""
+
+    def __init__(self, tokens=None, reserve=DEFAULT_RESERVE, max_wait=DEFAULT_MAX_WAIT,
+                 background_max_wait=DEFAULT_BACKGROUND_MAX_WAIT):
+        # None stands for unauthenticated calls
+        self.tokens = list(tokens) if tokens else [None]
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.background_max_wait = background_max_wait
+        self._quotas = {}
+        self._waiting = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {'acquired': 0, 'queued': 0, 'rejected': 0, 'throttled': 0}
+
+    def _quota(self, token, resource):
+        quota = self._quotas.get((token, resource))
+        if quota is None:
+            limits = AUTHENTICATED_LIMITS if token else ANONYMOUS_LIMITS
+            quota = self._quotas[(token, resource)] = _Quota(limits.get(resource, limits['core']))
+        return quota
+
+    def _take(self, resource, priority, ticket, now):
+        """Return (True, token) on success or (False, time when a token may free up)"""
+        waiting = self._waiting.get(resource)
+        if waiting and waiting[0] != ticket:
+            return False, now + POLL_INTERVAL
+
+        best = None
+        best_headroom = 0
+        retry_at = math.inf
+        for token in self.tokens:
+            quota = self._quota(token, resource)
+            if quota.reset and now >= quota.reset:
+                quota.remaining = quota.limit
+                quota.reset = 0
+            if quota.blocked_until > now:
+                retry_at = min(retry_at, quota.blocked_until)
+                continue
+            floor = math.ceil(quota.limit * self.reserve) if priority >= BACKGROUND else 0
+            headroom = quota.remaining - floor
+            if headroom > best_headroom:
+                best, best_headroom = token, headroom
+            elif quota.limit:
+                retry_at = min(retry_at, quota.reset or now + 1)
+
+        if best_headroom > 0:
+            self._quota(best, resource).remaining -= 1
+            self.stats['acquired'] += 1
+            return True, best
+        return False, retry_at
+
+    def _enqueue(self, resource, priority):
+        ticket = (priority, next(self._seq))
+        heapq.heappush(self._waiting.setdefault(resource, []), ticket)
+        self.stats['queued'] += 1
+        return ticket
+
+    def _dequeue(self, resource, ticket):
+        waiting = self._waiting[resource]
+        waiting.remove(ticket)
+        heapq.heapify(waiting)
+        self._cond.notify_all()
+
+    def _reject(self, resource, retry_at):
+        self.stats['rejected'] += 1
+        return QuotaExhausted(resource, retry_at)
+
+    def _max_wait(self, priority, max_wait):
+        if max_wait is not None:
+            return max_wait
+        return self.background_max_wait if priority >= BACKGROUND else self.max_wait
+
+    def acquire(self, resource, priority=INTERACTIVE, max_wait=None):
+        """Block until a token has quota for resource and return it (None = anonymous)
+
+        Raises QuotaExhausted if nothing frees up within max_wait seconds.
+        """
+        deadline = time.time() + self._max_wait(priority, max_wait)
+        with self._cond:
+            taken, result = self._take(resource, priority, None, time.time())
+            if taken:
+                return result
+
+            ticket = self._enqueue(resource, priority)
+            try:
+                while True:
+                    now = time.time()
+                    taken, result = self._take(resource, priority, ticket, now)
+                    if taken:
+                        return result
+                    retry_at = result
+                    if retry_at > deadline:
+                        raise self._reject(resource, retry_at)
+                    self._cond.wait(max(retry_at - now, 0.001))
+            finally:
+                self._dequeue(resource, ticket)
+
+    async def acquire_async(self, resource, priority=INTERACTIVE, max_wait=None):
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking the loop"""
+        deadline = time.time() + self._max_wait(priority, max_wait)
+        with self._cond:
+            taken, result = self._take(resource, priority, None, time.time())
+            if taken:
+                return result
+            ticket = self._enqueue(resource, priority)
+
+        try:
+            while True:
+                now = time.time()
+                with self._cond:
+                    taken, result = self._take(resource, priority, ticket, now)
+                    if taken:
+                        return result
+                    retry_at = result
+                    if retry_at > deadline:
+                        raise self._reject(resource, retry_at)
+                await asyncio.sleep(min(max(retry_at - now, 0.001), POLL_INTERVAL))
+        finally:
+            with self._cond:
+                self._dequeue(resource, ticket)
+
+    def available(self, resource, priority=INTERACTIVE):
+        """Calls the pool can make on resource right now without waiting"""
+        now = time.time()
+        total = 0
+        with self._cond:
+            for token in self.tokens:
+                quota = self._quota(token, resource)
+                if quota.blocked_until > now:
+                    continue
+                remaining = quota.limit if quota.reset and now >= quota.reset else quota.remaining
+                floor = math.ceil(quota.limit * self.reserve) if priority >= BACKGROUND else 0
+                total += max(remaining - floor, 0)
+        return total
+
+    def update(self, token, resource, status, headers):
+        """Record the quota GitHub reported on a response made with token"""
+        remaining = headers.get('X-RateLimit-Remaining')
+        retry_after = headers.get('Retry-After')
+        if remaining is None and retry_after is None:
+            return
+
+        with self._cond:
+            quota = self._quota(token, headers.get('X-RateLimit-Resource', resource))
+            if remaining is not None:
+                quota.remaining = int(remaining)
+                quota.limit = int(headers.get('X-RateLimit-Limit', quota.limit))
+                quota.reset = int(headers.get('X-RateLimit-Reset', 0))
+            if is_rate_limited(status, headers):
+                self.stats['throttled'] += 1
+                if retry_after is not None:
+                    quota.blocked_until = time.time() + int(retry_after)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _label(token):
+        return f'...{token[-4:]}' if token else 'anonymous'
+
+    def snapshot(self):
+        with self._cond:
+            resources = {}
+            for (token, resource), quota in self._quotas.items():
+                entry = resources.setdefault(resource, {
+                    'remaining': 0, 'limit': 0,
+                    'waiting': len(self._waiting.get(resource, ())), 'tokens': []
+                })
+                entry['remaining'] += quota.remaining
+                entry['limit'] += quota.limit
+                entry['tokens'].append({
+                    'token': self._label(token),
+                    'remaining': quota.remaining,
+                    'limit': quota.limit,
+                    'reset': datetime.utcfromtimestamp(quota.reset).isoformat() if quota.reset else None,
+                    'blocked': quota.blocked_until > time.time()
+                })
+            return dict(self.stats, tokens=len(self.tokens), resources=resources)
+
+
+def create_scheduler(tokens=None):
+    return RateLimitScheduler(tokens if tokens is not None else tokens_from_env())
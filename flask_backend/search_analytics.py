@@ -0,0 +1,285 @@
+"""
+Search popularity index, history retention and search cache prewarming
+
+Every search is rolled up at write time into hourly buckets keyed by the
+normalized query and its first-page variant (sort, order, per_page), the
+same normalization the search cache uses for its keys. Rolling window
+counts (last hour, day, week, month) are sums over those buckets, so the
+raw search_history log can be compacted to a short retention period.
+
+Prewarmer refreshes the first page of the most popular searches shortly
+before their cache entries go stale, so those searches are answered from
+the cache instead of calling GitHub on the request path. With the default
+in-process search cache the prewarmer must run inside the web process
+(SEARCH_PREWARM_IN_PROCESS=1); with a shared SEARCH_CACHE_URL it can run
+as its own worker:
+
+    flask --app flask_backend.app prewarm-searches
+"""
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func
+
+from flask_backend.rate_limit import BACKGROUND, QuotaExhausted
+from flask_backend.search_cache import normalize_search, normalize_search_key
+
+SEARCH_HISTORY_RETENTION_DAYS = int(os.environ.get('SEARCH_HISTORY_RETENTION_DAYS', 30))
+SEARCH_PREWARM_TOP = int(os.environ.get('SEARCH_PREWARM_TOP', 20))
+SEARCH_PREWARM_INTERVAL = int(os.environ.get('SEARCH_PREWARM_INTERVAL', 60))
+SEARCH_PREWARM_WINDOW = os.environ.get('SEARCH_PREWARM_WINDOW', '24h')
+SEARCH_PREWARM_IN_PROCESS = os.environ.get('SEARCH_PREWARM_IN_PROCESS', '0') == '1'
+SEARCH_COMPACT_INTERVAL = int(os.environ.get('SEARCH_COMPACT_INTERVAL', 3600))
+
+# Rolling windows reported for each query; buckets older than the longest are dropped
+WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30)
+}
+
+
+class InvalidWindow(ValueError):
+    pass
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup(records):
+    """Fold search history records into popularity rows (one per variant and hour)"""
+    searches = Counter()
+    results = {}
+    for record in records:
+        query, sort, order, _, per_page = normalize_search(
+            record['query'], record.get('sort'), record.get('order'), 1, record.get('per_page', 30)
+        )
+        if not query:
+            continue
+        key = (query, sort, order, per_page, hour_bucket(record['created_at']))
+        searches[key] += 1
+        results[key] = record.get('results_count', 0)
+    rows = []
+    for key, count in searches.items():
+        query, sort, order, per_page, hour = key
+        rows.append({'query_text': query, 'sort': sort, 'sort_order': order, 'per_page': per_page,
+                     'hour': hour, 'searches': count, 'results_count': results[key]})
+    return rows
+
+
+class SearchAnalytics:
+    """Popularity index over search history, stored in hourly buckets"""
+
+    def __init__(self, db, history_model, popularity_model,
+                 history_retention_days=SEARCH_HISTORY_RETENTION_DAYS):
+        self.db = db
+        self.History = history_model
+        self.Popularity = popularity_model
+        self.history_retention_days = history_retention_days
+        self._increments = {}
+
+    def _increment_statement(self, dialect):
+        """INSERT ... ON CONFLICT DO UPDATE adding to the bucket, for SQLite/PostgreSQL"""
+        if dialect not in ('sqlite', 'postgresql'):
+            return None
+        if dialect not in self._increments:
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+
+            table = self.Popularity.__table__
+            stmt = insert(table)
+            self._increments[dialect] = stmt.on_conflict_do_update(
+                index_elements=[column.name for column in table.primary_key.columns],
+                set_={'searches': table.c.searches + stmt.excluded.searches,
+                      'results_count': stmt.excluded.results_count}
+            )
+        return self._increments[dialect]
+
+    def record(self, records):
+        """Add search history records to the index; the caller commits"""
+        rows = rollup(records)
+        if not rows:
+            return
+        increment = self._increment_statement(self.db.session.get_bind().dialect.name)
+        if increment is not None:
+            self.db.session.execute(increment, rows)
+            return
+
+        for row in rows:
+            key = tuple(row[column.name] for column in self.Popularity.__table__.primary_key.columns)
+            bucket = self.db.session.get(self.Popularity, key)
+            if bucket is None:
+                bucket = self.Popularity(**dict(row, searches=0))
+                self.db.session.add(bucket)
+            bucket.searches += row['searches']
+            bucket.results_count = row['results_count']
+
+    def popular(self, window='24h', limit=20, now=None):
+        """Most searched first-page variants in window, with counts for every window"""
+        if window not in WINDOWS:
+            raise InvalidWindow(f'Unknown window: {window}')
+        now = now or datetime.utcnow()
+        Popularity = self.Popularity
+        counts = {name: func.sum(case((Popularity.hour >= hour_bucket(now - span), Popularity.searches),
+                                      else_=0)).label(f'searches_{name}')
+                  for name, span in WINDOWS.items()}
+        rows = self.db.session.query(
+            Popularity.query_text, Popularity.sort, Popularity.sort_order, Popularity.per_page,
+            func.max(Popularity.hour).label('last_hour'),
+            func.max(Popularity.results_count).label('results_count'), *counts.values()
+        ).filter(Popularity.hour >= hour_bucket(now - WINDOWS[window])).group_by(
+            Popularity.query_text, Popularity.sort, Popularity.sort_order, Popularity.per_page
+        ).order_by(counts[window].desc(), Popularity.query_text).limit(limit).all()
+
+        return [{
+            'query': row.query_text,
+            'sort': row.sort or 'best-match',
+            'order': row.sort_order or 'desc',
+            'per_page': row.per_page,
+            'results_count': row.results_count,
+            'last_searched_hour': row.last_hour.isoformat(),
+            'searches': {name: getattr(row, f'searches_{name}') for name in WINDOWS}
+        } for row in rows]
+
+    def compact(self, now=None):
+        """Drop raw history past retention and buckets older than the longest window"""
+        now = now or datetime.utcnow()
+        history_cutoff = now - timedelta(days=self.history_retention_days)
+        bucket_cutoff = hour_bucket(now - max(WINDOWS.values()))
+        history = self.db.session.query(self.History).filter(
+            self.History.created_at < history_cutoff
+        ).delete(synchronize_session=False)
+        buckets = self.db.session.query(self.Popularity).filter(
+            self.Popularity.hour < bucket_cutoff
+        ).delete(synchronize_session=False)
+        self.db.session.commit()
+        return {'history_deleted': history, 'buckets_deleted': buckets}
+
+    def rebuild(self, batch_size=5000):
+        """Recreate the index from the raw history log (variants default to best match)"""
+        self.db.session.query(self.Popularity).delete(synchronize_session=False)
+        history = self.db.session.query(
+            self.History.query.label('query'), self.History.results_count, self.History.created_at
+        ).order_by(self.History.id).yield_per(batch_size)
+        batch = []
+        recorded = 0
+        for row in history:
+            batch.append({'query': row.query, 'results_count': row.results_count,
+                          'created_at': row.created_at})
+            if len(batch) >= batch_size:
+                self._merge(batch)
+                recorded += len(batch)
+                batch = []
+        if batch:
+            self._merge(batch)
+            recorded += len(batch)
+        self.db.session.commit()
+        return recorded
+
+    def _merge(self, records):
+        # ORM path so buckets split across batches add up on every database
+        for row in rollup(records):
+            key = tuple(row[column.name] for column in self.Popularity.__table__.primary_key.columns)
+            bucket = self.db.session.get(self.Popularity, key)
+            if bucket is None:
+                self.db.session.add(self.Popularity(**row))
+            else:
+                bucket.searches += row['searches']
+        self.db.session.flush()
+
+
+class Prewarmer:
+    """Keep the first page of the most popular searches fresh in the search cache"""
+
+    def __init__(self, analytics, cache, fetch, scheduler=None, top=SEARCH_PREWARM_TOP,
+                 window=SEARCH_PREWARM_WINDOW, interval=SEARCH_PREWARM_INTERVAL, logger=None):
+        self.analytics = analytics
+        self.cache = cache
+        self.fetch = fetch
+        self.scheduler = scheduler
+        self.top = top
+        self.window = window
+        self.interval = interval
+        self.logger = logger
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def run_cycle(self):
+        """Refresh popular entries that would go stale before the next cycle; returns counters"""
+        stats = {'candidates': 0, 'fresh': 0, 'refreshed': 0, 'failed': 0, 'busy': 0, 'deferred': 0}
+        budget = self.top
+        if self.scheduler is not None:
+            budget = min(budget, self.scheduler.available('search', BACKGROUND))
+        # Refresh anything that would otherwise go stale before the next cycle
+        refresh_age = max(self.cache.ttl - self.interval, 0)
+
+        for entry in self.analytics.popular(self.window, self.top):
+            stats['candidates'] += 1
+            query, sort, order, per_page = entry['query'], entry['sort'], entry['order'], entry['per_page']
+            key = normalize_search_key(query, sort, order, 1, per_page)
+            age = self.cache.age(key)
+            if age is not None and age < refresh_age:
+                stats['fresh'] += 1
+                continue
+            if budget <= 0:
+                stats['deferred'] += 1
+                continue
+            if not self.cache.claim_refresh(key):
+                stats['busy'] += 1
+                continue
+
+            budget -= 1
+            data = None
+            try:
+                data = self.fetch(query, sort, order, per_page)
+            except QuotaExhausted:
+                budget = 0
+            finally:
+                self.cache.finish_refresh(key, data)
+            stats['refreshed' if data is not None else 'failed'] += 1
+        return stats
+
+    def run_forever(self, stop=None, compact_interval=SEARCH_COMPACT_INTERVAL):
+        """Worker loop: prewarm every interval seconds and compact history every compact_interval"""
+        stop = stop or threading.Event()
+        next_compaction = time.monotonic()
+        while not stop.is_set():
+            try:
+                stats = self.run_cycle()
+                if self.logger and stats['refreshed'] + stats['failed']:
+                    self.logger.info(f"Search prewarm cycle: {stats}")
+                if compact_interval and time.monotonic() >= next_compaction:
+                    next_compaction = time.monotonic() + compact_interval
+                    compacted = self.analytics.compact()
+                    if self.logger:
+                        self.logger.info(f"Search history compaction: {compacted}")
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Search prewarm cycle failed: {str(e)}")
+            finally:
+                # Do not hold a read transaction open while sleeping
+                self.analytics.db.session.remove()
+            stop.wait(self.interval)
+
+    def ensure_running(self, app):
+        """Run the worker loop on a daemon thread in this process (restarted after fork)"""
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != pid or not self._thread.is_alive():
+                def run():
+                    with app.app_context():
+                        self.run_forever()
+
+                self._pid = pid
+                self._thread = threading.Thread(target=run, name='search-prewarm', daemon=True)
+                self._thread.start()
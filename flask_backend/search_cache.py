@@ -0,0 +1,363 @@
+"""
+TTL cache with stale-while-revalidate for GitHub search pages
+
+GitHub's search API allows 30 requests a minute, so repeated pages of the
+same popular queries are answered from here. Fresh entries are served as-is;
+stale entries are served immediately while a background thread refreshes
+them. Storage is pluggable: in-process LRU, a SQLite file or Redis.
+
+Each backend also indexes its entries by the github_id of the repositories
+on the page, so invalidate_repositories() can drop every cached page showing
+a repository a webhook reported as changed. With the in-process backend
+that reaches only the current process; the other workers' copies expire
+after SEARCH_CACHE_TTL as before.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_URL = os.environ.get('SEARCH_CACHE_URL', 'memory://')
+DEFAULT_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 120))
+DEFAULT_STALE_TTL = int(os.environ.get('SEARCH_CACHE_STALE_TTL', 600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 1000))
+
+FRESH = 'HIT'
+STALE = 'STALE'
+MISS = 'MISS'
+
+
+def normalize_search(query, sort='best-match', order='desc', page=1, per_page=30):
+    """Canonical (query, sort, order, page, per_page) for a search page
+
+    Whitespace and case in the query are not significant to GitHub, and the
+    order is ignored when results are sorted by best match.
+    """
+    query = ' '.join(query.split()).lower()
+    sort = '' if not sort or sort == 'best-match' else sort.lower()
+    order = (order or 'desc').lower() if sort else ''
+    return query, sort, order, int(page), int(per_page)
+
+
+def repository_ids(data):
+    """github_ids of the repositories on a search page"""
+    items = data.get('items') if isinstance(data, dict) else None
+    return [item['id'] for item in items or () if isinstance(item, dict) and 'id' in item]
+
+
+def normalize_search_key(query, sort='best-match', order='desc', page=1, per_page=30):
+    """Canonical cache key for a search page"""
+    return 'search:' + json.dumps(list(normalize_search(query, sort, order, page, per_page)),
+                                  separators=(',', ':'))
+
+
+class MemoryBackend:
+    """In-process LRU bounded by entry count"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys_by_id = {}
+        self._ids_by_key = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, stored_at, body, max_age, github_ids=()):
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = (stored_at, body)
+            self._entries.move_to_end(key)
+            self._ids_by_key[key] = github_ids = set(github_ids)
+            for github_id in github_ids:
+                self._keys_by_id.setdefault(github_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        for github_id in self._ids_by_key.pop(key, ()):
+            keys = self._keys_by_id.get(github_id)
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_id[github_id]
+
+    def delete(self, key):
+        with self._lock:
+            self._forget(key)
+
+    def delete_containing(self, github_ids):
+        with self._lock:
+            keys = set().union(*(self._keys_by_id.get(github_id, ()) for github_id in github_ids))
+            for key in keys:
+                self._forget(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_id.clear()
+            self._ids_by_key.clear()
+
+
+class SQLiteBackend:
+    """Cache shared by every worker on the host through one SQLite file"""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS search_cache '
+            '(key TEXT PRIMARY KEY, stored_at REAL NOT NULL, expires_at REAL NOT NULL, body BLOB NOT NULL)'
+        )
+        conn.execute('CREATE TABLE IF NOT EXISTS search_cache_ids '
+                     '(github_id INTEGER NOT NULL, key TEXT NOT NULL, PRIMARY KEY (github_id, key))')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_search_cache_ids_key ON search_cache_ids (key)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT stored_at, body FROM search_cache WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def set(self, key, stored_at, body, max_age, github_ids=()):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('INSERT OR REPLACE INTO search_cache (key, stored_at, expires_at, body) '
+                         'VALUES (?, ?, ?, ?)', (key, stored_at, stored_at + max_age, body))
+            conn.execute('DELETE FROM search_cache_ids WHERE key = ?', (key,))
+            conn.executemany('INSERT OR IGNORE INTO search_cache_ids (github_id, key) VALUES (?, ?)',
+                             [(github_id, key) for github_id in github_ids])
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(conn)
+
+    def _prune(self, conn):
+        conn.execute('DELETE FROM search_cache WHERE expires_at <= ?', (time.time(),))
+        conn.execute('DELETE FROM search_cache WHERE key NOT IN '
+                     '(SELECT key FROM search_cache ORDER BY stored_at DESC LIMIT ?)', (self.max_entries,))
+        conn.execute('DELETE FROM search_cache_ids WHERE key NOT IN (SELECT key FROM search_cache)')
+
+    def delete(self, key):
+        conn = self._connect()
+        conn.execute('DELETE FROM search_cache WHERE key = ?', (key,))
+        conn.execute('DELETE FROM search_cache_ids WHERE key = ?', (key,))
+
+    def delete_containing(self, github_ids):
+        github_ids = list(github_ids)
+        if not github_ids:
+            return 0
+        marks = ', '.join('?' * len(github_ids))
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            keys = [key for key, in conn.execute(
+                f'SELECT DISTINCT key FROM search_cache_ids WHERE github_id IN ({marks})', github_ids)]
+            conn.executemany('DELETE FROM search_cache WHERE key = ?', [(key,) for key in keys])
+            conn.executemany('DELETE FROM search_cache_ids WHERE key = ?', [(key,) for key in keys])
+        return len(keys)
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM search_cache')
+        conn.execute('DELETE FROM search_cache_ids')
+
+
+class RedisBackend:
+    """Cache shared across hosts through any Redis-compatible server"""
+
+    def __init__(self, url, prefix='goldiesback:'):
+        import redis  # optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        stored_at, _, body = raw.partition(b'\n')
+        return float(stored_at), body
+
+    def _ids_key(self, github_id):
+        return f'{self.prefix}ids:{github_id}'
+
+    def set(self, key, stored_at, body, max_age, github_ids=()):
+        ttl = max(1, int(max_age))
+        pipeline = self.client.pipeline()
+        pipeline.set(self.prefix + key, repr(stored_at).encode() + b'\n' + body, ex=ttl)
+        for github_id in github_ids:
+            # Sets may list keys that expired or were replaced; deleting those is harmless
+            pipeline.sadd(self._ids_key(github_id), key)
+            pipeline.expire(self._ids_key(github_id), ttl)
+        pipeline.execute()
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def delete_containing(self, github_ids):
+        keys = set()
+        for github_id in github_ids:
+            keys.update(self.client.smembers(self._ids_key(github_id)))
+        if keys:
+            self.client.delete(*(self.prefix.encode() + key for key in keys))
+        if github_ids:
+            self.client.delete(*(self._ids_key(github_id) for github_id in github_ids))
+        return len(keys)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + 'search:*'):
+            self.client.delete(key)
+
+
+def backend_from_url(url, max_entries=DEFAULT_MAX_ENTRIES):
+    """Build a backend from memory://, sqlite:///path or redis:// style URLs"""
+    if not url or url.startswith('memory://'):
+        return MemoryBackend(max_entries)
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):], max_entries)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f'Unsupported search cache URL: {url}')
+
+
+class SearchCache:
+    """Serve cached search pages, refreshing stale ones in the background"""
+
+    def __init__(self, backend, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL, refresh_workers=2):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers,
+                                            thread_name_prefix='search-cache-refresh')
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0, 'invalidated': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _read(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception:
+            self._count('errors')
+            return None
+
+    def put(self, key, data):
+        try:
+            body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+            self.backend.set(key, time.time(), body, self.ttl + self.stale_ttl, repository_ids(data))
+        except Exception:
+            self._count('errors')
+
+    def peek(self, key):
+        """Return (data, state) for key; data is None and state MISS when absent or expired"""
+        entry = self._read(key)
+        if entry is not None:
+            stored_at, body = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self._count('hits')
+                return json.loads(body), FRESH
+            if age < self.ttl + self.stale_ttl:
+                self._count('stale_hits')
+                return json.loads(body), STALE
+
+        self._count('misses')
+        return None, MISS
+
+    def age(self, key):
+        """Seconds since key was stored, or None when absent or expired (not counted in stats)"""
+        entry = self._read(key)
+        return time.time() - entry[0] if entry is not None else None
+
+    def claim_refresh(self, key):
+        """True if the caller should refresh key (no refresh is already running)"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def finish_refresh(self, key, data):
+        try:
+            if data is not None:
+                self.put(key, data)
+                self._count('refreshes')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh(self, key, fetch):
+        data = None
+        try:
+            data = fetch()
+        finally:
+            self.finish_refresh(key, data)
+
+    def get_or_fetch(self, key, fetch, refresh=None):
+        """Return (data, state) where state is HIT, STALE or MISS
+
+        fetch is called synchronously on a miss, and refresh (default fetch)
+        on a background thread when a stale entry is served; a None result
+        is never cached.
+        """
+        data, state = self.peek(key)
+        if state == STALE and self.claim_refresh(key):
+            self._executor.submit(self._refresh, key, refresh or fetch)
+        if state != MISS:
+            return data, state
+
+        data = fetch()
+        if data is not None:
+            self.put(key, data)
+        return data, MISS
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def invalidate_repositories(self, github_ids):
+        """Drop every cached page listing one of the repositories; returns how many"""
+        try:
+            dropped = self.backend.delete_containing(list(github_ids))
+        except Exception:
+            self._count('errors')
+            return 0
+        with self._lock:
+            self.stats['invalidated'] += dropped
+        return dropped
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, ttl=self.ttl, stale_ttl=self.stale_ttl,
+                        backend=type(self.backend).__name__)
+
+
+def create_search_cache(url=DEFAULT_URL, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL,
+                        max_entries=DEFAULT_MAX_ENTRIES):
+    return SearchCache(backend_from_url(url, max_entries), ttl=ttl, stale_ttl=stale_ttl)
@@ -0,0 +1,252 @@
+"""
+Answer search refinements from search pages already fetched
+
+Every search page served is folded into a per-query pool of repositories,
+de-duplicated by github_id and kept as columns (stars, forks, updated_at,
+language, archived, best-match rank). Once a pool holds a query's whole
+result set (total_count rows), variations of that query are computed from
+it instead of spending a GitHub search call:
+
+    another sort or order        react                  -> react&sort=stars
+    language/stars/forks/archived qualifiers
+                                 react                  -> react language:javascript stars:>1000
+    another page or page size
+
+Derivation only happens from complete pools, so derived pages list exactly
+what GitHub would, though repositories with equal sort values may come in
+a different order. best-match order is only known for rows that arrived on
+best-match pages, and a language filter matching nothing is left to GitHub
+in case it is an alias. Queries with more than SEARCH_DERIVE_MAX_RESULTS
+results are never pooled; pools expire after SEARCH_DERIVE_TTL seconds, the
+search cache's freshness window by default, or as soon as a webhook
+reports one of their repositories as changed. Pages outside 1.. and page
+sizes outside 1..100 are left to GitHub.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from itertools import compress
+
+from flask_backend.search_cache import normalize_search
+
+SEARCH_DERIVE_ENABLED = os.environ.get('SEARCH_DERIVE_ENABLED', '1') not in ('0', 'false', 'False')
+SEARCH_DERIVE_TTL = int(os.environ.get('SEARCH_DERIVE_TTL', os.environ.get('SEARCH_CACHE_TTL', 120)))
+SEARCH_DERIVE_MAX_QUERIES = int(os.environ.get('SEARCH_DERIVE_MAX_QUERIES', 500))
+SEARCH_DERIVE_MAX_RESULTS = int(os.environ.get('SEARCH_DERIVE_MAX_RESULTS', 1000))  # GitHub's own cap
+GITHUB_MAX_PER_PAGE = 100
+
+# Qualifiers that can be applied to a pooled result set -> pool column
+FILTER_COLUMNS = {'language': 'language', 'stars': 'stars_count', 'forks': 'forks_count',
+                  'archived': 'archived'}
+SORT_COLUMNS = {'stars': 'stars_count', 'forks': 'forks_count', 'updated': 'updated_at'}
+
+QUALIFIER = re.compile(r'^(language|stars|forks|archived):(.+)$')
+NUMBER_RANGE = re.compile(r'^(?:(>=|<=|>|<)?(\d+)|(\d+|\*)\.\.(\d+|\*))$')
+
+
+def number_filter(expression):
+    """Predicate for a GitHub numeric qualifier value (100, >100, <=5, 10..50, 10..*), or None"""
+    match = NUMBER_RANGE.match(expression)
+    if not match:
+        return None
+    operator, value, low, high = match.groups()
+    if value is not None:
+        value = int(value)
+        return {
+            None: lambda v: v == value,
+            '>': lambda v: v > value,
+            '>=': lambda v: v >= value,
+            '<': lambda v: v < value,
+            '<=': lambda v: v <= value
+        }[operator]
+    low = int(low) if low != '*' else -math.inf
+    high = int(high) if high != '*' else math.inf
+    return lambda v: low <= v <= high
+
+
+def valid_page(page, per_page):
+    """True for paging GitHub applies as given; it reinterprets anything else"""
+    return page >= 1 and 1 <= per_page <= GITHUB_MAX_PER_PAGE
+
+
+def parse_refinement(query):
+    """(base query, [(column, predicate)]) with the derivable qualifiers split off, or None
+
+    None means a qualifier is present that cannot be evaluated locally.
+    Expects a normalized (lower-case) query.
+    """
+    terms = []
+    filters = []
+    for token in query.split():
+        match = QUALIFIER.match(token)
+        if not match:
+            terms.append(token)
+            continue
+        name, value = match.groups()
+        if name == 'language':
+            if value.startswith('"') and (len(value) < 2 or not value.endswith('"')):
+                return None  # a multi-word name was split apart above
+            language = value.strip('"')
+            predicate = lambda v, language=language: v == language
+        elif name == 'archived':
+            if value not in ('true', 'false'):
+                return None
+            predicate = lambda v, archived=value == 'true': v == archived
+        else:
+            predicate = number_filter(value)
+            if predicate is None:
+                return None
+        filters.append((FILTER_COLUMNS[name], predicate))
+    return ' '.join(terms), filters
+
+
+class ResultPool:
+    """One query's repositories as columns, in the order they were first seen"""
+
+    def __init__(self, total_count, expires):
+        self.total_count = total_count
+        self.incomplete = False
+        self.expires = expires
+        self.index = {}
+        self.rows = []
+        self.columns = {'stars_count': [], 'forks_count': [], 'updated_at': [], 'language': [],
+                        'archived': [], 'rank': []}
+
+    @property
+    def complete(self):
+        return not self.incomplete and len(self.rows) >= self.total_count
+
+    def add(self, rows, first_rank=None):
+        columns = self.columns
+        for offset, row in enumerate(rows):
+            values = {
+                'stars_count': row['stars_count'] or 0,
+                'forks_count': row['forks_count'] or 0,
+                'updated_at': row['updated_at'] or datetime.min,
+                'language': (row['language'] or '').lower(),
+                'archived': bool(row['archived'])
+            }
+            position = self.index.get(row['github_id'])
+            if position is None:
+                position = self.index[row['github_id']] = len(self.rows)
+                self.rows.append(row)
+                for name, value in values.items():
+                    columns[name].append(value)
+                columns['rank'].append(None)
+            else:
+                self.rows[position] = row
+                for name, value in values.items():
+                    columns[name][position] = value
+            if first_rank is not None:
+                columns['rank'][position] = first_rank + offset
+
+    def select(self, filters, sort, order):
+        """Row positions passing filters in the requested order, or None if the order is unknown"""
+        positions = range(len(self.rows))
+        for column, predicate in filters:
+            positions = list(compress(positions, map(predicate, (self.columns[column][i] for i in positions))))
+        positions = list(positions)
+
+        if not sort:
+            ranks = self.columns['rank']
+            if any(ranks[i] is None for i in positions):
+                return None
+            positions.sort(key=ranks.__getitem__)
+        elif sort in SORT_COLUMNS:
+            positions.sort(key=self.columns[SORT_COLUMNS[sort]].__getitem__, reverse=order != 'asc')
+        else:
+            return None
+        return positions
+
+
+class SearchDeriver:
+    """Pools of fetched search results by normalized query, in an LRU bounded by query count"""
+
+    def __init__(self, ttl=SEARCH_DERIVE_TTL, max_queries=SEARCH_DERIVE_MAX_QUERIES,
+                 max_results=SEARCH_DERIVE_MAX_RESULTS):
+        self.ttl = ttl
+        self.max_queries = max_queries
+        self.max_results = max_results
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'pages': 0, 'derived': 0, 'declined': 0, 'invalidated': 0}
+
+    def add_page(self, query, sort, order, page, per_page, data, rows):
+        """Fold a search page served from GitHub or the search cache into its query's pool"""
+        query, sort, order, page, per_page = normalize_search(query, sort, order, page, per_page)
+        total_count = data.get('total_count', 0)
+        if total_count > self.max_results or not valid_page(page, per_page):
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.stats['pages'] += 1
+            pool = self._pools.get(query)
+            if pool is None or pool.expires <= now or pool.total_count != total_count:
+                pool = self._pools[query] = ResultPool(total_count, now + self.ttl)
+            self._pools.move_to_end(query)
+            pool.incomplete = pool.incomplete or bool(data.get('incomplete_results'))
+            pool.add(rows, (page - 1) * per_page if not sort else None)
+            while len(self._pools) > self.max_queries:
+                self._pools.popitem(last=False)
+
+    def _complete_pool(self, query, now):
+        pool = self._pools.get(query)
+        if pool is None or pool.expires <= now or not pool.complete:
+            return None
+        self._pools.move_to_end(query)
+        return pool
+
+    def derive(self, query, sort, order, page, per_page):
+        """{'total_count', 'incomplete_results', 'rows'} for a search page computed locally, or None"""
+        query, sort, order, page, per_page = normalize_search(query, sort, order, page, per_page)
+        if not valid_page(page, per_page):
+            return None  # left to GitHub, which clamps them its own way
+        candidates = [(query, [])]
+        refinement = parse_refinement(query)
+        if refinement is not None and refinement[1] and refinement[0]:
+            candidates.append(refinement)
+
+        now = time.monotonic()
+        with self._lock:
+            for base, filters in candidates:
+                pool = self._complete_pool(base, now)
+                if pool is None:
+                    continue
+                positions = pool.select(filters, sort, order)
+                if positions is None:
+                    continue
+                if not positions and any(column == 'language' for column, _ in filters):
+                    continue  # maybe an alias (js, c#) GitHub resolves and we cannot
+                self.stats['derived'] += 1
+                start = (page - 1) * per_page
+                return {
+                    'total_count': len(positions),
+                    'incomplete_results': False,
+                    'rows': [pool.rows[i] for i in positions[start:start + per_page]]
+                }
+            self.stats['declined'] += 1
+        return None
+
+    def invalidate_repositories(self, github_ids):
+        """Drop every pool holding one of the repositories; returns how many"""
+        github_ids = set(github_ids)
+        with self._lock:
+            queries = [query for query, pool in self._pools.items() if not github_ids.isdisjoint(pool.index)]
+            for query in queries:
+                del self._pools[query]
+            self.stats['invalidated'] += len(queries)
+        return len(queries)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, queries=len(self._pools),
+                        complete=sum(1 for pool in self._pools.values() if pool.complete))
+
+
+def create_search_deriver(enabled=SEARCH_DERIVE_ENABLED):
+    """Build a SearchDeriver, or None when SEARCH_DERIVE_ENABLED is off"""
+    return SearchDeriver() if enabled else None
@@ -0,0 +1,130 @@
+"""
+Full-text index over saved repositories
+
+SQLite gets an external-content FTS5 table kept in sync by triggers on the
+repository table, so every insert, upsert or delete (ORM or bulk) updates it
+incrementally. PostgreSQL gets a GIN index on a tsvector expression, which
+the database maintains itself. Other databases fall back to LIKE scans.
+
+Matches are ranked by text relevance (bm25 / ts_rank) blended with a
+logarithmic star boost.
+"""
+import math
+import re
+
+from sqlalchemy import event, text
+
+FTS_TABLE = 'repository_fts'
+PG_INDEX = 'ix_repository_search'
+
+# bm25 column weights for name, full_name, description, topics
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+STAR_WEIGHT = 0.15
+CANDIDATE_LIMIT = 500
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def _sqlite_ddl(table):
+    columns = 'name, full_name, description, topics'
+    new_values = 'new.id, new.name, new.full_name, new.description, new.topics'
+    old_values = 'old.id, old.name, old.full_name, old.description, old.topics'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='{table}', content_rowid='id', tokenize='unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES ({new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES ({new_values}); END"
+    ]
+
+
+def _pg_document():
+    return ("to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(full_name, '') || ' ' || "
+            "coalesce(description, '') || ' ' || coalesce(topics::text, ''))")
+
+
+def _pg_ddl(table):
+    return [f'CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {table} USING gin ({_pg_document()})']
+
+
+def ensure(connection, table):
+    """Create the index (and SQLite triggers) if they are missing"""
+    dialect = connection.dialect.name
+    statements = _sqlite_ddl(table) if dialect == 'sqlite' else \
+        _pg_ddl(table) if dialect == 'postgresql' else []
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def rebuild(connection, table):
+    """Backfill the index from the repository table"""
+    ensure(connection, table)
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        connection.execute(text(f'REINDEX INDEX {PG_INDEX}'))
+
+
+def install(table):
+    """Create the index whenever metadata.create_all creates the table"""
+    event.listen(table, 'after_create', lambda target, connection, **kw: ensure(connection, target.name))
+
+
+def tokens(query):
+    return [token.lower() for token in TOKEN.findall(query or '')][:16]
+
+
+def _star_boost(stars):
+    return 1.0 + STAR_WEIGHT * math.log10(1 + max(stars or 0, 0))
+
+
+def search(connection, table, query, language=None, min_stars=None, limit=30, offset=0):
+    """Return (total, [repository ids]) for the best matches, most relevant first"""
+    words = tokens(query)
+    if not words:
+        return 0, []
+
+    filters = ''
+    params = {}
+    if language:
+        filters += ' AND r.language = :language'
+        params['language'] = language
+    if min_stars is not None:
+        filters += ' AND r.stars_count >= :min_stars'
+        params['min_stars'] = min_stars
+
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        params['match'] = ' '.join(f'"{word}"*' for word in words)
+        source = f'FROM {FTS_TABLE} JOIN {table} r ON r.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH :match'
+        relevance = f"-bm25({FTS_TABLE}, {', '.join(str(w) for w in BM25_WEIGHTS)})"
+    elif dialect == 'postgresql':
+        params['tsquery'] = ' & '.join(f'{word}:*' for word in words)
+        document = _pg_document().replace('coalesce(', 'coalesce(r.')
+        source = f"FROM {table} r WHERE {document} @@ to_tsquery('simple', :tsquery)"
+        relevance = f"ts_rank({document}, to_tsquery('simple', :tsquery))"
+    else:
+        clauses = []
+        for i, word in enumerate(words):
+            params[f'w{i}'] = f'%{word}%'
+            clauses.append(f"(lower(r.name) LIKE :w{i} OR lower(r.full_name) LIKE :w{i} "
+                           f"OR lower(coalesce(r.description, '')) LIKE :w{i})")
+        source = f"FROM {table} r WHERE {' AND '.join(clauses)}"
+        relevance = 'r.stars_count'
+
+    total = connection.execute(text(f'SELECT count(*) {source}{filters}'), params).scalar()
+
+    # Rank the strongest text matches, then blend in stars for the final order
+    params['candidates'] = max(CANDIDATE_LIMIT, offset + limit)
+    rows = connection.execute(text(
+        f'SELECT r.id, r.stars_count, {relevance} AS relevance {source}{filters} '
+        f'ORDER BY relevance DESC LIMIT :candidates'
+    ), params).fetchall()
+    ranked = sorted(rows, key=lambda row: (row.relevance or 0.0) * _star_boost(row.stars_count),
+                    reverse=True)
+    return total, [row.id for row in ranked[offset:offset + limit]]
@@ -0,0 +1,198 @@
+"""
+Compact JSON responses: field projection, fast encoding and compression
+
+Serializer turns a table of API field -> Python expression into a function
+compiled once per requested field set, so ``?fields=id,name,stargazers_count``
+builds only those keys with no per-field dispatch at request time.
+
+FastJSONProvider swaps Flask's encoder for orjson when it is installed, and
+compress() / compress_response() apply brotli (if installed) or gzip to
+larger JSON bodies when the client accepts it.
+"""
+import gzip
+import os
+import threading
+
+from flask.json.provider import DefaultJSONProvider
+
+from flask_backend.metrics import span
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used without it
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION', '1') == '1'
+COMPRESS_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', 5))
+BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', 4))
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+class _Accessor:
+    """Fills %(column)s placeholders with attribute or item access on r"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def __getitem__(self, column):
+        return f'r.{column}' if self.source == 'attr' else f'r[{column!r}]'
+
+
+class Serializer:
+    """Build API dicts from objects ('attr') or mappings ('item') for any subset of fields
+
+    spec maps each API field to an expression over r, with %(column)s
+    standing for a column of the source.
+    """
+
+    def __init__(self, spec, source='attr'):
+        self.spec = spec
+        self.fields = tuple(spec)
+        self.source = source
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def parse_fields(self, value):
+        """Parse ?fields=a,b into a tuple of field names (None = all)
+
+        Raises InvalidFields naming the first unknown field.
+        """
+        if not value:
+            return None
+        fields = []
+        for field in value.split(','):
+            field = field.strip()
+            if field not in self.spec:
+                raise InvalidFields(f'Unknown field: {field}')
+            if field not in fields:
+                fields.append(field)
+        return tuple(fields)
+
+    def _compile(self, fields):
+        accessor = _Accessor(self.source)
+        body = ', '.join(f'{field!r}: ({self.spec[field] % accessor})' for field in fields)
+        namespace = {'_iso': _iso}
+        return (eval(f'lambda r: {{{body}}}', namespace),
+                eval(f'lambda rows: [{{{body}}} for r in rows]', namespace))
+
+    def _functions(self, fields):
+        fields = fields or self.fields
+        functions = self._compiled.get(fields)
+        if functions is None:
+            with self._lock:
+                functions = self._compiled.get(fields)
+                if functions is None:
+                    functions = self._compiled[fields] = self._compile(fields)
+        return functions
+
+    def one(self, obj, fields=None):
+        with span('serialize'):
+            return self._functions(fields)[0](obj)
+
+    def many(self, objs, fields=None):
+        with span('serialize'):
+            return self._functions(fields)[1](objs)
+
+
+def select_fields(data, fields):
+    """Project an already built API dict onto fields (None = unchanged)"""
+    if not fields:
+        return data
+    return {field: data.get(field) for field in fields}
+
+
+def encode_with_fragments(encode, obj, key, items):
+    """JSON bytes for obj with obj[key] set to the list items
+
+    Items that are bytes are already encoded JSON values and are spliced in
+    as they are; anything else is encoded with encode().
+    """
+    marker = '\x00fragments\x00'
+    with span('json'):
+        body = encode(dict(obj, **{key: marker}))
+        values = b','.join(item if isinstance(item, bytes) else encode(item) for item in items)
+        return body.replace(encode(marker), b'[' + values + b']', 1)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson when available, same output otherwise"""
+
+    def _options(self):
+        # Dates keep Flask's HTTP date format by going through default()
+        options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                   | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def dumps_bytes(self, obj):
+        """Compact UTF-8 JSON bytes, skipping the str round trip when orjson is present"""
+        if orjson is None:
+            return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def response(self, *args, **kwargs):
+        with span('json'):
+            if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+                return super().response(*args, **kwargs)
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encoding):
+    """Best content coding we can produce for an Accept-Encoding header, or None"""
+    accepted = set()
+    for item in (accept_encoding or '').lower().split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, accept_encoding):
+    """Return (body, content coding or None) for a response body"""
+    if not COMPRESSION_ENABLED or len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), 'gzip'
+    return body, None
+
+
+def compress_response(response, accept_encoding):
+    """after_request hook body: compress buffered JSON responses in place"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+
+    body, encoding = compress(response.get_data(), accept_encoding)
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,179 @@
+"""
+Single-flight request coalescing
+
+Concurrent callers asking for the same key share one execution of the
+underlying function: the first caller runs it and everyone else waiting on
+that key receives the same result (or exception). Optionally, a per-key lock
+file plus a short-lived shared result store extends this across gunicorn
+workers on the same host.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_LOCK_DIR = os.environ.get('SINGLEFLIGHT_LOCK_DIR')
+DEFAULT_STORE_URL = os.environ.get('SINGLEFLIGHT_STORE_URL')
+DEFAULT_RESULT_TTL = float(os.environ.get('SINGLEFLIGHT_RESULT_TTL', 2))
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce identical in-flight calls within (and optionally across) processes"""
+
+    def __init__(self, lock_dir=None, result_store=None, result_ttl=DEFAULT_RESULT_TTL):
+        self.lock_dir = lock_dir
+        self.result_store = result_store
+        self.result_ttl = result_ttl
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'executions': 0, 'coalesced': 0, 'coalesced_across_workers': 0}
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers of key and return its result"""
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.lock_dir:
+                call.result = self._run_across_workers(key, fn)
+            else:
+                self._count('executions')
+                call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def _run_across_workers(self, key, fn):
+        """Serialize key across processes with flock and reuse a sibling's fresh result
+
+        Results must be JSON-serializable to be shared through the store.
+        """
+        import fcntl  # POSIX only; cross-worker mode is opt-in
+
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        path = os.path.join(self.lock_dir, f'{digest}.lock')
+        with open(path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                shared = self._read_shared(digest)
+                if shared is not None:
+                    self._count('coalesced_across_workers')
+                    return shared
+
+                self._count('executions')
+                result = fn()
+                self._write_shared(digest, result)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_shared(self, digest):
+        if self.result_store is None:
+            return None
+        try:
+            entry = self.result_store.get(f'singleflight:{digest}')
+        except Exception:
+            return None
+        if entry is None or time.time() - entry[0] > self.result_ttl:
+            return None
+        return json.loads(entry[1])
+
+    def _write_shared(self, digest, result):
+        if self.result_store is None or result is None:
+            return
+        try:
+            body = json.dumps(result, separators=(',', ':')).encode('utf-8')
+            self.result_store.set(f'singleflight:{digest}', time.time(), body, self.result_ttl)
+        except (TypeError, ValueError):
+            pass
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls),
+                        cross_worker=bool(self.lock_dir))
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for coroutines on one event loop"""
+
+    def __init__(self):
+        self._calls = {}
+        self.stats = {'calls': 0, 'executions': 0, 'coalesced': 0}
+
+    async def do(self, key, fn):
+        """Await fn() once for all concurrent callers of key and return its result"""
+        self.stats['calls'] += 1
+        future = self._calls.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        self.stats['executions'] += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # followers re-raise it; don't warn if there are none
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def snapshot(self):
+        return dict(self.stats, in_flight=len(self._calls))
+
+
+def create_singleflight(lock_dir=DEFAULT_LOCK_DIR, store_url=DEFAULT_STORE_URL,
+                        result_ttl=DEFAULT_RESULT_TTL):
+    """Build a SingleFlight; cross-worker mode turns on when a lock dir is given"""
+    result_store = None
+    if lock_dir:
+        from flask_backend.search_cache import backend_from_url
+
+        os.makedirs(lock_dir, exist_ok=True)
+        store_url = store_url or f"sqlite:///{os.path.join(lock_dir, 'singleflight.db')}"
+        result_store = backend_from_url(store_url)
+    return SingleFlight(lock_dir=lock_dir, result_store=result_store, result_ttl=result_ttl)
@@ -0,0 +1,195 @@
+"""
+Background incremental sync of saved repositories
+
+Each cycle picks the saved repositories most in need of a refresh (longest
+since their last sync, weighted up by stars), re-fetches them from GitHub by
+id with If-None-Match, and writes back only the columns that changed. A 304
+costs no GitHub quota and only bumps the sync timestamp.
+
+Upstream calls run at BACKGROUND priority on a bounded thread pool; the
+number of calls per cycle is capped by a budget and by the quota the token
+pool can spare.
+
+    flask --app flask_backend.app sync-repositories            # worker loop
+    flask --app flask_backend.app sync-repositories --once     # one cycle (cron)
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from sqlalchemy import or_, update
+
+from flask_backend.rate_limit import BACKGROUND, QuotaExhausted, is_rate_limited
+
+SYNC_CONCURRENCY = int(os.environ.get('SYNC_CONCURRENCY', 4))
+SYNC_BUDGET = int(os.environ.get('SYNC_BUDGET', 500))
+SYNC_MIN_AGE = int(os.environ.get('SYNC_MIN_AGE', 3600))
+SYNC_INTERVAL = int(os.environ.get('SYNC_INTERVAL', 300))
+SYNC_MAX_FAILURES = int(os.environ.get('SYNC_MAX_FAILURES', 5))
+
+# Replies meaning the repository is gone or hidden from us
+MISSING_STATUSES = (403, 404, 410, 451)
+
+# Candidates read per slot in the budget before ranking them in Python
+CANDIDATE_FACTOR = 4
+NEVER_SYNCED_AGE = timedelta(days=365).total_seconds()
+
+
+def staleness_score(synced_at, stars, now):
+    """Seconds since the last sync, weighted up logarithmically by stars"""
+    age = (now - synced_at).total_seconds() if synced_at else NEVER_SYNCED_AGE
+    return age * (1 + math.log10(1 + max(stars or 0, 0)))
+
+
+def changed_columns(current, fresh, preserved=()):
+    """Column values in fresh that differ from the current ORM row
+
+    Columns listed in preserved keep their stored value when fresh has None.
+    """
+    changed = {}
+    for column, value in fresh.items():
+        if value is None and column in preserved:
+            continue
+        if getattr(current, column) != value:
+            changed[column] = value
+    return changed
+
+
+class SyncEngine:
+    """Refresh saved repositories from GitHub in budgeted, conditional batches"""
+
+    def __init__(self, db, repository_model, state_model, github, map_payload, preserved=(),
+                 concurrency=SYNC_CONCURRENCY, budget=SYNC_BUDGET, min_age=SYNC_MIN_AGE, logger=None):
+        self.db = db
+        self.Repository = repository_model
+        self.State = state_model
+        self.github = github
+        self.map_payload = map_payload
+        self.preserved = preserved
+        self.concurrency = concurrency
+        self.budget = budget
+        self.min_age = min_age
+        self.logger = logger
+
+    def due(self, limit, now):
+        """Return up to limit (github_id, stars, etag, synced_at) rows, most urgent first"""
+        Repository, State = self.Repository, self.State
+        cutoff = now - timedelta(seconds=self.min_age)
+        rows = self.db.session.query(
+            Repository.github_id, Repository.stars_count, State.etag, State.synced_at
+        ).outerjoin(State, State.github_id == Repository.github_id).filter(
+            or_(State.synced_at.is_(None), State.synced_at < cutoff),
+            or_(State.failures.is_(None), State.failures < SYNC_MAX_FAILURES)
+        ).order_by(State.synced_at.asc().nulls_first()).limit(limit * CANDIDATE_FACTOR).all()
+
+        rows.sort(key=lambda row: staleness_score(row.synced_at, row.stars_count, now), reverse=True)
+        return rows[:limit]
+
+    def fetch(self, github_id, etag):
+        """Return (status, etag, payload or None) for one repository"""
+        headers = {'If-None-Match': etag} if etag else None
+        response = self.github.get(f'repositories/{github_id}', headers=headers, priority=BACKGROUND)
+        if response.status_code == 200:
+            return 200, response.headers.get('ETag'), response.json()
+        if is_rate_limited(response.status_code, response.headers):
+            return 'deferred', etag, None
+        return response.status_code, etag, None
+
+    def _fetch_safely(self, row):
+        try:
+            return row, self.fetch(row.github_id, row.etag)
+        except QuotaExhausted:
+            return row, ('deferred', row.etag, None)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if self.logger:
+                self.logger.error(f"Sync fetch failed for repository {row.github_id}: {str(e)}")
+            return row, ('error', row.etag, None)
+
+    def run_cycle(self, budget=None):
+        """Sync one batch; must run inside an app context. Returns counters."""
+        budget = self.budget if budget is None else budget
+        scheduler = getattr(self.github, 'scheduler', None)
+        if scheduler is not None:
+            budget = min(budget, scheduler.available('core', BACKGROUND))
+
+        now = datetime.utcnow()
+        stats = {'checked': 0, 'not_modified': 0, 'unchanged': 0, 'updated': 0, 'columns_written': 0,
+                 'missing': 0, 'deferred': 0, 'errors': 0, 'budget': budget}
+        candidates = self.due(budget, now) if budget > 0 else []
+        if not candidates:
+            return stats
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='sync') as pool:
+            results = list(pool.map(self._fetch_safely, candidates))
+
+        ids = [row.github_id for row, _ in results]
+        states = {state.github_id: state for state in
+                  self.db.session.query(self.State).filter(self.State.github_id.in_(ids))}
+        fresh = {row.github_id: payload for row, (status, _, payload) in results if status == 200}
+        current = {repo.github_id: repo for repo in
+                   self.db.session.query(self.Repository).filter(self.Repository.github_id.in_(list(fresh)))
+                   } if fresh else {}
+
+        for row, (status, etag, payload) in results:
+            if status == 'deferred':
+                stats['deferred'] += 1
+                continue
+            if status not in (200, 304) and status not in MISSING_STATUSES:
+                stats['errors'] += 1
+                continue
+
+            stats['checked'] += 1
+            state = states.get(row.github_id)
+            if state is None:
+                state = self.State(github_id=row.github_id, failures=0)
+                self.db.session.add(state)
+            state.synced_at = now
+
+            if status == 304:
+                state.failures = 0
+                stats['not_modified'] += 1
+            elif status == 200:
+                state.etag = etag
+                state.failures = 0
+                changed = self._write_changes(current.get(row.github_id), payload)
+                stats['updated' if changed else 'unchanged'] += 1
+                stats['columns_written'] += changed
+            else:
+                # Deleted, made private or blocked; retried a few times, then left alone
+                state.failures = (state.failures or 0) + 1
+                stats['missing'] += 1
+
+        self.db.session.commit()
+        return stats
+
+    def _write_changes(self, repository, payload):
+        if repository is None:
+            return 0
+        fresh = self.map_payload([payload])[0]
+        changed = changed_columns(repository, fresh, self.preserved)
+        if changed:
+            self.db.session.execute(
+                update(self.Repository).where(self.Repository.github_id == repository.github_id)
+                .values(**changed)
+            )
+        return len(changed)
+
+    def run_forever(self, interval=SYNC_INTERVAL, stop=None):
+        """Worker loop: run a cycle, then sleep interval seconds (until stop is set)"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                stats = self.run_cycle()
+                if self.logger:
+                    self.logger.info(f"Repository sync cycle: {stats} in "
+                                     f"{time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                self.db.session.rollback()
+                if self.logger:
+                    self.logger.error(f"Repository sync cycle failed: {str(e)}")
+            stop.wait(interval)
@@ -0,0 +1,172 @@
+"""
+Local time series of repository traffic (views and clones)
+
+GitHub keeps only the last 14 days of traffic and recomputes them on every
+call. Each fetch is folded into one row per repository and day (views,
+unique visitors, clones, unique cloners) keyed by (repository, day).
+Ingestion is incremental: only days at or after the last stored day are
+upserted, since earlier days are final. The last stored day is rewritten
+because it is still being counted. Reads are one primary key range scan,
+rolled up into day, week (starting Monday) or month buckets.
+
+Repositories are fetched again only after TRAFFIC_REFRESH_INTERVAL seconds.
+Run `flask --app flask_backend.app ingest-traffic` daily from cron so
+history keeps growing for repositories nobody is looking at.
+
+Bucket and total uniques are sums of the daily uniques, so they count a
+visitor once per day, not once per range.
+"""
+import os
+from datetime import date, datetime, timedelta
+
+TRAFFIC_REFRESH_INTERVAL = int(os.environ.get('TRAFFIC_REFRESH_INTERVAL', 3600))
+TRAFFIC_DEFAULT_DAYS = int(os.environ.get('TRAFFIC_DEFAULT_DAYS', 14))
+
+# Traffic kind -> (count column, uniques column)
+KINDS = {
+    'views': ('views', 'view_uniques'),
+    'clones': ('clones', 'clone_uniques')
+}
+PERIODS = ('day', 'week', 'month')
+
+
+class InvalidRange(ValueError):
+    pass
+
+
+def traffic_key(owner, repo):
+    return f'{owner}/{repo}'.lower()
+
+
+def parse_range(args, today=None):
+    """(since, until, per) from ?since=YYYY-MM-DD&until=YYYY-MM-DD&per=day|week|month"""
+    per = args.get('per', 'day')
+    if per not in PERIODS:
+        raise InvalidRange(f"per must be one of {', '.join(PERIODS)}")
+    try:
+        until = date.fromisoformat(args['until']) if args.get('until') else today or datetime.utcnow().date()
+        since = date.fromisoformat(args['since']) if args.get('since') else \
+            until - timedelta(days=TRAFFIC_DEFAULT_DAYS - 1)
+    except ValueError:
+        raise InvalidRange('since and until must be dates (YYYY-MM-DD)')
+    if since > until:
+        raise InvalidRange('since must not be after until')
+    return since, until, per
+
+
+def bucket_start(day, per):
+    if per == 'week':
+        return day - timedelta(days=day.weekday())
+    if per == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def daily_counts(data, kind):
+    """[(day, count, uniques)] from a GitHub traffic reply"""
+    return [(date.fromisoformat(entry['timestamp'][:10]), entry.get('count', 0), entry.get('uniques', 0))
+            for entry in data.get(kind) or []]
+
+
+class TrafficStore:
+    """Daily traffic rows plus per repository and kind ingestion state"""
+
+    def __init__(self, db, day_model, state_model, refresh_interval=TRAFFIC_REFRESH_INTERVAL):
+        self.db = db
+        self.Day = day_model
+        self.State = state_model
+        self.refresh_interval = refresh_interval
+        self._upserts = {}
+
+    def _state(self, repository, kind):
+        return self.db.session.get(self.State, (repository, kind))
+
+    def due(self, repository, kind, now=None):
+        """True if the repository's traffic of this kind should be fetched from GitHub again"""
+        state = self._state(repository, kind)
+        now = now or datetime.utcnow()
+        return state is None or state.fetched_at is None or \
+            state.fetched_at <= now - timedelta(seconds=self.refresh_interval)
+
+    def has_history(self, repository, kind):
+        state = self._state(repository, kind)
+        return state is not None and state.last_day is not None
+
+    def tracked(self, kind, now=None):
+        """Repositories with stored traffic of this kind that are due for a fetch"""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.refresh_interval)
+        return [repository for repository, in self.db.session.query(self.State.repository).filter(
+            self.State.kind == kind, self.State.fetched_at <= cutoff
+        ).order_by(self.State.fetched_at)]
+
+    def _upsert_statement(self, dialect, kind):
+        """INSERT ... ON CONFLICT DO UPDATE of one kind's columns, for SQLite/PostgreSQL"""
+        if dialect not in ('sqlite', 'postgresql'):
+            return None
+        if (dialect, kind) not in self._upserts:
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+
+            stmt = insert(self.Day.__table__)
+            self._upserts[dialect, kind] = stmt.on_conflict_do_update(
+                index_elements=['repository', 'day'],
+                set_={column: stmt.excluded[column] for column in KINDS[kind]}
+            )
+        return self._upserts[dialect, kind]
+
+    def ingest(self, repository, kind, data, fetched_at=None):
+        """Store the days of a GitHub traffic reply not already final locally; the caller commits
+
+        Returns the number of days written.
+        """
+        count_column, uniques_column = KINDS[kind]
+        state = self._state(repository, kind)
+        if state is None:
+            state = self.State(repository=repository, kind=kind)
+            self.db.session.add(state)
+        last_day = state.last_day
+        days = [(day, count, uniques) for day, count, uniques in daily_counts(data, kind)
+                if last_day is None or day >= last_day]
+
+        if days:
+            rows = [{'repository': repository, 'day': day, count_column: count, uniques_column: uniques}
+                    for day, count, uniques in days]
+            upsert = self._upsert_statement(self.db.session.get_bind().dialect.name, kind)
+            if upsert is not None:
+                self.db.session.execute(upsert, rows)
+            else:
+                for row in rows:
+                    record = self.db.session.get(self.Day, (repository, row['day']))
+                    if record is None:
+                        record = self.Day(repository=repository, day=row['day'])
+                        self.db.session.add(record)
+                    setattr(record, count_column, row[count_column])
+                    setattr(record, uniques_column, row[uniques_column])
+            state.last_day = max(day for day, _, _ in days)
+        state.fetched_at = fetched_at or datetime.utcnow()
+        return len(days)
+
+    def series(self, repository, kind, since, until, per='day'):
+        """Traffic between since and until (inclusive) in GitHub's reply shape, bucketed by per"""
+        count_column, uniques_column = (getattr(self.Day, column) for column in KINDS[kind])
+        rows = self.db.session.query(self.Day.day, count_column, uniques_column).filter(
+            self.Day.repository == repository, self.Day.day >= since, self.Day.day <= until
+        ).order_by(self.Day.day)
+
+        buckets = {}
+        for day, count, uniques in rows:
+            bucket = buckets.setdefault(bucket_start(day, per), [0, 0])
+            bucket[0] += count or 0
+            bucket[1] += uniques or 0
+        return {
+            'count': sum(count for count, _ in buckets.values()),
+            'uniques': sum(uniques for _, uniques in buckets.values()),
+            kind: [{'timestamp': f'{start.isoformat()}T00:00:00Z', 'count': count, 'uniques': uniques}
+                   for start, (count, uniques) in buckets.items()],
+            'since': since.isoformat(),
+            'until': until.isoformat(),
+            'per': per
+        }
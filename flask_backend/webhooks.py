@@ -0,0 +1,95 @@
+"""
+GitHub webhook deliveries: signature checks, event mapping, record and replay
+
+Point a repository, organization or GitHub App webhook (content type
+application/json) at /api/webhooks/github with GITHUB_WEBHOOK_SECRET as its
+secret. Every delivery is checked against its X-Hub-Signature-256 header.
+
+push, star, watch, fork, release and repository events carry the current
+repository payload, so they can replace polling for repositories that have
+a webhook. change_for() maps a delivery to a write:
+
+    ('webhook_repositories', [payload])   update the saved row in place
+    ('deleted_repositories', [{...}])     the repository was deleted
+
+Other events (including ping) are acknowledged and ignored.
+
+Set WEBHOOK_RECORD_DIR to keep every verified delivery as
+<delivery id>.json. `flask --app flask_backend.app replay-webhooks PATH...`
+replays recorded deliveries in process, or signs and POSTs them to a
+running server with --url.
+"""
+import glob
+import hashlib
+import hmac
+import json
+import os
+from datetime import datetime, timezone
+
+GITHUB_WEBHOOK_SECRET = os.environ.get('GITHUB_WEBHOOK_SECRET')
+WEBHOOK_RECORD_DIR = os.environ.get('WEBHOOK_RECORD_DIR')
+
+REPOSITORY_EVENTS = ('push', 'star', 'watch', 'fork', 'release', 'repository')
+
+# Push event payloads give these as Unix timestamps instead of ISO 8601
+TIMESTAMP_FIELDS = ('created_at', 'updated_at', 'pushed_at')
+
+
+def sign(secret, body):
+    """X-Hub-Signature-256 value for body"""
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    return bool(signature) and hmac.compare_digest(sign(secret, body), signature)
+
+
+def repository_payload(repository):
+    """A webhook's repository object in the REST payload shape repository_rows() reads"""
+    repository = dict(repository)
+    for field in TIMESTAMP_FIELDS:
+        if isinstance(repository.get(field), (int, float)):
+            repository[field] = datetime.fromtimestamp(repository[field], timezone.utc).isoformat()
+    return repository
+
+
+def change_for(event, payload):
+    """(write kind, records) a delivery calls for, or None if it changes nothing we store"""
+    repository = payload.get('repository') if isinstance(payload, dict) else None
+    if event not in REPOSITORY_EVENTS or not isinstance(repository, dict) or 'id' not in repository:
+        return None
+    if event == 'repository' and payload.get('action') == 'deleted':
+        return 'deleted_repositories', [{'github_id': repository['id'],
+                                         'full_name': repository.get('full_name', '')}]
+    # fork events describe the new fork as forkee; repository is the one that gained a fork
+    return 'webhook_repositories', [repository_payload(repository)]
+
+
+def record_delivery(directory, event, delivery, payload):
+    """Keep a verified delivery as <directory>/<delivery>.json for replay_deliveries()"""
+    os.makedirs(directory, exist_ok=True)
+    name = ''.join(c for c in delivery if c.isalnum() or c == '-') or datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    with open(os.path.join(directory, f'{name}.json'), 'w') as f:
+        json.dump({'event': event, 'delivery': delivery, 'payload': payload}, f)
+
+
+def recorded_deliveries(paths):
+    """Yield (event, delivery, payload) from recorded files and directories of them, oldest first"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.json')), key=os.path.getmtime))
+        else:
+            files.append(path)
+    for path in files:
+        with open(path) as f:
+            recorded = json.load(f)
+        yield recorded['event'], recorded.get('delivery', os.path.basename(path)), recorded['payload']
+
+
+def post_delivery(session, url, secret, event, delivery, payload):
+    """Send a recorded delivery to a running server as GitHub would; returns the response"""
+    body = json.dumps(payload).encode('utf-8')
+    headers = {'Content-Type': 'application/json', 'X-GitHub-Event': event,
+               'X-GitHub-Delivery': delivery, 'X-Hub-Signature-256': sign(secret, body)}
+    return session.post(url, data=body, headers=headers, timeout=30)
@@ -0,0 +1,204 @@
+"""
+Write-behind queue for database persistence
+
+Request handlers enqueue records and return immediately; a background thread
+drains the queue in batches and hands each batch to a flush function. The
+queue is bounded: when it is full, enqueue waits briefly and then reports
+failure so the caller can write synchronously instead (backpressure).
+
+A batch that fails with an OperationalError (lock timeout, deadlock, dropped
+connection) is retried WRITE_BEHIND_RETRIES times with exponential backoff.
+If it still fails, or fails with any other error, each kind of record is
+flushed as its own batch, and the records of a kind that fails are flushed
+one at a time. Only records that fail on their own are lost; they are
+logged and counted in stats['failed']. Records still queued when the
+process is killed without running close() (SIGKILL, OOM) are lost too.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+DEFAULT_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', '1') not in ('0', 'false', 'False')
+DEFAULT_MAX_SIZE = int(os.environ.get('WRITE_BEHIND_MAX_SIZE', 1000))
+DEFAULT_FLUSH_SIZE = int(os.environ.get('WRITE_BEHIND_FLUSH_SIZE', 50))
+DEFAULT_FLUSH_INTERVAL = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.5))
+DEFAULT_ENQUEUE_TIMEOUT = float(os.environ.get('WRITE_BEHIND_ENQUEUE_TIMEOUT', 0.05))
+DEFAULT_RETRIES = int(os.environ.get('WRITE_BEHIND_RETRIES', 3))
+DEFAULT_RETRY_DELAY = float(os.environ.get('WRITE_BEHIND_RETRY_DELAY', 0.1))  # doubled after each attempt
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Bounded queue of (kind, payload) records flushed in batches by one thread"""
+
+    def __init__(self, flush, max_size=DEFAULT_MAX_SIZE, flush_size=DEFAULT_FLUSH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, enqueue_timeout=DEFAULT_ENQUEUE_TIMEOUT,
+                 retries=DEFAULT_RETRIES, retry_delay=DEFAULT_RETRY_DELAY, logger=None):
+        self.flush = flush
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.logger = logger
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {'enqueued': 0, 'rejected': 0, 'flushed': 0, 'batches': 0, 'failed': 0,
+                      'retries': 0, 'split_batches': 0, 'max_depth': 0, 'last_flush_ms': 0.0}
+
+    def _ensure_worker(self):
+        """Start the drain thread lazily, and again in a forked child"""
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != pid or not self._thread.is_alive():
+                self._pid = pid
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, kind, payload):
+        """Queue a record for the next batch; False means the caller must write it itself"""
+        if self._closed:
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put((kind, payload), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self.stats['rejected'] += 1
+            return False
+        with self._lock:
+            self.stats['enqueued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], self._queue.qsize())
+        return True
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            stop = item is _STOP
+            if not stop:
+                batch.append(item)
+
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._flush(batch)
+            if stop:
+                self._drain()
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        if batch:
+            self._flush(batch)
+
+    def _attempt(self, batch):
+        """Flush batch, retrying transient database errors; re-raises the last error"""
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                self.flush(batch)
+                return
+            except OperationalError:
+                if attempt == self.retries:
+                    raise
+                with self._lock:
+                    self.stats['retries'] += 1
+                time.sleep(delay)
+                delay *= 2
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            self._attempt(batch)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Write-behind flush of {len(batch)} records failed, splitting it: {str(e)}")
+            with self._lock:
+                self.stats['split_batches'] += 1
+            self._flush_split(batch)
+            return
+        with self._lock:
+            self.stats['flushed'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _flush_split(self, batch):
+        """Flush each kind on its own, then each record of a kind that still fails"""
+        kinds = {}
+        for record in batch:
+            kinds.setdefault(record[0], []).append(record)
+        for kind, records in kinds.items():
+            try:
+                self._attempt(records)
+                flushed = len(records)
+            except Exception:
+                flushed = 0
+                for record in records:
+                    try:
+                        self._attempt([record])
+                        flushed += 1
+                    except Exception as e:
+                        with self._lock:
+                            self.stats['failed'] += 1
+                        if self.logger:
+                            self.logger.error(f"Write-behind dropped a {kind} record: {str(e)}")
+            with self._lock:
+                self.stats['flushed'] += flushed
+                self.stats['batches'] += 1
+
+    def close(self, timeout=10):
+        """Stop accepting records and flush whatever is still queued"""
+        self._closed = True
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        else:
+            self._drain()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, depth=self._queue.qsize(), capacity=self._queue.maxsize,
+                        flush_size=self.flush_size, flush_interval=self.flush_interval)
+
+
+def create_write_behind(flush, logger=None, enabled=DEFAULT_ENABLED):
+    """Build a started-on-demand queue that flushes on interpreter exit, or None"""
+    if not enabled:
+        return None
+    write_behind = WriteBehindQueue(flush, logger=logger)
+    atexit.register(write_behind.close)
+    return write_behind
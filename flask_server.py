@@ -3,31 +3,52 @@
 Simple Flask Backend Server for Android and Chromebook Clients
 Optimized for GitHub Repository exploration
 """
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import requests
 import os
+import json
 from datetime import datetime
 
+from flask_backend.conditional_cache import ConditionalCache
+from flask_backend import contents_proxy
+from flask_backend.github_client import GitHubClient, DEFAULT_CACHE_MAX_BYTES
+from flask_backend.metrics import instrument_app, span
+from flask_backend.rate_limit import BACKGROUND, INTERACTIVE, QuotaExhausted, create_scheduler
+from flask_backend.overview import fetch_overview, overview_payload, parse_parts, part_endpoint
+from flask_backend.search_cache import create_search_cache, normalize_search_key
+from flask_backend.serialization import FastJSONProvider, InvalidFields, Serializer, compress_response
+from flask_backend.singleflight import create_singleflight
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)  # Enable CORS for Android and Chromebook clients
 
 # GitHub API configuration
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN', '')
-GITHUB_API_BASE = 'https://api.github.com'
+upstream = create_scheduler()
+github = GitHubClient(
+    scheduler=upstream,
+    cache=ConditionalCache(DEFAULT_CACHE_MAX_BYTES) if DEFAULT_CACHE_MAX_BYTES else None
+)
+search_cache = create_search_cache()
+singleflight = create_singleflight()
 
-def make_github_request(endpoint, params=None):
-    """Make request to GitHub API with optional authentication"""
-    headers = {'User-Agent': 'GitHub-Explorer/1.0'}
-    if GITHUB_TOKEN:
-        headers['Authorization'] = f'token {GITHUB_TOKEN}'
-    
-    url = f"{GITHUB_API_BASE}/{endpoint.lstrip('/')}"
-    
+# Request timing, SQL counts and upstream quota at /metrics
+instrument_app(app, 'mobile', scheduler=upstream)
+
+def make_github_request(endpoint, params=None, priority=INTERACTIVE):
+    """Make request to GitHub API with optional authentication
+
+    Identical concurrent requests are coalesced into a single upstream call.
+    """
+    key = 'github:' + json.dumps([endpoint.lstrip('/'), params or {}], sort_keys=True)
+    return singleflight.do(key, lambda: _fetch_github(endpoint, params, priority))
+
+def _fetch_github(endpoint, params, priority):
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json()
+        with span('github'):
+            return github.get_json(endpoint, params, priority=priority)
     except requests.exceptions.RequestException as e:
         print(f"GitHub API request failed: {str(e)}")
         return None
@@ -40,6 +61,10 @@ def health_check():
         'server': 'Flask Python Backend',
         'timestamp': datetime.utcnow().isoformat(),
         'github_token_configured': bool(GITHUB_TOKEN),
+        'github_quota': upstream.snapshot(),
+        'github_cache': github.cache.stats() if github.cache else None,
+        'search_cache': search_cache.snapshot(),
+        'singleflight': singleflight.snapshot(),
         'platform_support': ['Android', 'Chromebook', 'Mobile Web']
     })
 
@@ -55,6 +80,8 @@ def search_repositories():
     if not query:
         return jsonify({'error': 'Query parameter is required'}), 400
     
+    fields = mobile_repository_json.parse_fields(request.args.get('fields'))
+    
     # Build GitHub search parameters
     params = {
         'q': query,
@@ -66,8 +93,12 @@ def search_repositories():
         params['sort'] = sort
         params['order'] = order
     
-    # Make request to GitHub API
-    data = make_github_request('search/repositories', params)
+    # Serve from the search cache, falling back to the GitHub API
+    cache_key = normalize_search_key(query, sort, order, page, per_page)
+    data, cache_state = search_cache.get_or_fetch(
+        cache_key, lambda: make_github_request('search/repositories', params),
+        refresh=lambda: make_github_request('search/repositories', params, priority=BACKGROUND)
+    )
     
     if not data:
         return jsonify({
@@ -76,81 +107,84 @@ def search_repositories():
         }), 500
     
     # Format response for mobile clients
-    repositories = []
-    for item in data.get('items', []):
-        repo = {
-            'id': item.get('id'),
-            'name': item.get('name'),
-            'full_name': item.get('full_name'),
-            'description': item.get('description'),
-            'html_url': item.get('html_url'),
-            'clone_url': item.get('clone_url'),
-            'language': item.get('language'),
-            'stargazers_count': item.get('stargazers_count', 0),
-            'forks_count': item.get('forks_count', 0),
-            'watchers_count': item.get('watchers_count', 0),
-            'open_issues_count': item.get('open_issues_count', 0),
-            'topics': item.get('topics', []),
-            'owner': {
-                'login': item.get('owner', {}).get('login', ''),
-                'avatar_url': item.get('owner', {}).get('avatar_url', '')
-            },
-            'created_at': item.get('created_at'),
-            'updated_at': item.get('updated_at'),
-            'pushed_at': item.get('pushed_at'),
-            'private': item.get('private', False),
-            'fork': item.get('fork', False),
-            'archived': item.get('archived', False),
-            'size': item.get('size', 0)
-        }
-        repositories.append(repo)
+    repositories = mobile_repository_json.many(data.get('items', []), fields or SEARCH_FIELDS)
     
-    return jsonify({
+    response = jsonify({
         'total_count': data.get('total_count', 0),
         'incomplete_results': data.get('incomplete_results', False),
         'repositories': repositories
     })
+    response.headers['X-Cache'] = cache_state
+    return response
 
 @app.route('/api/repositories/<owner>/<repo>')
 def get_repository(owner, repo):
-    """Get detailed repository information"""
+    """Get detailed repository information (?fields=a,b limits the keys returned)"""
+    fields = mobile_repository_json.parse_fields(request.args.get('fields'))
     data = make_github_request(f'repos/{owner}/{repo}')
     
     if not data:
         return jsonify({'error': 'Repository not found'}), 404
     
-    # Format repository data for mobile clients
-    repository = {
-        'id': data.get('id'),
-        'name': data.get('name'),
-        'full_name': data.get('full_name'),
-        'description': data.get('description'),
-        'html_url': data.get('html_url'),
-        'clone_url': data.get('clone_url'),
-        'ssh_url': data.get('ssh_url'),
-        'language': data.get('language'),
-        'stargazers_count': data.get('stargazers_count', 0),
-        'forks_count': data.get('forks_count', 0),
-        'watchers_count': data.get('watchers_count', 0),
-        'open_issues_count': data.get('open_issues_count', 0),
-        'default_branch': data.get('default_branch', 'main'),
-        'topics': data.get('topics', []),
-        'owner': {
-            'login': data.get('owner', {}).get('login', ''),
-            'avatar_url': data.get('owner', {}).get('avatar_url', '')
-        },
-        'created_at': data.get('created_at'),
-        'updated_at': data.get('updated_at'),
-        'pushed_at': data.get('pushed_at'),
-        'private': data.get('private', False),
-        'fork': data.get('fork', False),
-        'archived': data.get('archived', False),
-        'disabled': data.get('disabled', False),
-        'size': data.get('size', 0),
-        'license': data.get('license')
-    }
+    return jsonify(format_repository(data, fields))
+
+# Mobile repository payload: API field -> expression over the GitHub item r
+MOBILE_REPOSITORY_FIELDS = {
+    'id': "r.get('id')",
+    'name': "r.get('name')",
+    'full_name': "r.get('full_name')",
+    'description': "r.get('description')",
+    'html_url': "r.get('html_url')",
+    'clone_url': "r.get('clone_url')",
+    'ssh_url': "r.get('ssh_url')",
+    'language': "r.get('language')",
+    'stargazers_count': "r.get('stargazers_count', 0)",
+    'forks_count': "r.get('forks_count', 0)",
+    'watchers_count': "r.get('watchers_count', 0)",
+    'open_issues_count': "r.get('open_issues_count', 0)",
+    'default_branch': "r.get('default_branch', 'main')",
+    'topics': "r.get('topics', [])",
+    'owner': "{'login': (r.get('owner') or {}).get('login', ''), "
+             "'avatar_url': (r.get('owner') or {}).get('avatar_url', '')}",
+    'created_at': "r.get('created_at')",
+    'updated_at': "r.get('updated_at')",
+    'pushed_at': "r.get('pushed_at')",
+    'private': "r.get('private', False)",
+    'fork': "r.get('fork', False)",
+    'archived': "r.get('archived', False)",
+    'disabled': "r.get('disabled', False)",
+    'size': "r.get('size', 0)",
+    'license': "r.get('license')"
+}
+mobile_repository_json = Serializer(MOBILE_REPOSITORY_FIELDS, source='item')
+
+# Search results default to the lighter list-view shape
+SEARCH_FIELDS = (
+    'id', 'name', 'full_name', 'description', 'html_url', 'clone_url', 'language',
+    'stargazers_count', 'forks_count', 'watchers_count', 'open_issues_count', 'topics', 'owner',
+    'created_at', 'updated_at', 'pushed_at', 'private', 'fork', 'archived', 'size'
+)
+
+def format_repository(data, fields=None):
+    """Format repository data for mobile clients"""
+    return mobile_repository_json.one(data, fields)
+
+@app.route('/api/repositories/<owner>/<repo>/overview')
+def get_repository_overview(owner, repo):
+    """Get repository details, languages, contents and traffic in one round trip"""
+    parts = parse_parts(request.args.get('include'))
     
-    return jsonify(repository)
+    if parts is None:
+        return jsonify({'error': 'Unknown part in include parameter'}), 400
+    
+    def fetch_part(part):
+        data = make_github_request(part_endpoint(part, owner, repo))
+        if data and part == 'repository':
+            return format_repository(data)
+        return data
+    
+    payload, status = overview_payload(fetch_overview(owner, repo, parts, fetch_part))
+    return jsonify(payload), status
 
 @app.route('/api/repositories/<owner>/<repo>/languages')
 def get_repository_languages(owner, repo):
@@ -165,8 +199,12 @@ def get_repository_languages(owner, repo):
 @app.route('/api/repositories/<owner>/<repo>/contents')
 @app.route('/api/repositories/<owner>/<repo>/contents/<path:path>')
 def get_repository_contents(owner, repo, path=''):
-    """Get repository file contents"""
+    """Get repository file contents (?stream=1 relays JSON as-is, ?raw=1 serves file bytes)"""
     endpoint = f'repos/{owner}/{repo}/contents/{path}' if path else f'repos/{owner}/{repo}/contents'
+    raw = contents_proxy.wants_raw(request.args)
+    if raw or contents_proxy.wants_stream(request.args):
+        return stream_contents(endpoint, path, raw)
+    
     data = make_github_request(endpoint)
     
     if not data:
@@ -174,6 +212,36 @@ def get_repository_contents(owner, repo, path=''):
     
     return jsonify(data)
 
+def stream_contents(endpoint, path, raw):
+    """Relay a contents response from GitHub in chunks, so large files never sit in memory"""
+    accept_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    headers = contents_proxy.upstream_headers(request.headers, raw, accept_gzip)
+    
+    try:
+        upstream_response = github.get(endpoint, headers=headers, stream=True)
+    except requests.exceptions.RequestException as e:
+        print(f"GitHub API request failed: {str(e)}")
+        return jsonify({'error': 'Failed to fetch from GitHub API'}), 500
+    
+    status = upstream_response.status_code
+    if status not in contents_proxy.PASSTHROUGH_STATUSES:
+        upstream_response.close()
+        if status == 404:
+            return jsonify({'error': 'Contents not found'}), 404
+        return jsonify({'error': 'Failed to fetch from GitHub API'}), 500
+    
+    status, headers, decode, skip, length = contents_proxy.plan_response(
+        status, upstream_response.headers, request.headers, path, raw, accept_gzip
+    )
+    chunks = upstream_response.raw.stream(contents_proxy.CHUNK_SIZE, decode_content=decode)
+    body = contents_proxy.iter_body(chunks, skip, length, close=upstream_response.close)
+    return Response(body, status=status, headers=headers, direct_passthrough=True)
+
+@app.after_request
+def compress_json_response(response):
+    """gzip/brotli larger JSON responses for clients that accept it"""
+    return compress_response(response, request.headers.get('Accept-Encoding', ''))
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
@@ -182,6 +250,16 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+@app.errorhandler(InvalidFields)
+def invalid_fields(error):
+    return jsonify({'error': str(error)}), 400
+
+@app.errorhandler(QuotaExhausted)
+def quota_exhausted(error):
+    response = jsonify({'error': 'GitHub API rate limit exhausted, try again later'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
 if __name__ == '__main__':
     print("🚀 Starting Flask Backend Server")
     print("📱 Supporting Android and Chromebook clients")
@@ -193,4 +271,5 @@ if __name__ == '__main__':
         print("⚠️  Warning: GITHUB_TOKEN not set - API rate limits will apply")
         print("💡 Set GITHUB_TOKEN environment variable for higher rate limits")
     
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5001)),
+            debug=os.environ.get('FLASK_DEBUG') == '1')
\ No newline at end of file
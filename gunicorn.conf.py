@@ -0,0 +1,70 @@
+"""
+Production gunicorn settings, picked up automatically by `gunicorn` in the repo root
+
+    gunicorn                                   # flask_backend.app:app on $PORT
+    GUNICORN_APP=flask_server:app gunicorn     # the mobile server instead
+    GUNICORN_WORKER_CLASS=gevent gunicorn      # needs `pip install gevent`
+
+The app is preloaded in the master so workers fork with its imports and
+compiled state already in memory; database pools are discarded in each
+worker after the fork, and the GitHub sessions and write-behind threads
+rebuild themselves per process. The schema is not touched at startup: run
+`flask --app flask_backend.app init-db` once per deploy (render.yaml does it
+as a pre-deploy step).
+
+Reloads: SIGHUP restarts workers gracefully but, with the app preloaded,
+keeps the old code; send SIGUSR2 and then SIGTERM to the old master to
+roll out new code without dropping connections, or set GUNICORN_PRELOAD=0
+to make SIGHUP reload code too.
+"""
+import os
+import sys
+
+os.environ.setdefault('FLASK_CONFIG', 'production')
+
+wsgi_app = os.environ.get('GUNICORN_APP', 'flask_backend.app:app')
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    try:
+        # Patch before the app is preloaded so its locks and sockets cooperate
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        print('gevent is not installed, falling back to gthread workers', file=sys.stderr)
+        worker_class = 'gthread'
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 20))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks cannot accumulate; jitter avoids restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def _loaded_backend():
+    """The backend module if the master preloaded it, else None"""
+    return sys.modules.get('flask_backend.app')
+
+
+def post_fork(server, worker):
+    backend = _loaded_backend()
+    if backend is not None:
+        backend.dispose_connections()
+
+
+def worker_exit(server, worker):
+    backend = _loaded_backend()
+    if backend is not None and backend.write_behind is not None:
+        backend.write_behind.close()
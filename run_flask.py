@@ -24,6 +24,6 @@ if __name__ == '__main__':
     app.run(
         host='0.0.0.0',
         port=5001,
-        debug=True,
+        debug=os.environ.get('FLASK_DEBUG') == '1',
         use_reloader=True
     )
\ No newline at end of file
@@ -1,23 +1,25 @@
 #!/usr/bin/env python3
+"""
+Start the Flask backend on the Werkzeug server (local use)
+
+Production runs under gunicorn with gunicorn.conf.py. Create or update the
+schema once with `flask --app flask_backend.app init-db` rather than on
+every start.
+"""
 import os
-import sys
+
 from flask_backend.app import app
 
 if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5001))
     print("Starting Flask backend server for Android and Chromebook clients...")
-    print("Server will be available at: http://0.0.0.0:5001")
-    print("Health check: http://0.0.0.0:5001/api/health")
-    
-    # Initialize database
-    with app.app_context():
-        from flask_backend.app import db
-        db.create_all()
-        print("Database initialized successfully")
+    print(f"Server will be available at: http://0.0.0.0:{port}")
+    print(f"Health check: http://0.0.0.0:{port}/api/health")
     
     # Start server
     app.run(
         host='0.0.0.0',
-        port=5001,
-        debug=True,
+        port=port,
+        debug=os.environ.get('FLASK_DEBUG') == '1',
         use_reloader=False  # Disable reloader for better stability
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+import pytest
+
+# The backend reads its settings from the environment at import time
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['GITHUB_WEBHOOK_SECRET'] = 'fixture-secret'
+os.environ['WRITE_BEHIND_ENABLED'] = '0'
+os.environ.pop('WEBHOOK_RECORD_DIR', None)
+
+from flask_backend.app import Repository, RepositorySyncState, app as flask_app, db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.rollback()
+        RepositorySyncState.query.delete()
+        Repository.query.delete()
+        db.session.commit()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
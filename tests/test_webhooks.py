@@ -0,0 +1,197 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from flask_backend import aggregates
+from flask_backend.app import (
+    Repository, RepositorySyncState, db, github, repository_rows, search_cache, search_deriver,
+    upsert_repository_rows
+)
+from flask_backend.search_cache import MISS, normalize_search_key
+from flask_backend.webhooks import sign, verify_signature
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'webhooks')
+SECRET = 'fixture-secret'
+GITHUB_ID = 1296269
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, f'{name}.json')) as f:
+        return json.load(f)
+
+
+def deliver(client, recorded, signature=None, body=None):
+    body = body if body is not None else json.dumps(recorded['payload']).encode('utf-8')
+    headers = {'X-GitHub-Event': recorded['event'], 'X-GitHub-Delivery': recorded['delivery']}
+    signature = signature if signature is not None else recorded['signature']
+    if signature:
+        headers['X-Hub-Signature-256'] = signature
+    return client.post('/api/webhooks/github', data=body, headers=headers, content_type='application/json')
+
+
+def save_repository(stars=1000, topics=('octocat', 'webhooks')):
+    """Save the fixture repository as an earlier search would have"""
+    payload = dict(load('star')['payload']['repository'], stargazers_count=stars, topics=list(topics),
+                   updated_at='2024-01-01T00:00:00Z')
+    upsert_repository_rows(repository_rows([payload]))
+    db.session.commit()
+
+
+def saved():
+    db.session.expire_all()
+    return Repository.query.filter_by(github_id=GITHUB_ID).one_or_none()
+
+
+def stats():
+    aggregates.fold(db.session.connection())
+    db.session.commit()
+    return aggregates.languages(db.session.connection())
+
+
+def stored_state():
+    repository = saved()
+    columns = ('stars_count', 'forks_count', 'language', 'topics', 'updated_at', 'pushed_at', 'license_name')
+    return {column: getattr(repository, column) for column in columns} if repository else None
+
+
+@pytest.mark.parametrize('name', ['push', 'star', 'repository_deleted', 'issues'])
+def test_fixtures_are_signed(name):
+    recorded = load(name)
+    assert verify_signature(SECRET, json.dumps(recorded['payload']).encode('utf-8'), recorded['signature'])
+
+
+def test_rejects_missing_and_invalid_signatures(app, client):
+    save_repository()
+    recorded = load('push')
+    body = json.dumps(recorded['payload']).encode('utf-8')
+    tampered = body.replace(b'"stargazers_count": 1500', b'"stargazers_count": 9999')
+
+    assert deliver(client, recorded, signature='').status_code == 401
+    assert deliver(client, recorded, signature=sign('wrong-secret', body)).status_code == 401
+    assert deliver(client, recorded, signature='sha256=' + '0' * 64).status_code == 401
+    assert deliver(client, recorded, body=tampered).status_code == 401
+    assert saved().stars_count == 1000
+
+
+def test_push_updates_saved_repository(app, client):
+    save_repository()
+    response = deliver(client, load('push'))
+
+    assert response.status_code == 202
+    assert response.get_json()['status'] == 'accepted'
+    repository = saved()
+    assert repository.stars_count == 1500
+    assert repository.pushed_at == datetime(2024, 10, 15, 13, 46, 40)  # epoch seconds in push payloads
+    assert db.session.get(RepositorySyncState, GITHUB_ID).synced_at is not None
+
+
+def test_push_ignores_unsaved_repository(app, client):
+    assert deliver(client, load('push')).status_code == 202
+    assert saved() is None
+
+
+def test_payload_without_topics_keeps_stored_topics(app, client):
+    save_repository(topics=('octocat', 'webhooks'))
+    assert 'topics' not in load('star')['payload']['repository']
+
+    assert deliver(client, load('star')).status_code == 202
+    repository = saved()
+    assert repository.stars_count == 1501
+    assert repository.topics == ['octocat', 'webhooks']
+
+
+def test_redelivery_is_idempotent(app, client):
+    save_repository()
+    for name in ('push', 'star'):
+        deliver(client, load(name))
+    first = stored_state()
+    first_stats = stats()
+
+    for name in ('push', 'star', 'push', 'star'):
+        assert deliver(client, load(name)).status_code == 202
+
+    assert stored_state() == first
+    assert stats() == first_stats
+    assert Repository.query.filter_by(github_id=GITHUB_ID).count() == 1
+    assert RepositorySyncState.query.filter_by(github_id=GITHUB_ID).count() == 1
+
+
+def test_older_delivery_does_not_overwrite_newer_counts(app, client):
+    save_repository()
+    deliver(client, load('star'))
+    newer = stored_state()
+
+    assert deliver(client, load('push')).status_code == 202  # updated before the star
+    assert stored_state() == newer
+    assert saved().stars_count == 1501
+
+
+def test_deleted_repository_is_removed_once(app, client):
+    save_repository()
+    recorded = load('repository_deleted')
+
+    assert deliver(client, recorded).status_code == 202
+    assert saved() is None
+    assert deliver(client, recorded).status_code == 202
+    assert saved() is None
+    assert db.session.get(RepositorySyncState, GITHUB_ID) is None
+
+
+def test_unknown_event_is_acknowledged_and_ignored(app, client):
+    save_repository()
+    before = stored_state()
+    response = deliver(client, load('issues'))
+
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ignored'
+    assert stored_state() == before
+
+
+def test_change_invalidates_only_that_repository(app, client):
+    if github.cache is None:
+        pytest.skip('GitHub response cache disabled')
+    save_repository()
+    keys = [github.url_for(path) for path in (
+        'repos/octo-org/octo-repo', 'repos/octo-org/Octo-Repo/languages', 'repos/octo-org/octo-repo-docs'
+    )]
+    for key in keys:
+        github.cache.store(key, b'{}', {'ETag': '"etag"'})
+
+    deliver(client, load('push'))
+
+    assert [github.cache.lookup(key) is not None for key in keys] == [False, False, True]
+    github.cache.clear()
+
+
+def test_change_evicts_cached_searches(app, client):
+    save_repository()
+    repository = dict(load('star')['payload']['repository'], stargazers_count=1000)
+    other = dict(repository, id=1, name='other', full_name='octo-org/other')
+    pages = {'octo': [repository, other], 'unrelated': [other]}
+    for query, items in pages.items():
+        search_cache.put(normalize_search_key(query), {'total_count': len(items), 'items': items})
+        if search_deriver is not None:
+            search_deriver.add_page(query, 'best-match', 'desc', 1, 30, {'total_count': len(items)},
+                                    repository_rows(items))
+    assert search_cache.peek(normalize_search_key('octo'))[1] != MISS
+
+    deliver(client, load('push'))
+
+    assert search_cache.peek(normalize_search_key('octo')) == (None, MISS)
+    assert search_cache.peek(normalize_search_key('unrelated'))[1] != MISS
+    if search_deriver is not None:
+        assert search_deriver.derive('octo', 'stars', 'desc', 1, 30) is None
+        assert search_deriver.derive('unrelated', 'stars', 'desc', 1, 30) is not None
+    search_cache.backend.clear()
+
+
+def test_replay_applies_recorded_deliveries(app):
+    save_repository()
+    paths = [os.path.join(FIXTURES, f'{name}.json') for name in ('push', 'star', 'issues', 'push')]
+
+    result = app.test_cli_runner().invoke(args=['replay-webhooks', *paths])
+
+    assert 'Webhooks replayed: 3 applied, 1 ignored' in result.output
+    assert saved().stars_count == 1501  # the second push is older than the star